@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+"""
+Alert Engine
+Daily 8:00 AM alert cycle shared by the web app, the scheduler process and the CLI
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from weather_checker import WeatherChecker
+from notification_sender import NotificationSender
+from subscriber_index import SubscriberIndex, utc_now
+from pipeline import Pipeline, Stage
+from alert_rules import ALERT_FLAGS, compile_rules, evaluate_for_members
+from database import connect, init_db, prune_deliveries
+from geo_cluster import ClusterFetcher, cluster_groups
+from weather_archive import open_archive
+from progress import CycleProgress, mirror_to_database
+from app_logging import BucketLog, configure_logging, get_logger
+from config import (DATABASE_PATH, NOTIFICATION_HOUR, DISPATCH_WINDOW_MINUTES, DELIVERY_WORKERS,
+                    PIPELINE_BUFFER_SIZE, GEO_CLUSTER_MODE, GEO_CLUSTER_KM, DELIVERY_RETENTION_DAYS)
+
+PRUNE_INTERVAL_SECONDS = 3600  # How often a long-running engine trims delivery history
+
+logger = get_logger('alert_engine')
+
+
+class CycleStats:
+    """Counters and per-location latencies for one run of the engine"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.duration = None
+        self.locations = 0
+        self.alerts_sent = 0
+        self.alerts_failed = 0
+        self.errors = 0
+        self.latencies = []
+        self.stages = []  # Per-stage pipeline counters
+        self.clustering = None  # Geo clustering counters, when enabled
+        self.analyses = 0
+        self.analyses_skipped = 0  # Fingerprint unchanged: the last analysis was reused
+        self.renders = 0
+        self.renders_skipped = 0
+        self._lock = threading.Lock()
+
+    def record_location(self, seconds=None, sent=0, failed=0):
+        with self._lock:
+            self.locations += 1
+            self.alerts_sent += sent
+            self.alerts_failed += failed
+            if seconds is not None:
+                self.latencies.append(seconds)
+
+    def record_alerts(self, seconds, sent, failed):
+        """One delivered batch; seconds runs from the location's fetch to the batch being recorded"""
+        with self._lock:
+            self.alerts_sent += sent
+            self.alerts_failed += failed
+            self.latencies.append(seconds)
+
+    def record_analysis(self, skipped):
+        with self._lock:
+            self.analyses += 1
+            self.analyses_skipped += skipped
+
+    def record_render(self, skipped):
+        with self._lock:
+            self.renders += 1
+            self.renders_skipped += skipped
+
+    def change_detection(self):
+        """How much analysis and rendering unchanged forecasts saved"""
+        return {'analyses': self.analyses, 'analyses_skipped': self.analyses_skipped,
+                'renders': self.renders, 'renders_skipped': self.renders_skipped,
+                'skip_ratio': round((self.analyses_skipped + self.renders_skipped) / (self.analyses + self.renders), 3)
+                if self.analyses + self.renders else 0.0}
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+        return self
+
+    def percentile(self, percent):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def summary(self):
+        """Throughput and per-location latency for reporting"""
+        duration = self.duration if self.duration is not None else time.perf_counter() - self.started
+        return {
+            'name': self.name,
+            'duration_seconds': round(duration, 3),
+            'locations': self.locations,
+            'alerts_sent': self.alerts_sent,
+            'alerts_failed': self.alerts_failed,
+            'errors': self.errors,
+            'locations_per_second': round(self.locations / duration, 1) if duration else 0.0,
+            'alerts_per_second': round(self.alerts_sent / duration, 1) if duration else 0.0,
+            'p50_ms': round(self.percentile(50) * 1000, 1),
+            'p95_ms': round(self.percentile(95) * 1000, 1),
+            'max_ms': round(max(self.latencies, default=0) * 1000, 1),
+            'stages': self.stages,
+            'clustering': self.clustering,
+            'change_detection': self.change_detection()
+        }
+
+
+def _until_cancelled(groups, job):
+    """Stop feeding the pipeline once the job is cancelled"""
+    for group in groups:
+        if job.cancelled:
+            return
+        yield group
+
+
+def _cycle_fields(stats):
+    return {'cycle': stats.name, 'locations': stats.locations, 'alerts_sent': stats.alerts_sent,
+            'alerts_failed': stats.alerts_failed, 'errors': stats.errors}
+
+
+class AlertEngine:
+    def __init__(self, db_path=DATABASE_PATH, weather_checker_factory=WeatherChecker,
+                 sender_factory=NotificationSender, clock=utc_now, cluster_mode=GEO_CLUSTER_MODE,
+                 cluster_km=GEO_CLUSTER_KM, archive=None, retention_days=DELIVERY_RETENTION_DAYS):
+        self.db_path = db_path
+        self.weather_checker_factory = weather_checker_factory
+        self.sender_factory = sender_factory
+        self.clock = clock  # Returns naive UTC now; the day simulator swaps in a simulated clock
+        self.cluster_mode = cluster_mode  # 'off', 'grid' or 'radius' (see geo_cluster)
+        self.cluster_km = cluster_km
+        # Observations and alert outcomes per location (False: don't archive)
+        self.archive = open_archive(db_path, archive)
+        # Active subscribers grouped by location, refreshed incrementally each cycle
+        self.subscriber_index = SubscriberIndex(db_path)
+        self.retention_days = retention_days  # Days of delivery history kept (0: forever)
+        self._warned_unconfigured = False
+        self._pruned_at = None
+
+    def send_welcome_email(self, email, city, country_code, rules_json=None):
+        """Send welcome email to new subscriber"""
+        notification_sender = self.sender_factory()
+        if not notification_sender.is_configured():
+            logger.warning("⚠️ Email configuration not set up - welcome email not sent; "
+                           "set EMAIL_ADDRESS and EMAIL_PASSWORD in .env to enable it",
+                           extra={'email': email, 'location': f"{city}, {country_code}"})
+            return False
+
+        try:
+            notification_sender.recipient_email = email
+
+            welcome_data = {
+                'location': f"{city}, {country_code}",
+                'current_temperature': 75.0,
+                'daily_high': 75.0,
+                'description': 'welcome',
+                'notifications': [
+                    f'🎉 Welcome to UmbrellaAlert!',
+                    f'📍 You will receive daily weather alerts for {city}, {country_code}',
+                    *compile_rules(rules_json).describe(),
+                    f'⏰ Daily checks at 8:00 AM in your local timezone',
+                    f'📧 You will only receive emails when alerts are needed!'
+                ]
+            }
+
+            success = notification_sender.send_email_notification(welcome_data)
+            if success:
+                logger.info("✅ Welcome email sent", extra={'email': email})
+            else:
+                logger.error("❌ Failed to send welcome email", extra={'email': email})
+            return success
+
+        except Exception as e:
+            logger.exception("❌ Error sending welcome email", extra={'email': email, 'error': str(e)})
+            return False
+        finally:
+            notification_sender.close()
+
+    def _for_each_group(self, groups, handler, workers=1):
+        """Run handler(group, weather_checker) for every group, concurrently when workers > 1"""
+        weather_checker = self.weather_checker_factory()
+        if workers <= 1:
+            for group in groups:
+                handler(group, weather_checker)
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='alert-worker') as pool:
+                list(pool.map(lambda group: handler(group, weather_checker), groups))
+
+    def _notifications_enabled(self):
+        if not self.sender_factory().is_configured():
+            # Once per process, not once per minute
+            if not self._warned_unconfigured:
+                logger.warning("⚠️ Email configuration not set up - notifications disabled")
+                self._warned_unconfigured = True
+            return False
+        return True
+
+    def _run_pipeline(self, stats, groups, fetch, now_utc, workers=1, delivery_workers=None, job=None):
+        """Stream location groups through fetch -> analyze -> render -> deliver -> record.
+
+        Stages overlap and each has its own threads; the bounded queues between
+        them keep memory flat and make a slow transport throttle the fetchers.
+        A background job (see jobs.py) gets progress counters and can stop the run.
+        """
+        weather_checker = self.weather_checker_factory()
+        if self.cluster_mode != 'off':
+            # One fetch and analysis per cluster of nearby locations; members stay adjacent in the stream
+            clusters = cluster_groups(groups, self.cluster_mode, self.cluster_km)
+            weather_checker = ClusterFetcher(weather_checker, clusters)
+            groups = [group for cluster in clusters for group in cluster]
+        bucket_log = BucketLog(logger, stats.name)
+        # Live progress for the admin dashboard, from the same per-bucket counters
+        progress = CycleProgress(stats, bucket_log, len(groups))
+        if job is not None:
+            job.set_total(len(groups))
+            groups = _until_cancelled(groups, job)
+        local = threading.local()
+        senders = []
+        senders_lock = threading.Lock()
+
+        def count(group, **counters):
+            bucket_log.count(group, **counters)
+            progress.update()
+
+        def advance(**counters):
+            if job is not None:
+                job.advance(**counters)
+
+        def sender():
+            # One sender per thread: SMTP connections can't be shared
+            notification_sender = getattr(local, 'sender', None)
+            if notification_sender is None:
+                notification_sender = local.sender = self.sender_factory()
+                with senders_lock:
+                    senders.append(notification_sender)
+            return notification_sender
+
+        def fetch_stage(group):
+            if job is not None and job.cancelled:
+                return  # Queued but not fetched yet; anything already fetched still goes out
+            started = time.perf_counter()
+            fetched = fetch(weather_checker, group)
+            advance(locations=1)
+            if fetched:
+                count(group, locations=1, subscribers=len(group.subscribers))
+                # What analysis will read; if it matches the last check, that check's results are reused
+                fingerprint = weather_checker.analysis_fingerprint(fetched[0], fetched[1], now_utc)
+                yield (group, started) + fetched + (fingerprint,)
+
+        def analyze_stage(item):
+            group, started, weather_data, forecast_data, fingerprint = item
+            results = self._analyze_location(weather_checker, group, weather_data, forecast_data, now_utc,
+                                             fingerprint, stats)
+            stats.record_location(None if results else time.perf_counter() - started)
+            if not results:
+                count(group, no_alerts=1)
+            for analysis, emails in results:
+                yield group, started, analysis, emails, fingerprint
+
+        def render_stage(item):
+            group, started, analysis, emails, fingerprint = item
+            notification_sender = sender()
+            # Rendered once per rule set, and only again once the location's fingerprint changes;
+            # large groups are split so no item carries every address
+            msg = self._rendered(notification_sender, group, analysis, fingerprint, stats)
+            batch_size = notification_sender.transport.batch_size
+            count(group, alerts_queued=len(emails))
+            for start in range(0, len(emails), batch_size):
+                yield group, started, analysis['notifications'], msg, emails[start:start + batch_size]
+
+        def deliver_stage(item):
+            group, started, notifications, msg, emails = item
+            yield group, started, notifications, emails, sender().deliver_rendered(msg, emails)
+
+        def record_stage(item):
+            group, started, notifications, emails, failed = item
+            # Every failure is kept in the deliveries table; only a sample is logged
+            for email, error in failed.items():
+                if bucket_log.sample('delivery'):
+                    logger.warning("❌ Failed to send alert",
+                                   extra={'email': email, 'location': group.location, 'error': str(error)})
+            sent, failed = self._record_delivery(group, notifications, emails, failed)
+            stats.record_alerts(time.perf_counter() - started, sent, failed)
+            count(group, alerts_sent=sent, alerts_failed=failed)
+            advance(alerts_sent=sent, alerts_failed=failed)
+
+        def on_error(item, error):
+            stats.record_error()
+            fetch_failed = not isinstance(item, tuple)
+            group = item if fetch_failed else item[0]
+            count(group, errors=1)
+            if fetch_failed:
+                advance(locations=1, errors=1)
+            else:
+                advance(errors=1)
+            if bucket_log.sample('location'):
+                logger.error("❌ Error checking weather", extra={'location': group.location, 'error': str(error)})
+
+        delivery_workers = delivery_workers or max(workers, DELIVERY_WORKERS)
+        pipeline = Pipeline([
+            Stage('fetch', fetch_stage, workers, on_error),
+            Stage('analyze', analyze_stage, 1, on_error),
+            Stage('render', render_stage, 1, on_error),
+            Stage('deliver', deliver_stage, delivery_workers, on_error),
+            Stage('record', record_stage, 1, on_error),
+        ], PIPELINE_BUFFER_SIZE)
+        try:
+            stats.stages = pipeline.run(groups)
+        finally:
+            # The transport may hold one connection open for the whole cycle
+            for notification_sender in senders:
+                notification_sender.close()
+            if self.archive is not None:
+                self.archive.flush()
+            self._prune_history()
+            if stats.analyses:
+                logger.info("♻️ Change detection", extra=dict(stats.change_detection(), cycle=stats.name))
+            if isinstance(weather_checker, ClusterFetcher):
+                stats.clustering = weather_checker.stats()
+                logger.info("🗺️ Geo clustering", extra=dict(stats.clustering, cycle=stats.name))
+            bucket_log.emit()
+            progress.finish()
+        return stats.finish()
+
+    def send_notifications_to_all(self, workers=1, delivery_workers=None, job=None):
+        """Send weather notifications to all active subscribers - only when alerts are needed"""
+        stats = CycleStats('send-all')
+        if not self._notifications_enabled():
+            return stats.finish()
+
+        subscriber_index = self.subscriber_index
+        subscriber_index.refresh()
+        groups = subscriber_index.all_groups()
+
+        logger.info("🔍 Checking weather for all subscribers",
+                    extra={'subscribers': len(subscriber_index), 'locations': len(groups)})
+
+        def fetch(weather_checker, group):
+            # One weather lookup per location, shared by all of its subscribers
+            weather_data = self._refresh_offset(weather_checker, group)
+            return (weather_data, None) if weather_data else None
+
+        self._run_pipeline(stats, groups, fetch, None, workers, delivery_workers, job)
+
+        logger.info("📊 Weather check completed", extra=dict(_cycle_fields(stats), subscribers=len(subscriber_index)))
+        return stats
+
+    def _analyze_location(self, weather_checker, group, weather_data, forecast_data, now_utc=None,
+                          fingerprint=None, stats=None):
+        """Evaluate every subscriber's rules for one location; returns [(analysis, emails)] to send"""
+        last = group.last_analysis
+        skipped = fingerprint is not None and last is not None and last[0] == fingerprint and last[1] is not None
+        if skipped:
+            # Only the current conditions can differ from the last check's analysis
+            weather_analysis = weather_checker.with_current_conditions(last[1], weather_data, forecast_data, now_utc)
+        else:
+            weather_analysis = weather_checker.analyze_weather(weather_data, forecast_data, now_utc=now_utc)
+            group.last_analysis = (fingerprint, weather_analysis, {})
+        if stats is not None:
+            stats.record_analysis(skipped)
+        if not weather_analysis:
+            return []
+
+        # One evaluation per distinct rule set, not per subscriber
+        members_by_rules = self.subscriber_index.members_by_rules(group)
+        results = evaluate_for_members(weather_analysis['metrics'], members_by_rules)
+        if self.archive is not None:
+            self._archive_observation(group, weather_data, weather_analysis, members_by_rules, now_utc)
+        if not results:
+            logger.debug("ℹ️ No alerts needed", extra={'location': group.location,
+                                                      'subscribers': len(group.subscribers)})
+            return []
+
+        location = f"{group.location}, {group.country_code}"
+        return [(dict(weather_analysis, notifications=notifications, location=location), emails)
+                for notifications, emails in results]
+
+    def _rendered(self, notification_sender, group, analysis, fingerprint, stats):
+        """The batch message for an analysis, from a template reused for as long as the fingerprint holds"""
+        last = group.last_analysis
+        rendered = last[2] if fingerprint is not None and last is not None and last[0] == fingerprint else None
+        key = tuple(analysis['notifications'])
+        template = rendered.get(key) if rendered is not None else None
+        stats.record_render(template is not None)
+        if template is None:
+            template = notification_sender.render_template(analysis)
+            if rendered is not None:
+                rendered[key] = template
+        # The time and current temperature change between sends, so they're filled in every time
+        return notification_sender.fill_template(template, analysis)
+
+    def _archive_observation(self, group, weather_data, weather_analysis, members_by_rules, now_utc=None):
+        """Buffer one archive row: the location's metrics plus which alert kinds went to how many subscribers"""
+        metrics = weather_analysis['metrics']
+        flags = 0
+        recipients = 0
+        for ruleset, emails in members_by_rules.items():
+            fired = ruleset.fired(metrics)
+            if fired:
+                recipients += len(emails)
+                for kind in fired:
+                    flags |= ALERT_FLAGS[kind]
+        current_temp, daily_high, daily_low, wind_speed, _ = metrics
+        condition_id = (weather_data.get('weather') or [{}])[0].get('id', 0)
+        self.archive.append(now_utc or self.clock(), group.key, current_temp, daily_high, daily_low, wind_speed,
+                            condition_id, flags, recipients)
+
+    def _record_delivery(self, group, notifications, emails, failed):
+        """Log a delivered batch and stamp last_notification for the accepted recipients; returns (sent, failed)"""
+        sent_ids = []
+        history = []
+        now = datetime.now()
+        for email in emails:
+            record = self.subscriber_index.get(email)
+            if record is None:
+                continue  # Unsubscribed while the alert was in flight
+            error = failed.get(email)
+            if error is None:
+                sent_ids.append((now, record.id))
+            history.append((record.id, group.key, now, 'failed' if error else 'sent', error and str(error)))
+
+        if sent_ids:
+            logger.debug("✅ Alert sent", extra={'location': group.location, 'sent': len(sent_ids),
+                                                'notifications': notifications})
+
+        # Delivery history and last notification time in one transaction per batch
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.executemany('UPDATE subscribers SET last_notification = ? WHERE id = ?', sent_ids)
+        cursor.executemany('INSERT INTO deliveries (subscriber_id, location_id, sent_at, status, error) '
+                           'VALUES (?, ?, ?, ?, ?)', history)
+        conn.commit()
+        conn.close()
+
+        sent = len(emails) - len(failed)
+        return sent, len(emails) - sent
+
+    def _prune_history(self):
+        """Drop delivery history past the retention window, at most once per PRUNE_INTERVAL_SECONDS"""
+        now = time.monotonic()
+        if self._pruned_at is not None and now - self._pruned_at < PRUNE_INTERVAL_SECONDS:
+            return
+        self._pruned_at = now
+        try:
+            deleted = prune_deliveries(self.db_path, self.retention_days)
+        except Exception as e:
+            logger.warning("⚠️ Couldn't prune delivery history", extra={'error': str(e)})
+            return
+        if deleted:
+            logger.info("🧹 Pruned delivery history", extra={'deleted': deleted, 'retention_days': self.retention_days})
+
+    def run_forever(self, interval=60, workers=1, delivery_workers=None):
+        """Send notifications daily at 8:00 AM in each location's timezone"""
+        while True:
+            try:
+                # Check weather for all subscribers based on their local timezone
+                self.run_cycle(workers=workers, delivery_workers=delivery_workers)
+
+                # Wait 1 minute before next check
+                time.sleep(interval)
+
+            except Exception:
+                logger.exception("Background notification error")
+                time.sleep(interval)
+
+    def _refresh_offset(self, weather_checker, group):
+        """Fetch current weather for a location and record its UTC offset and coordinates; returns the weather data"""
+        weather_data = weather_checker.get_weather_data_for_location(group.location, group.country_code)
+        if weather_data and 'timezone' in weather_data:
+            self.subscriber_index.set_offset(group, weather_data['timezone'])
+        # A location's own coordinates, learned once; clustered members never overwrite theirs
+        if weather_data and 'coord' in weather_data and group.latitude is None:
+            self.subscriber_index.set_coordinates(group, weather_data['coord']['lat'], weather_data['coord']['lon'])
+        return weather_data
+
+    def check_weather_for_all_timezones(self):
+        """Check weather for all subscribers based on their local 8:00 AM"""
+        return self.run_cycle()
+
+    def run_cycle(self, now_utc=None, workers=1, delivery_workers=None):
+        """One scheduler cycle: learn new offsets, re-validate upcoming ones, then send what's due"""
+        if not self._notifications_enabled():
+            return CycleStats('cycle').finish()
+
+        # Only rows changed since the last cycle are read from the database
+        self.subscriber_index.refresh()
+        now_utc = now_utc or self.clock()
+        self.learn_offsets(now_utc, workers)
+        return self.send_due(now_utc, workers, delivery_workers)
+
+    def learn_offsets(self, now_utc=None, workers=1, recheck=True):
+        """Look up locations with no known offset, and re-check those an hour before 8:00 AM"""
+        subscriber_index = self.subscriber_index
+        now_utc = now_utc or self.clock()
+
+        def learn(group, weather_checker):
+            try:
+                self._refresh_offset(weather_checker, group)
+            except Exception as e:
+                logger.error("❌ Error looking up timezone", extra={'location': group.location, 'error': str(e)})
+
+        def recheck_group(group, weather_checker):
+            local_date = group.local_time(now_utc).date()
+            if group.offset_checked_date == local_date:
+                return
+            try:
+                if self._refresh_offset(weather_checker, group):
+                    group.offset_checked_date = local_date
+            except Exception as e:
+                logger.error("❌ Error looking up timezone", extra={'location': group.location, 'error': str(e)})
+
+        # New locations: fetch once to learn which offset bucket they belong to
+        unknown = subscriber_index.unknown_offset_groups()
+        if unknown:
+            self._for_each_group(unknown, learn, workers)
+
+        # Re-validate offsets an hour ahead so DST changes don't shift the 8:00 AM run
+        upcoming = subscriber_index.groups_at_local_time(now_utc, NOTIFICATION_HOUR - 1, 60) if recheck else []
+        if upcoming:
+            self._for_each_group(upcoming, recheck_group, workers)
+
+    def send_due(self, now_utc=None, workers=1, delivery_workers=None):
+        """Check weather and send alerts for every location where it's 8:00 AM"""
+        stats = CycleStats('send-due')
+        now_utc = now_utc or self.clock()
+        due_groups = self.subscriber_index.groups_at_local_time(now_utc, NOTIFICATION_HOUR, DISPATCH_WINDOW_MINUTES)
+        if not due_groups:
+            return stats.finish()
+
+        logger.info("🌍 8:00 AM in due locations - checking weather", extra={'locations': len(due_groups)})
+
+        def fetch(weather_checker, group):
+            local_date = group.local_time(now_utc).date()
+            if group.last_run_date == local_date:
+                return None
+
+            weather_data = self._refresh_offset(weather_checker, group)
+            if not weather_data:
+                return None
+
+            # The offset may have moved (DST); only run if it's still 8:00 AM there
+            local_time = group.local_time(now_utc)
+            if local_time.hour != NOTIFICATION_HOUR or local_time.minute >= DISPATCH_WINDOW_MINUTES:
+                return None
+            # Stored with the location, so another process (or a fresh cron run) doesn't send it again
+            if not self.subscriber_index.claim_run(group, local_time.date()):
+                return None
+
+            logger.debug("🌅 8:00 AM - checking weather",
+                         extra={'location': group.location, 'subscribers': len(group.subscribers)})
+
+            # Get forecast data for daily high temperature (compact, with local-day rollups)
+            return weather_data, weather_checker.get_compact_forecast_for_location(group.location, group.country_code)
+
+        self._run_pipeline(stats, due_groups, fetch, now_utc, workers, delivery_workers)
+
+        logger.info("📊 Timezone-aware check completed", extra=_cycle_fields(stats))
+        return stats
+
+    def prefetch(self, workers=1):
+        """Warm the response cache with current weather and forecasts for every subscribed location"""
+        stats = CycleStats('prefetch')
+        self.subscriber_index.refresh()
+
+        def fetch_group(group, weather_checker):
+            started = time.perf_counter()
+            try:
+                self._refresh_offset(weather_checker, group)
+                weather_checker.get_forecast_data_for_location(group.location, group.country_code)
+                stats.record_location(time.perf_counter() - started)
+            except Exception as e:
+                stats.record_error()
+                logger.error("❌ Error prefetching weather", extra={'location': group.location, 'error': str(e)})
+
+        self._for_each_group(self.subscriber_index.all_groups(), fetch_group, workers)
+        return stats.finish()
+
+
+def run_scheduler(db_path=DATABASE_PATH, workers=1):
+    """Entry point for the dedicated scheduler process"""
+    configure_logging()
+    init_db(db_path)
+    # Web workers stream this process's cycle progress from the database
+    mirror_to_database(db_path)
+    logger.info("⏰ Scheduler started: daily alerts at 8:00 AM in each location's timezone")
+    AlertEngine(db_path).run_forever(workers=workers)
+
+
+if __name__ == '__main__':
+    run_scheduler()
@@ -0,0 +1,152 @@
+"""
+Alert Rules
+Per-subscriber alert thresholds, compiled into shared rule sets and evaluated
+once per location against a single vector of weather metrics
+"""
+
+import json
+import operator
+import threading
+from config import TEMPERATURE_THRESHOLD, FROST_THRESHOLD, WIND_THRESHOLD
+from app_logging import get_logger
+
+logger = get_logger('alert_rules')
+
+# Metric vector layout shared by analyze_weather and the compiled rules
+METRICS = ('current_temperature', 'daily_high', 'daily_low', 'wind_speed', 'precipitation')
+METRIC_INDEX = {name: index for index, name in enumerate(METRICS)}
+
+OPERATORS = {'>': operator.gt, '<': operator.lt, '>=': operator.ge, '<=': operator.le}
+
+# Alert kinds subscribers can configure: metric, comparison, default threshold, message
+RULE_KINDS = {
+    'umbrella': ('precipitation', '>', 0, "🌧️ Bring an umbrella! Rain is expected."),
+    'sunscreen': ('daily_high', '>', TEMPERATURE_THRESHOLD, "☀️ High temperature expected. Don't forget sunscreen!"),
+    'frost': ('daily_low', '<', FROST_THRESHOLD, "🥶 Frost expected. Bundle up and watch for ice!"),
+    'wind': ('wind_speed', '>', WIND_THRESHOLD, "💨 Strong wind expected. Hold on to your hat!"),
+}
+
+DEFAULT_RULES = [{'kind': 'umbrella'}, {'kind': 'sunscreen'}]
+
+# One bit per alert kind, for the weather archive's alert_flags column
+ALERT_FLAGS = {'umbrella': 1, 'sunscreen': 2, 'frost': 4, 'wind': 8}
+
+# Kept from the original fixed rules: rain plus heat gets one combined reminder
+COMBINED_HEAT_AND_RAIN = "☀️🌧️ High temperature and rain expected. Bring umbrella AND sunscreen!"
+
+
+class CompiledRuleSet:
+    """An immutable, interned list of (metric index, comparison, threshold, kind) tuples"""
+    __slots__ = ('key', 'rules')
+
+    def __init__(self, key, rules):
+        self.key = key
+        self.rules = rules
+
+    def fired(self, metrics):
+        """Alert kinds triggered by a metric vector"""
+        return [kind for metric, compare, threshold, kind in self.rules if compare(metrics[metric], threshold)]
+
+    def evaluate(self, metrics):
+        """Notification messages triggered by a metric vector"""
+        fired = self.fired(metrics)
+        notifications = []
+        for kind in fired:
+            if kind == 'sunscreen' and 'umbrella' in fired:
+                notifications.append(COMBINED_HEAT_AND_RAIN)
+            else:
+                notifications.append(RULE_KINDS[kind][3])
+        return notifications
+
+    def describe(self):
+        """Human-readable rule list for welcome emails"""
+        descriptions = []
+        for _, _, threshold, kind in self.rules:
+            if kind == 'umbrella':
+                descriptions.append("🌧️ Umbrella alerts when rain is expected")
+            elif kind == 'sunscreen':
+                descriptions.append(f"☀️ Sunscreen alerts when temperature > {threshold:g}°F")
+            elif kind == 'frost':
+                descriptions.append(f"🥶 Frost alerts when temperature < {threshold:g}°F")
+            elif kind == 'wind':
+                descriptions.append(f"💨 Wind alerts when wind > {threshold:g} mph")
+        return descriptions
+
+
+def normalize_rules(rules):
+    """Validate a rule list and return it in canonical form (sorted, thresholds as floats)"""
+    normalized = []
+    for rule in rules:
+        kind = rule.get('kind')
+        if kind not in RULE_KINDS:
+            raise ValueError(f"Unknown alert kind '{kind}'")
+        threshold = rule.get('threshold', RULE_KINDS[kind][2])
+        normalized.append({'kind': kind, 'threshold': float(threshold)})
+    normalized.sort(key=lambda rule: list(RULE_KINDS).index(rule['kind']))
+    return normalized
+
+
+def rules_to_json(rules):
+    """Serialize rules for the subscribers.alert_rules column (None means the defaults)"""
+    normalized = normalize_rules(rules)
+    if normalized == normalize_rules(DEFAULT_RULES):
+        return None
+    return json.dumps(normalized, separators=(',', ':'))
+
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def compile_rules(rules_json=None):
+    """Compile a stored rule list; identical lists share one CompiledRuleSet"""
+    key = rules_json or ''
+    ruleset = _compiled.get(key)
+    if ruleset is not None:
+        return ruleset
+
+    try:
+        rules = normalize_rules(json.loads(rules_json)) if rules_json else normalize_rules(DEFAULT_RULES)
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.warning("⚠️ Invalid alert rules, using defaults", extra={'rules': rules_json, 'error': str(e)})
+        rules = normalize_rules(DEFAULT_RULES)
+
+    compiled = tuple(
+        (METRIC_INDEX[RULE_KINDS[rule['kind']][0]], OPERATORS[RULE_KINDS[rule['kind']][1]], rule['threshold'], rule['kind'])
+        for rule in rules
+    )
+    with _compiled_lock:
+        return _compiled.setdefault(key, CompiledRuleSet(key, compiled))
+
+
+def default_rules():
+    return compile_rules(None)
+
+
+def rules_from_form(form):
+    """Build a rule list from the subscription form's optional alert settings"""
+    if 'alert_settings' not in form:
+        return list(DEFAULT_RULES)
+    
+    rules = []
+    if form.get('umbrella_alerts'):
+        rules.append({'kind': 'umbrella'})
+    for kind, field in (('sunscreen', 'sunscreen_above'), ('frost', 'frost_below'), ('wind', 'wind_above')):
+        value = form.get(field, '').strip()
+        if value:
+            rules.append({'kind': kind, 'threshold': float(value)})
+    return rules
+
+
+def evaluate_for_members(metrics, members_by_rules):
+    """Evaluate each distinct rule set once for a location.
+
+    members_by_rules maps CompiledRuleSet -> emails; returns a list of
+    (notifications, emails) for the rule sets that triggered alerts.
+    """
+    results = []
+    for ruleset, emails in members_by_rules.items():
+        notifications = ruleset.evaluate(metrics)
+        if notifications:
+            results.append((notifications, emails))
+    return results
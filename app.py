@@ -4,65 +4,93 @@ Weather Notification Web App
 Flask web application for users to subscribe to weather notifications
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-import sqlite3
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, current_app
+import json
 import os
-from datetime import datetime
-import pytz
-from weather_checker import WeatherChecker
-from notification_sender import NotificationSender
-from config import EMAIL_ADDRESS, EMAIL_PASSWORD
+import queue
+import secrets
 import threading
-import time
+from weather_checker import WeatherChecker
+from response_cache import get_default_cache
+from resilience import get_default_breaker, get_default_hedger
+from alert_rules import rules_from_form, rules_to_json
+from alert_engine import AlertEngine
+from location_index import get_location_index
+from forecast_service import ForecastService, ForecastUnavailable
+from jobs import JobRunner
+from subscription_cache import SubscriptionCache
+from progress import DatabaseFeed, get_broker
+from database import connect, init_db, upsert_subscriber, deactivate_subscriber
+from app_logging import configure_logging, get_logger
+from config import DATABASE_PATH, SECRET_KEY, PROGRESS_STREAM_SECONDS
 
-app = Flask(__name__)
-app.secret_key = 'weather_notification_secret_key_2024'
+logger = get_logger('app')
 
-# Database setup
-def init_db():
-    """Initialize the database with subscribers table"""
-    conn = sqlite3.connect('subscribers.db')
-    cursor = conn.cursor()
+def create_app(db_path=DATABASE_PATH, setup_db=True):
+    """Build the Flask app; schema setup runs once here, not per request or per worker"""
+    started = time.perf_counter()
+    configure_logging()
     
-    # Check if table exists
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='subscribers'")
-    table_exists = cursor.fetchone() is not None
+    app = Flask(__name__)
+    app.secret_key = SECRET_KEY or secrets.token_hex(32)
+    if not SECRET_KEY:
+        # Only safe when every worker is forked from one preloaded app (see gunicorn.conf.py)
+        logger.warning("⚠️ SECRET_KEY not set - using a random per-process key")
+    app.config['DATABASE_PATH'] = db_path
     
-    if not table_exists:
-        # Create new table with zipcode
-        cursor.execute('''
-            CREATE TABLE subscribers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                city TEXT NOT NULL,
-                zipcode TEXT,
-                country_code TEXT NOT NULL,
-                subscribed_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_notification TIMESTAMP,
-                is_active BOOLEAN DEFAULT 1
-            )
-        ''')
-    else:
-        # Check if zipcode column exists
-        cursor.execute("PRAGMA table_info(subscribers)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'zipcode' not in columns:
-            # Add zipcode column to existing table
-            cursor.execute('ALTER TABLE subscribers ADD COLUMN zipcode TEXT')
+    # Startup hook: schema setup
+    if setup_db:
+        init_db(db_path)
     
-    conn.commit()
-    conn.close()
+    app.extensions['alert_engine'] = AlertEngine(db_path)
+    app.extensions['forecast_service'] = ForecastService()
+    app.extensions['job_runner'] = JobRunner(db_path)
+    app.extensions['subscription_cache'] = SubscriptionCache(db_path)
+    app.extensions['progress_feed'] = DatabaseFeed(db_path)
+    _register_routes(app)
+    
+    # Cold-start cost: module import plus app construction
+    app.config['STARTUP_SECONDS'] = time.perf_counter() - _import_started
+    logger.info("🚀 App created", extra={'startup_ms': round((time.perf_counter() - started) * 1000, 1),
+                                        'since_import_ms': round(app.config['STARTUP_SECONDS'] * 1000, 1)})
+    return app
+
+def _register_routes(app):
+    app.add_url_rule('/', 'index', index)
+    app.add_url_rule('/check_subscription', 'check_subscription', check_subscription, methods=['POST'])
+    app.add_url_rule('/subscribe', 'subscribe', subscribe, methods=['POST'])
+    app.add_url_rule('/unsubscribe', 'unsubscribe', unsubscribe, methods=['POST'])
+    app.add_url_rule('/api/locations', 'api_locations', api_locations)
+    # city_id is a city's id from /api/locations (the offline location index), not a locations.id
+    app.add_url_rule('/api/forecast/<int:city_id>', 'api_forecast', api_forecast)
+    app.add_url_rule('/admin', 'admin', admin)
+    app.add_url_rule('/send_test', 'send_test', send_test, methods=['POST'])
+    app.add_url_rule('/admin/jobs', 'jobs', jobs)
+    app.add_url_rule('/admin/jobs/<job_id>', 'job_status', job_status)
+    app.add_url_rule('/admin/jobs/<job_id>/cancel', 'cancel_job', cancel_job, methods=['POST'])
+    app.add_url_rule('/admin/progress', 'progress_stream', progress_stream)
+    app.add_url_rule('/admin/cache_stats', 'cache_stats', cache_stats)
+    app.add_url_rule('/admin/provider_stats', 'provider_stats', provider_stats)
+
+def _db_path():
+    return current_app.config['DATABASE_PATH']
+
+def _engine():
+    return current_app.extensions['alert_engine']
+
+def _job_runner():
+    return current_app.extensions['job_runner']
 
-# Initialize database on startup
-init_db()
+def _subscription_cache():
+    return current_app.extensions['subscription_cache']
 
-@app.route('/')
 def index():
     """Main page with subscription form"""
     return render_template('index.html')
 
-@app.route('/check_subscription', methods=['POST'])
 def check_subscription():
     """Check if an email is already subscribed"""
     email = request.form.get('email')
@@ -71,11 +99,8 @@ def check_subscription():
         return jsonify({'error': 'Please provide an email address'})
     
     try:
-        conn = sqlite3.connect('subscribers.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT email, city, zipcode, is_active FROM subscribers WHERE email = ?', (email,))
-        subscriber = cursor.fetchone()
-        conn.close()
+        # Cached per worker; unknown emails are answered without a query
+        subscriber = _subscription_cache().lookup(email)
         
         if subscriber:
             email, city, zipcode, is_active = subscriber
@@ -104,7 +129,6 @@ def check_subscription():
     except Exception as e:
         return jsonify({'error': f'Error checking subscription: {str(e)}'})
 
-@app.route('/subscribe', methods=['POST'])
 def subscribe():
     """Handle new subscription"""
     email = request.form.get('email')
@@ -117,41 +141,47 @@ def subscribe():
         return redirect(url_for('index'))
     
     try:
-        # Test the location with weather API
-        weather_checker = WeatherChecker()
-        weather_checker.api_key = '56d2e99920ceb5470ea88d9105b886dc'  # Your API key
-        weather_checker.base_url = "http://api.openweathermap.org/data/2.5/weather"
+        alert_rules = rules_to_json(rules_from_form(request.form))
+    except ValueError:
+        flash('Alert thresholds must be numbers.', 'error')
+        return redirect(url_for('index'))
+    
+    try:
+        # Known locations are confirmed offline; anything else is checked against the weather API
+        known_location = get_location_index().resolve(city, zipcode, country_code)
+        if known_location:
+            city = known_location.city  # Canonical spelling, so subscribers share one location
         
         # Build location string (city + zipcode if provided)
         location = city
         if zipcode:
             location = f"{city}, {zipcode}"
         
-        # Test location
-        test_data = weather_checker.get_weather_data_for_location(location, country_code)
-        if not test_data:
-            flash(f'Could not find weather data for {location}, {country_code}. Please check the city name and zipcode.', 'error')
-            return redirect(url_for('index'))
+        if not known_location:
+            weather_checker = WeatherChecker()
+            weather_checker.api_key = '56d2e99920ceb5470ea88d9105b886dc'  # Your API key
+            weather_checker.base_url = "http://api.openweathermap.org/data/2.5/weather"
+            
+            # Test location
+            test_data = weather_checker.get_weather_data_for_location(location, country_code)
+            if not test_data:
+                flash(f'Could not find weather data for {location}, {country_code}. Please check the city name and zipcode.', 'error')
+                return redirect(url_for('index'))
         
         # Check if email already exists
-        conn = sqlite3.connect('subscribers.db')
+        existing_subscriber = _subscription_cache().lookup(email)
+        conn = connect(_db_path())
         cursor = conn.cursor()
-        cursor.execute('SELECT email, city, zipcode FROM subscribers WHERE email = ?', (email,))
-        existing_subscriber = cursor.fetchone()
         
         if existing_subscriber:
             # Email already exists - update their location
-            existing_email, existing_city, existing_zipcode = existing_subscriber
-            cursor.execute('''
-                UPDATE subscribers 
-                SET city = ?, zipcode = ?, country_code = ?, subscribed_date = ?, is_active = 1
-                WHERE email = ?
-            ''', (city, zipcode, country_code, datetime.now(), email))
+            upsert_subscriber(cursor, email, city, zipcode, country_code, alert_rules)
             conn.commit()
             conn.close()
+            _subscription_cache().invalidate(email)
             
             # Send welcome email for the updated location
-            email_sent = send_welcome_email(email, location, country_code)
+            email_sent = _engine().send_welcome_email(email, location, country_code, alert_rules)
             
             if email_sent:
                 flash(f'Updated your subscription! You are now subscribed to weather alerts for {location}. Welcome email sent!', 'success')
@@ -159,15 +189,13 @@ def subscribe():
                 flash(f'Updated your subscription! You are now subscribed to weather alerts for {location}. (Email notifications not configured)', 'success')
         else:
             # New subscriber - insert new record
-            cursor.execute('''
-                INSERT INTO subscribers (email, city, zipcode, country_code, subscribed_date, is_active)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (email, city, zipcode, country_code, datetime.now(), True))
+            upsert_subscriber(cursor, email, city, zipcode, country_code, alert_rules)
             conn.commit()
             conn.close()
+            _subscription_cache().invalidate(email)
             
             # Send welcome email
-            email_sent = send_welcome_email(email, location, country_code)
+            email_sent = _engine().send_welcome_email(email, location, country_code, alert_rules)
             
             if email_sent:
                 flash(f'Successfully subscribed to weather alerts for {location}! Welcome email sent!', 'success')
@@ -179,7 +207,6 @@ def subscribe():
     
     return redirect(url_for('index'))
 
-@app.route('/unsubscribe', methods=['POST'])
 def unsubscribe():
     """Handle unsubscription"""
     email = request.form.get('email')
@@ -189,18 +216,19 @@ def unsubscribe():
         return redirect(url_for('index'))
     
     try:
-        conn = sqlite3.connect('subscribers.db')
-        cursor = conn.cursor()
+        # Unknown emails are turned away without opening the database
+        if _subscription_cache().lookup(email) is None:
+            flash(f'Email {email} was not found in our subscription list.', 'error')
+            return redirect(url_for('index'))
         
-        # Check if email exists
-        cursor.execute('SELECT email, city FROM subscribers WHERE email = ?', (email,))
-        existing_subscriber = cursor.fetchone()
+        conn = connect(_db_path())
+        cursor = conn.cursor()
         
-        if existing_subscriber:
-            # Email exists - deactivate subscription
-            cursor.execute('UPDATE subscribers SET is_active = 0 WHERE email = ?', (email,))
+        # Deactivate the subscription if the email exists
+        if deactivate_subscriber(cursor, email):
             conn.commit()
             conn.close()
+            _subscription_cache().invalidate(email)
             flash(f'Successfully unsubscribed {email} from weather notifications.', 'success')
         else:
             # Email doesn't exist
@@ -212,213 +240,124 @@ def unsubscribe():
     
     return redirect(url_for('index'))
 
-@app.route('/admin')
+def api_locations():
+    """City and postal code suggestions from the offline location index"""
+    prefix = request.args.get('prefix', '')
+    country_code = request.args.get('country') or None
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    return jsonify({'results': get_location_index().search(prefix, country_code, limit)})
+
+def api_forecast(city_id):
+    """Today's outlook for a city from /api/locations, from the in-process forecast cache"""
+    service = current_app.extensions['forecast_service']
+    try:
+        entry = service.get(city_id)
+    except ForecastUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    if entry is None:
+        return jsonify({'error': 'Unknown city'}), 404
+    
+    response = current_app.response_class(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = service.cache_control(entry)
+    # 304 Not Modified when the client already has this version
+    return response.make_conditional(request)
+
 def admin():
     """Admin page to view subscribers and send test notifications"""
-    conn = sqlite3.connect('subscribers.db')
+    conn = connect(_db_path())
     cursor = conn.cursor()
-    cursor.execute('SELECT id, email, city, zipcode, country_code, subscribed_date, last_notification, is_active FROM subscribers WHERE is_active = 1 ORDER BY subscribed_date DESC')
+    cursor.execute('''
+        SELECT s.id, s.email, l.city, l.zipcode, l.country_code, s.subscribed_date, s.last_notification, s.is_active
+        FROM subscribers s JOIN locations l ON l.id = s.location_id
+        WHERE s.is_active = 1 ORDER BY s.subscribed_date DESC
+    ''')
     subscribers = cursor.fetchall()
     conn.close()
     
-    return render_template('admin.html', subscribers=subscribers)
+    return render_template('admin.html', subscribers=subscribers, jobs=_job_runner().recent(5))
+
+def _send_all_job(job, engine):
+    return engine.send_notifications_to_all(job=job).summary()
 
-@app.route('/send_test', methods=['POST'])
 def send_test():
-    """Send test notification to all subscribers"""
-    try:
-        send_notifications_to_all()
-        flash('Test notifications sent to all active subscribers!', 'success')
-    except Exception as e:
-        flash(f'Error sending notifications: {str(e)}', 'error')
+    """Start sending test notifications to all subscribers as a background job"""
+    job, created = _job_runner().submit('send-all', _send_all_job, _engine())
+    if created:
+        flash(f'Sending notifications to all active subscribers (job {job["id"]})', 'success')
+    else:
+        flash(f'A send to all subscribers is already {job["status"]} (job {job["id"]}) - not starting another', 'error')
     
     return redirect(url_for('admin'))
 
-def send_welcome_email(email, city, country_code):
-    """Send welcome email to new subscriber"""
-    if not EMAIL_ADDRESS or not EMAIL_PASSWORD:
-        print(f"⚠️ Email configuration not set up - welcome email not sent to {email}")
-        print(f"📧 Would have sent welcome email to {email} for {city}, {country_code}")
-        print(f"🔧 To enable email notifications, set up EMAIL_ADDRESS and EMAIL_PASSWORD in .env file")
-        return False
-    
-    try:
-        notification_sender = NotificationSender()
-        notification_sender.recipient_email = email
-        
-        welcome_data = {
-            'location': f"{city}, {country_code}",
-            'current_temperature': 75.0,
-            'daily_high': 75.0,
-            'description': 'welcome',
-            'notifications': [
-                f'🎉 Welcome to UmbrellaAlert!',
-                f'📍 You will receive daily weather alerts for {city}, {country_code}',
-                f'🌧️ Umbrella alerts when rain is expected',
-                f'☀️ Sunscreen alerts when temperature > 80°F',
-                f'⏰ Daily checks at 8:00 AM in your local timezone',
-                f'📧 You will only receive emails when alerts are needed!'
-            ]
-        }
-        
-        success = notification_sender.send_email_notification(welcome_data)
-        if success:
-            print(f"✅ Welcome email sent to {email}")
-        else:
-            print(f"❌ Failed to send welcome email to {email}")
-        return success
-        
-    except Exception as e:
-        print(f"❌ Error sending welcome email to {email}: {e}")
-        return False
+def jobs():
+    """Most recent admin background jobs"""
+    return jsonify({'jobs': _job_runner().recent(10)})
 
-def send_notifications_to_all():
-    """Send weather notifications to all active subscribers - only when alerts are needed"""
-    if not EMAIL_ADDRESS or not EMAIL_PASSWORD:
-        print("⚠️ Email configuration not set up - notifications disabled")
-        return
-    
-    weather_checker = WeatherChecker()
-    notification_sender = NotificationSender()
-    
-    conn = sqlite3.connect('subscribers.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT email, city, zipcode, country_code FROM subscribers WHERE is_active = 1')
-    subscribers = cursor.fetchall()
-    conn.close()
-    
-    print(f"🔍 Checking weather for {len(subscribers)} active subscribers...")
-    
-    notifications_sent = 0
-    for email, city, zipcode, country_code in subscribers:
-        try:
-            # Build location string (city + zipcode if provided)
-            location = city
-            if zipcode:
-                location = f"{city}, {zipcode}"
-            
-            # Get weather for this subscriber's location
-            weather_data = weather_checker.get_weather_data_for_location(location, country_code)
-            if weather_data:
-                weather_analysis = weather_checker.analyze_weather(weather_data)
-                
-                # Only send notification if alerts are needed
-                if weather_analysis and weather_checker.should_send_notification(weather_analysis):
-                    # Update recipient email temporarily
-                    notification_sender.recipient_email = email
-                    
-                    if notification_sender.send_email_notification(weather_analysis):
-                        # Update last notification time
-                        conn = sqlite3.connect('subscribers.db')
-                        cursor = conn.cursor()
-                        cursor.execute('UPDATE subscribers SET last_notification = ? WHERE email = ?', 
-                                     (datetime.now(), email))
-                        conn.commit()
-                        conn.close()
-                        
-                        print(f"✅ Alert sent to {email} for {city}: {weather_analysis['notifications']}")
-                        notifications_sent += 1
-                    else:
-                        print(f"❌ Failed to send alert to {email} for {city}")
-                else:
-                    print(f"ℹ️ No alerts needed for {email} in {city} - weather is good!")
-                    
-        except Exception as e:
-            print(f"❌ Error checking weather for {email} in {city}: {e}")
-    
-    print(f"📊 Daily weather check completed: {notifications_sent} alerts sent out of {len(subscribers)} subscribers")
+def job_status(job_id):
+    """Status and progress of one background job, polled by the admin page"""
+    job = _job_runner().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
 
-def background_notification_service():
-    """Background service to send notifications daily at 8:00 AM in each location's timezone"""
-    while True:
-        try:
-            # Check weather for all subscribers based on their local timezone
-            check_weather_for_all_timezones()
-            
-            # Wait 1 minute before next check
-            time.sleep(60)
-                
-        except Exception as e:
-            print(f"Background notification error: {e}")
-            time.sleep(60)
+def cancel_job(job_id):
+    """Ask a background job to stop"""
+    runner = _job_runner()
+    if runner.get(job_id) is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if not runner.cancel(job_id):
+        return jsonify(dict(runner.get(job_id), error='Job already finished')), 409
+    return jsonify(runner.get(job_id))
 
-def check_weather_for_all_timezones():
-    """Check weather for all subscribers based on their local 8:00 AM"""
-    if not EMAIL_ADDRESS or not EMAIL_PASSWORD:
-        print("⚠️ Email configuration not set up - notifications disabled")
-        return
-    
-    weather_checker = WeatherChecker()
-    notification_sender = NotificationSender()
-    
-    conn = sqlite3.connect('subscribers.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT email, city, zipcode, country_code FROM subscribers WHERE is_active = 1')
-    subscribers = cursor.fetchall()
-    conn.close()
-    
-    if not subscribers:
-        return
-    
-    print(f"🌍 Checking weather for {len(subscribers)} subscribers across different timezones...")
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def progress_stream():
+    """Server-Sent Events stream of live alert cycle progress for the admin page"""
+    broker = get_broker()
+    feed = current_app.extensions['progress_feed']
+    subscription = broker.subscribe()
+    feed.start()  # Picks up the scheduler process's cycles
     
-    notifications_sent = 0
-    for email, city, zipcode, country_code in subscribers:
+    def stream():
         try:
-            # Build location string (city + zipcode if provided)
-            location = city
-            if zipcode:
-                location = f"{city}, {zipcode}"
-            
-            # Get weather for this subscriber's location
-            weather_data = weather_checker.get_weather_data_for_location(location, country_code)
-            if weather_data:
-                # Check if it's 8:00 AM in this location's timezone
-                if weather_checker.is_8am_in_location(weather_data):
-                    print(f"🌅 8:00 AM in {location} - checking weather for {email}")
-                    
-                    # Get forecast data for daily high temperature
-                    forecast_data = weather_checker.get_forecast_data_for_location(location, country_code)
-                    
-                    weather_analysis = weather_checker.analyze_weather(weather_data, forecast_data)
-                    
-                    # Only send notification if alerts are needed
-                    if weather_analysis and weather_checker.should_send_notification(weather_analysis):
-                        # Update recipient email temporarily
-                        notification_sender.recipient_email = email
-                        
-                        if notification_sender.send_email_notification(weather_analysis):
-                            # Update last notification time
-                            conn = sqlite3.connect('subscribers.db')
-                            cursor = conn.cursor()
-                            cursor.execute('UPDATE subscribers SET last_notification = ? WHERE email = ?', 
-                                         (datetime.now(), email))
-                            conn.commit()
-                            conn.close()
-                            
-                            print(f"✅ Alert sent to {email} for {city}: {weather_analysis['notifications']}")
-                            notifications_sent += 1
-                        else:
-                            print(f"❌ Failed to send alert to {email} for {city}")
-                    else:
-                        print(f"ℹ️ No alerts needed for {email} in {city} - weather is good!")
-                else:
-                    # Not 8:00 AM in this location yet
-                    timezone_name = weather_checker.get_location_timezone(weather_data)
-                    if timezone_name:
-                        tz = pytz.timezone(timezone_name)
-                        local_time = datetime.now(tz)
-                        print(f"⏰ {city} ({timezone_name}): {local_time.strftime('%H:%M')} - not 8:00 AM yet")
-                    
-        except Exception as e:
-            print(f"❌ Error checking weather for {email} in {city}: {e}")
+            yield 'retry: 3000\n\n'
+            for snapshot in list(broker.latest.values()):
+                yield _sse('progress', snapshot)
+            # Streams end now and then so each request thread is returned; the browser reconnects
+            deadline = time.monotonic() + PROGRESS_STREAM_SECONDS
+            while time.monotonic() < deadline:
+                try:
+                    snapshot = subscription.get(timeout=15)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield _sse('progress', snapshot)
+        finally:
+            broker.unsubscribe(subscription)
     
-    if notifications_sent > 0:
-        print(f"📊 Timezone-aware check completed: {notifications_sent} alerts sent")
+    return current_app.response_class(stream(), mimetype='text/event-stream',
+                                      headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def cache_stats():
+    """Weather API response cache and subscription lookup cache statistics"""
+    cache = get_default_cache()
+    stats = dict(cache.stats(), enabled=True) if cache is not None else {'enabled': False}
+    return jsonify(dict(stats, subscriptions=_subscription_cache().stats()))
+
+def provider_stats():
+    """Weather API circuit breaker and hedged request statistics"""
+    return jsonify({'breaker': get_default_breaker().stats(), 'hedging': get_default_hedger().stats(),
+                    'forecast_api': current_app.extensions['forecast_service'].stats()})
 
 if __name__ == '__main__':
-    # Start background notification service in a separate thread
-    notification_thread = threading.Thread(target=background_notification_service, daemon=True)
+    # Development server: single process, scheduler in a background thread
+    app = create_app()
+    notification_thread = threading.Thread(target=app.extensions['alert_engine'].run_forever, daemon=True)
     notification_thread.start()
     
     print("☔ UmbrellaAlert Web App Starting...")
@@ -0,0 +1,202 @@
+"""
+App Logging
+Leveled, structured logging through a queue: callers only enqueue records and
+a background listener thread does the formatting and console I/O, so the alert
+cycle never waits on stdout
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from config import LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_SIZE, LOG_SAMPLE_LIMIT
+
+ROOT_LOGGER = 'umbrella'
+
+# Attributes every LogRecord has; anything else was passed as a structured field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def get_logger(name):
+    """Logger for one module, under the app's root logger"""
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+def record_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any extra fields"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with extra fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return line
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Enqueues without blocking; when the listener falls behind, records are dropped and counted"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class ConsoleListener(QueueListener):
+    """Writes queued records on its own thread; stopping waits for the queue to drain"""
+
+    def enqueue_sentinel(self):
+        # Blocking put: the stop marker must get in even when the queue is full
+        self.queue.put(self._sentinel)
+
+    def is_running(self):
+        return self._thread is not None
+
+
+_handler = None
+_listener = None
+_lock = threading.Lock()
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, stream=None, queue_size=LOG_QUEUE_SIZE):
+    """Route the app's loggers through a bounded queue to one console writer thread; safe to call again"""
+    global _handler, _listener
+    with _lock:
+        _stop_listener()
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+        logger = logging.getLogger(ROOT_LOGGER)
+        if _handler is not None:
+            logger.removeHandler(_handler)
+        _handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        logger.addHandler(_handler)
+        logger.setLevel(level.upper() if isinstance(level, str) else level)
+        logger.propagate = False
+
+        _listener = ConsoleListener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+    return _handler
+
+
+def flush_logging():
+    """Wait for queued records to be written (listener keeps running)"""
+    with _lock:
+        if _listener is not None:
+            _stop_listener(restart=True)
+
+
+def dropped_records():
+    return _handler.dropped if _handler is not None else 0
+
+
+def _stop_listener(restart=False):
+    global _listener
+    if _listener is None:
+        return
+    if _listener.is_running():
+        _listener.stop()
+    if restart:
+        _listener.start()
+    else:
+        _listener = None
+
+
+def _restart_in_child():
+    # A forked process (gunicorn worker) inherits the queue but not the listener thread
+    global _listener
+    if _listener is not None:
+        _listener._thread = None
+        _listener.start()
+
+
+def _shutdown():
+    with _lock:
+        _stop_listener()
+
+
+atexit.register(_shutdown)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_in_child)
+
+
+class BucketLog:
+    """Per-cycle aggregation of repetitive per-location events into one summary record per offset bucket.
+
+    Individual failures are logged as they happen, up to sample_limit per kind
+    per cycle; the rest are only counted and reported in the summaries.
+    """
+
+    def __init__(self, logger, cycle, sample_limit=LOG_SAMPLE_LIMIT):
+        self.logger = logger
+        self.cycle = cycle
+        self.sample_limit = sample_limit
+        self.buckets = {}  # offset -> counters
+        self.samples = {}  # kind -> occurrences this cycle
+        self._lock = threading.Lock()
+
+    def count(self, group, **counters):
+        """Add to the counters for a location's bucket, e.g. count(group, locations=1, subscribers=12)"""
+        with self._lock:
+            bucket = self.buckets.setdefault(group.offset, {})
+            for key, value in counters.items():
+                bucket[key] = bucket.get(key, 0) + value
+
+    def sample(self, kind):
+        """Whether this occurrence of a failure kind should be logged individually"""
+        with self._lock:
+            seen = self.samples.get(kind, 0)
+            self.samples[kind] = seen + 1
+            return seen < self.sample_limit
+
+    def snapshot(self):
+        """Copy of the per-bucket counters so far: {offset: counters}"""
+        with self._lock:
+            return {offset: dict(counters) for offset, counters in self.buckets.items()}
+
+    def suppressed(self):
+        return {kind: seen - self.sample_limit for kind, seen in self.samples.items() if seen > self.sample_limit}
+
+    def emit(self):
+        """Log one summary record per bucket, then the suppressed-sample counts"""
+        for offset in sorted(self.buckets, key=lambda o: (o is None, o or 0)):
+            counters = self.buckets[offset]
+            failed = counters.get('alerts_failed', 0) + counters.get('errors', 0)
+            self.logger.log(logging.WARNING if failed else logging.INFO, "📊 Bucket summary",
+                            extra=dict(counters, cycle=self.cycle, utc_offset=offset))
+        suppressed = self.suppressed()
+        if suppressed:
+            self.logger.warning("Failure logs sampled", extra={'cycle': self.cycle, 'suppressed': suppressed})
@@ -8,6 +8,39 @@ load_dotenv()
 WEATHER_API_KEY = os.getenv('WEATHER_API_KEY', '')
 WEATHER_API_BASE_URL = "http://api.openweathermap.org/data/2.5/weather"
 
+# Response Cache (shared on-disk cache of weather API payloads)
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', 'weather_cache.db')
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+RESPONSE_CACHE_STALE_SECONDS = int(os.getenv('RESPONSE_CACHE_STALE_SECONDS', 1800))  # Serve stale while refreshing
+CACHE_WEATHER_TTL = int(os.getenv('CACHE_WEATHER_TTL', 600))  # Current weather: 10 minutes
+CACHE_FORECAST_TTL = int(os.getenv('CACHE_FORECAST_TTL', 3 * 3600))  # OWM updates forecasts every 3 hours
+
+# Public forecast API (/api/forecast/<location id>), cached in process memory
+FORECAST_API_TTL = int(os.getenv('FORECAST_API_TTL', 600))  # Seconds a computed forecast is fresh
+FORECAST_API_STALE_SECONDS = int(os.getenv('FORECAST_API_STALE_SECONDS', 1800))  # Served stale while refreshing
+
+# Weather Provider Resilience
+WEATHER_API_TIMEOUT = float(os.getenv('WEATHER_API_TIMEOUT', 10))  # Seconds per request
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))  # Consecutive errors before failing fast
+BREAKER_RESET_SECONDS = float(os.getenv('BREAKER_RESET_SECONDS', 60))  # Open time before a half-open probe
+HEDGE_AFTER_SECONDS = os.getenv('HEDGE_AFTER_SECONDS', '0')  # Seconds, 'auto' (observed percentile) or 0 = off
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', 99))
+HEDGE_MIN_SECONDS = float(os.getenv('HEDGE_MIN_SECONDS', 0.5))
+HEDGE_MAX_WORKERS = int(os.getenv('HEDGE_MAX_WORKERS', 16))
+
+# Weather Archive (columnar history of observations and alerts, written by each cycle)
+ARCHIVE_ENABLED = os.getenv('ARCHIVE_ENABLED', 'true').lower() == 'true'
+ARCHIVE_PATH = os.getenv('ARCHIVE_PATH', '')  # Default: <database name>_archive next to the database
+
+# Geo Clustering (share one weather fetch between nearby locations at the same UTC offset)
+GEO_CLUSTER_MODE = os.getenv('GEO_CLUSTER_MODE', 'off')  # 'off', 'grid' (snap to cells) or 'radius'
+GEO_CLUSTER_KM = float(os.getenv('GEO_CLUSTER_KM', 10))  # Grid cell size, or merge radius
+
+# Offline city/postal code dataset for autocomplete and subscription validation
+LOCATIONS_DATA_PATH = os.getenv('LOCATIONS_DATA_PATH',
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'locations.csv'))
+
 # Location Configuration (you can change these to your location)
 CITY = os.getenv('CITY', 'New York')
 COUNTRY_CODE = os.getenv('COUNTRY_CODE', 'US')
@@ -17,9 +50,50 @@ EMAIL_ADDRESS = os.getenv('EMAIL_ADDRESS', '')
 EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD', '')  # App password for Gmail
 RECIPIENT_EMAIL = os.getenv('RECIPIENT_EMAIL', '')
 
+# Delivery Transport ('smtp', 'mbox', 'memory' or 'webhook')
+MAIL_TRANSPORT = os.getenv('MAIL_TRANSPORT', 'smtp')
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
+SMTP_SECURITY = os.getenv('SMTP_SECURITY', 'starttls')  # 'starttls', 'ssl' or 'none'
+SMTP_AUTH = os.getenv('SMTP_AUTH', 'true').lower() == 'true'  # Set to false for unauthenticated relays
+SMTP_BATCH_SIZE = int(os.getenv('SMTP_BATCH_SIZE', 50))  # Recipients per SMTP transaction
+MBOX_PATH = os.getenv('MBOX_PATH', 'outbox.mbox')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', 10))  # Seconds
+
+# Web App Configuration
+SECRET_KEY = os.getenv('SECRET_KEY', '')
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 2))  # Gunicorn worker processes
+# 'embedded': gunicorn's master starts one dedicated scheduler process
+# 'off': run the scheduler separately with `python alert_engine.py`
+SCHEDULER_MODE = os.getenv('SCHEDULER_MODE', 'embedded')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))  # Admin background job threads per web worker
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 300))  # No progress for this long: job is treated as abandoned
+JOB_HISTORY = int(os.getenv('JOB_HISTORY', 50))  # Finished jobs kept for the admin page
+SUBSCRIPTION_CACHE_SIZE = int(os.getenv('SUBSCRIPTION_CACHE_SIZE', 10000))  # Emails whose status is kept per worker
+SUBSCRIPTION_CACHE_SYNC_SECONDS = float(os.getenv('SUBSCRIPTION_CACHE_SYNC_SECONDS', 1))  # Other workers' writes show up within this
+PROGRESS_INTERVAL = float(os.getenv('PROGRESS_INTERVAL', 1))  # Seconds between live cycle progress updates
+PROGRESS_STREAM_SECONDS = int(os.getenv('PROGRESS_STREAM_SECONDS', 300))  # Dashboard streams reconnect after this
+
+# Logging (queued; a background thread does the console I/O)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # 'text' or 'json'
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # Records beyond this are dropped, never waited on
+LOG_SAMPLE_LIMIT = int(os.getenv('LOG_SAMPLE_LIMIT', 5))  # Individual failure logs per kind per cycle
+
+# Database Configuration
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'subscribers.db')
+
 # Notification Settings
-TEMPERATURE_THRESHOLD = 80  # Fahrenheit
+TEMPERATURE_THRESHOLD = 80  # Fahrenheit - default sunscreen alert
+FROST_THRESHOLD = 32  # Fahrenheit - default for subscribers who enable frost alerts
+WIND_THRESHOLD = 25  # mph - default for subscribers who enable wind alerts
 CHECK_INTERVAL_MINUTES = 30  # How often to check weather
+NOTIFICATION_HOUR = 8  # Local hour at which daily alerts go out
+DISPATCH_WINDOW_MINUTES = int(os.getenv('DISPATCH_WINDOW_MINUTES', 5))  # Minutes after the hour a missed run may still go out
+DELIVERY_WORKERS = int(os.getenv('DELIVERY_WORKERS', 2))  # Concurrent senders per alert cycle
+PIPELINE_BUFFER_SIZE = int(os.getenv('PIPELINE_BUFFER_SIZE', 16))  # Max items queued between alert cycle stages
+DELIVERY_RETENTION_DAYS = int(os.getenv('DELIVERY_RETENTION_DAYS', 90))  # Delivery history kept; 0 keeps it forever
 
 # Weather conditions that indicate rain
 RAIN_CONDITIONS = [
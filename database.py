@@ -0,0 +1,319 @@
+"""
+Database
+Schema migrations, connections and shared writes for the subscribers database
+"""
+
+import json
+import sqlite3
+from datetime import datetime, timedelta
+from config import DATABASE_PATH
+from app_logging import get_logger
+
+logger = get_logger('database')
+
+# Assigns the next subscribers.version; every write the subscriber index must see bumps it
+NEXT_VERSION_SQL = '(SELECT COALESCE(MAX(version), 0) + 1 FROM subscribers)'
+
+
+def connect(db_path=DATABASE_PATH):
+    """Open a connection to the subscribers database"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+
+def location_key(city, zipcode, country_code):
+    """Normalized key used to group subscribers that share a location"""
+    return (city.strip().lower(), (zipcode or '').strip().lower(), country_code.strip().upper())
+
+
+def _location_key_text(city, zipcode, country_code):
+    return '|'.join(location_key(city, zipcode, country_code))
+
+
+def _migrate_legacy_subscribers(cursor):
+    """The original single subscribers table, including columns added over time"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS subscribers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            city TEXT NOT NULL,
+            zipcode TEXT,
+            country_code TEXT NOT NULL,
+            subscribed_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_notification TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1,
+            version INTEGER NOT NULL DEFAULT 0,
+            alert_rules TEXT
+        )
+    ''')
+
+    # Databases created before these columns existed
+    cursor.execute("PRAGMA table_info(subscribers)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if 'zipcode' not in columns:
+        cursor.execute('ALTER TABLE subscribers ADD COLUMN zipcode TEXT')
+    if 'version' not in columns:
+        cursor.execute('ALTER TABLE subscribers ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+    if 'alert_rules' not in columns:
+        cursor.execute('ALTER TABLE subscribers ADD COLUMN alert_rules TEXT')
+
+
+def _migrate_normalized_schema(cursor):
+    """Locations and alert settings in their own tables, referenced by integer id, plus delivery history"""
+    cursor.execute('''
+        CREATE TABLE locations (
+            id INTEGER PRIMARY KEY,
+            location_key TEXT NOT NULL UNIQUE,
+            city TEXT NOT NULL,
+            zipcode TEXT NOT NULL DEFAULT '',
+            country_code TEXT NOT NULL,
+            utc_offset INTEGER
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE alert_settings (
+            id INTEGER PRIMARY KEY,
+            alert_rules TEXT NOT NULL UNIQUE
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE subscribers_normalized (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            location_id INTEGER NOT NULL REFERENCES locations(id),
+            settings_id INTEGER REFERENCES alert_settings(id),
+            subscribed_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_notification TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+    # Move existing subscribers over, sharing one row per distinct location and rule set
+    cursor.execute('''
+        SELECT id, email, city, zipcode, country_code, subscribed_date, last_notification, is_active,
+               version, alert_rules
+        FROM subscribers ORDER BY id
+    ''')
+    for (subscriber_id, email, city, zipcode, country_code, subscribed_date, last_notification, is_active,
+         version, alert_rules) in cursor.fetchall():
+        cursor.execute('''
+            INSERT INTO subscribers_normalized (id, email, location_id, settings_id, subscribed_date,
+                                                last_notification, is_active, version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (subscriber_id, email, location_id(cursor, city, zipcode, country_code),
+              settings_id(cursor, alert_rules), subscribed_date, last_notification, is_active, version))
+
+    cursor.execute('DROP TABLE subscribers')
+    cursor.execute('ALTER TABLE subscribers_normalized RENAME TO subscribers')
+
+    # One row per recipient per alert: 'sent', or 'failed' with the transport's error
+    cursor.execute('''
+        CREATE TABLE deliveries (
+            id INTEGER PRIMARY KEY,
+            subscriber_id INTEGER NOT NULL REFERENCES subscribers(id),
+            location_id INTEGER NOT NULL REFERENCES locations(id),
+            sent_at TIMESTAMP NOT NULL,
+            status TEXT NOT NULL,
+            error TEXT
+        )
+    ''')
+
+    # Covering indexes for the subscriber index refresh and per-bucket queries
+    cursor.execute('CREATE INDEX idx_subscribers_version ON subscribers(version)')
+    cursor.execute('CREATE INDEX idx_subscribers_location ON subscribers(location_id, is_active, email)')
+    cursor.execute('CREATE INDEX idx_locations_offset ON locations(utc_offset, id)')
+    cursor.execute('CREATE INDEX idx_deliveries_subscriber ON deliveries(subscriber_id, sent_at)')
+
+
+def _migrate_location_coordinates(cursor):
+    """Coordinates reported by the weather API, used to cluster nearby locations"""
+    cursor.execute('ALTER TABLE locations ADD COLUMN latitude REAL')
+    cursor.execute('ALTER TABLE locations ADD COLUMN longitude REAL')
+
+
+def _migrate_jobs(cursor):
+    """Admin background jobs, shared by every web worker so any of them can report or cancel one"""
+    cursor.execute('''
+        CREATE TABLE jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            heartbeat REAL NOT NULL,
+            total INTEGER,
+            progress TEXT NOT NULL DEFAULT '{}',
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT
+        )
+    ''')
+    # At most one queued or running job of each kind
+    cursor.execute("CREATE UNIQUE INDEX idx_jobs_active_kind ON jobs(kind) WHERE status IN ('queued', 'running')")
+    cursor.execute('CREATE INDEX idx_jobs_created ON jobs(created_at)')
+
+
+def _migrate_cycle_progress(cursor):
+    """Latest live progress snapshot per alert cycle, written by the scheduler process for the web workers"""
+    cursor.execute('''
+        CREATE TABLE cycle_progress (
+            cycle TEXT PRIMARY KEY,
+            updated REAL NOT NULL,
+            snapshot TEXT NOT NULL
+        )
+    ''')
+
+
+def _migrate_location_run_date(cursor):
+    """Local date of each location's last 8:00 AM run, claimed atomically so no two processes send it twice"""
+    cursor.execute('ALTER TABLE locations ADD COLUMN last_run_date TEXT')
+
+
+def _migrate_deliveries_sent_at(cursor):
+    """Lets old delivery history be pruned without scanning the whole table"""
+    cursor.execute('CREATE INDEX idx_deliveries_sent_at ON deliveries(sent_at)')
+
+
+def _migrate_progress_listeners(cursor):
+    """Web workers with a dashboard connected, so the scheduler only publishes progress while someone watches"""
+    cursor.execute('''
+        CREATE TABLE progress_listeners (
+            pid INTEGER PRIMARY KEY,
+            seen REAL NOT NULL
+        )
+    ''')
+
+
+# Applied in order; PRAGMA user_version records the last one applied. Never edit a released one.
+MIGRATIONS = [
+    (1, 'legacy subscribers table', _migrate_legacy_subscribers),
+    (2, 'normalized locations, alert settings and deliveries', _migrate_normalized_schema),
+    (3, 'location coordinates', _migrate_location_coordinates),
+    (4, 'admin jobs', _migrate_jobs),
+    (5, 'live cycle progress', _migrate_cycle_progress),
+    (6, 'location run dates', _migrate_location_run_date),
+    (7, 'delivery history retention', _migrate_deliveries_sent_at),
+    (8, 'progress listeners', _migrate_progress_listeners),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(db_path=DATABASE_PATH):
+    conn = connect(db_path)
+    try:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def init_db(db_path=DATABASE_PATH):
+    """Bring the database up to the latest schema; returns the migrations applied"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    applied = []
+    try:
+        # One writer at a time, so concurrent processes don't run the same migration twice
+        conn.execute('BEGIN IMMEDIATE')
+        current = conn.execute('PRAGMA user_version').fetchone()[0]
+        cursor = conn.cursor()
+        for version, description, migrate in MIGRATIONS:
+            if version > current:
+                migrate(cursor)
+                applied.append((version, description))
+        if applied:
+            conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+    for version, description in applied:
+        logger.info(f"🗄️ Applied database migration {version}: {description}", extra={'schema_version': version})
+    return [version for version, _ in applied]
+
+
+def location_id(cursor, city, zipcode, country_code):
+    """Id of the locations row for a city/zipcode/country, created on first use"""
+    key = _location_key_text(city, zipcode, country_code)
+    cursor.execute('SELECT id FROM locations WHERE location_key = ?', (key,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    cursor.execute('INSERT INTO locations (location_key, city, zipcode, country_code) VALUES (?, ?, ?, ?)',
+                   (key, city.strip(), (zipcode or '').strip(), country_code.strip().upper()))
+    return cursor.lastrowid
+
+
+def settings_id(cursor, alert_rules):
+    """Id of the alert_settings row for a rules JSON string, or None for the default rules"""
+    if not alert_rules:
+        return None
+    # Stored canonically so equal rule lists share one row
+    try:
+        alert_rules = json.dumps(json.loads(alert_rules), separators=(',', ':'))
+    except ValueError:
+        pass  # Kept as is; compile_rules falls back to the defaults for it
+    cursor.execute('SELECT id FROM alert_settings WHERE alert_rules = ?', (alert_rules,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    cursor.execute('INSERT INTO alert_settings (alert_rules) VALUES (?)', (alert_rules,))
+    return cursor.lastrowid
+
+
+def upsert_subscriber(cursor, email, city, zipcode, country_code, alert_rules=None, subscribed_date=None):
+    """Subscribe (or re-subscribe) an email to a location, bumping its version for the subscriber index"""
+    values = (location_id(cursor, city, zipcode, country_code), settings_id(cursor, alert_rules),
+              subscribed_date or datetime.now())
+    cursor.execute('''
+        UPDATE subscribers
+        SET location_id = ?, settings_id = ?, subscribed_date = ?, is_active = 1, version = ''' + NEXT_VERSION_SQL + '''
+        WHERE email = ?
+    ''', values + (email,))
+    if cursor.rowcount == 0:
+        cursor.execute('''
+            INSERT INTO subscribers (email, location_id, settings_id, subscribed_date, is_active, version)
+            VALUES (?, ?, ?, ?, 1, ''' + NEXT_VERSION_SQL + ''')
+        ''', (email,) + values)
+
+
+def deactivate_subscriber(cursor, email):
+    """Unsubscribe an email; returns whether it was found"""
+    cursor.execute('UPDATE subscribers SET is_active = 0, version = ' + NEXT_VERSION_SQL + ' WHERE email = ?',
+                   (email,))
+    return cursor.rowcount > 0
+
+
+def prune_deliveries(db_path, retention_days, now=None):
+    """Delete delivery history older than retention_days (0 keeps everything); returns the rows deleted"""
+    if retention_days <= 0:
+        return 0
+    cutoff = (now or datetime.now()) - timedelta(days=retention_days)
+    conn = connect(db_path)
+    try:
+        with conn:
+            return conn.execute('DELETE FROM deliveries WHERE sent_at < ?', (cutoff,)).rowcount
+    finally:
+        conn.close()
+
+
+# Read entirely from the offset and subscriber location indexes, without touching either table
+BUCKET_COUNTS_SQL = '''
+    SELECT l.utc_offset, COUNT(DISTINCT l.id), COUNT(*)
+    FROM locations l JOIN subscribers s ON s.location_id = l.id AND s.is_active = 1
+    GROUP BY l.utc_offset ORDER BY l.utc_offset
+'''
+
+
+def bucket_counts(db_path=DATABASE_PATH):
+    """Active subscribers per UTC offset bucket: [(offset or None, locations, subscribers)]"""
+    conn = connect(db_path)
+    try:
+        return conn.execute(BUCKET_COUNTS_SQL).fetchall()
+    finally:
+        conn.close()
@@ -0,0 +1,109 @@
+"""
+Compact Forecast
+Array-backed 5-day forecast with per-local-day rollups computed once at ingest
+"""
+
+from array import array
+from datetime import datetime, timedelta, timezone
+
+# OpenWeatherMap condition id groups: 2xx thunderstorm, 3xx drizzle, 5xx rain, 6xx snow
+PRECIPITATION_GROUPS = (2, 3, 5, 6)
+
+# Each /forecast entry covers a 3-hour step
+STEP_HOURS = 3
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class DayRollup:
+    """Aggregates for one local calendar day of a forecast"""
+    __slots__ = ('date', 'high', 'low', 'rain_hours', 'max_pop')
+
+    def __init__(self, date, temp, pop, is_wet):
+        self.date = date
+        self.high = temp
+        self.low = temp
+        self.rain_hours = STEP_HOURS if is_wet else 0
+        self.max_pop = pop
+
+    def add(self, temp, pop, is_wet):
+        if temp > self.high:
+            self.high = temp
+        if temp < self.low:
+            self.low = temp
+        if is_wet:
+            self.rain_hours += STEP_HOURS
+        if pop > self.max_pop:
+            self.max_pop = pop
+
+    def to_dict(self):
+        return {
+            'date': self.date.isoformat(),
+            'high': round(self.high, 1),
+            'low': round(self.low, 1),
+            'rain_hours': self.rain_hours,
+            'max_pop': round(self.max_pop, 2)
+        }
+
+
+def is_precipitation(condition_id):
+    """Whether an OpenWeatherMap condition id means rain, drizzle, thunderstorm or snow"""
+    return condition_id // 100 in PRECIPITATION_GROUPS
+
+
+class CompactForecast:
+    """A /forecast payload reduced to parallel arrays plus local-day rollups"""
+    __slots__ = ('offset', 'timestamps', 'temps', 'pops', 'condition_ids', 'days')
+
+    def __init__(self, offset=0):
+        self.offset = offset  # Location's UTC offset in seconds
+        self.timestamps = array('q')
+        self.temps = array('f')
+        self.pops = array('f')
+        self.condition_ids = array('H')
+        self.days = {}  # local date -> DayRollup
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @classmethod
+    def from_owm(cls, forecast_data, offset=None):
+        """Convert an OpenWeatherMap /forecast response; returns None if it has no entries"""
+        if not forecast_data or not forecast_data.get('list'):
+            return None
+        if offset is None:
+            offset = forecast_data.get('city', {}).get('timezone', 0)
+
+        forecast = cls(offset)
+        for item in forecast_data['list']:
+            weather = item.get('weather') or [{}]
+            forecast.append(item['dt'], item['main']['temp'], item.get('pop', 0.0), weather[0].get('id', 800))
+        return forecast
+
+    def append(self, timestamp, temp, pop, condition_id):
+        """Add one forecast step and fold it into its local day's rollup"""
+        self.timestamps.append(timestamp)
+        self.temps.append(temp)
+        self.pops.append(pop)
+        self.condition_ids.append(condition_id)
+
+        # Stored as float32; roll up the stored value so both views agree
+        temp = self.temps[-1]
+        pop = self.pops[-1]
+        local_date = (_EPOCH + timedelta(seconds=timestamp + self.offset)).date()
+        is_wet = is_precipitation(condition_id)
+        day = self.days.get(local_date)
+        if day is None:
+            self.days[local_date] = DayRollup(local_date, temp, pop, is_wet)
+        else:
+            day.add(temp, pop, is_wet)
+
+    def local_date(self, now_utc=None):
+        """Today's date in the forecast's location"""
+        if now_utc is None:
+            now_utc = datetime.now(timezone.utc).replace(tzinfo=None)
+        return (now_utc + timedelta(seconds=self.offset)).date()
+
+    def today(self, now_utc=None):
+        """Rollup for the location's current local day, or None if the forecast doesn't cover it"""
+        return self.days.get(self.local_date(now_utc))
@@ -0,0 +1,152 @@
+"""
+Forecast Service
+Read-only forecasts for the cities in the offline location index, computed
+once per city and kept in process memory. Stale entries are served while one
+background refresh runs, and concurrent misses for a city share one fetch.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from weather_checker import WeatherChecker
+from location_index import get_location_index
+from subscriber_index import utc_now
+from app_logging import get_logger
+from config import FORECAST_API_TTL, FORECAST_API_STALE_SECONDS
+
+logger = get_logger('forecast_service')
+
+
+class ForecastUnavailable(Exception):
+    """The provider couldn't be reached and nothing is cached for the location"""
+
+
+class ForecastEntry:
+    """One computed forecast: the payload, its serialized body and ETag, and when it goes stale"""
+    __slots__ = ('payload', 'body', 'etag', 'expires_at')
+
+    def __init__(self, payload, expires_at):
+        self.payload = payload
+        self.body = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+        self.etag = hashlib.blake2b(self.body.encode('utf-8'), digest_size=8).hexdigest()
+        self.expires_at = expires_at
+
+
+class ForecastService:
+    def __init__(self, weather_checker_factory=WeatherChecker, location_index=None, ttl=FORECAST_API_TTL,
+                 stale_seconds=FORECAST_API_STALE_SECONDS, clock=time.monotonic, now_utc=utc_now):
+        self.weather_checker_factory = weather_checker_factory
+        self.location_index = location_index or get_location_index()
+        self.ttl = ttl
+        self.stale_seconds = stale_seconds  # How long past its TTL an entry is served while refreshing
+        self.clock = clock
+        self.now_utc = now_utc
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.fetches = 0  # Upstream refreshes actually run
+        self._entries = {}  # city id -> ForecastEntry
+        self._in_flight = {}  # city id -> Event set when its refresh finishes
+        self._lock = threading.Lock()
+
+    def get(self, city_id):
+        """Forecast entry for a city by its location index id (not a locations.id), or None if unknown"""
+        location = self.location_index.get(city_id)
+        if location is None:
+            return None
+
+        entry = self._entries.get(city_id)
+        now = self.clock()
+        if entry is not None and now < entry.expires_at:
+            with self._lock:
+                self.hits += 1
+            return entry
+        if entry is not None and now < entry.expires_at + self.stale_seconds:
+            with self._lock:
+                self.stale_hits += 1
+            self._refresh(location, wait=False)
+            return entry
+
+        with self._lock:
+            self.misses += 1
+        self._refresh(location, wait=True)
+        # A failed refresh leaves any older entry in place: better late than nothing
+        entry = self._entries.get(city_id)
+        if entry is None:
+            raise ForecastUnavailable(f"No forecast available for {location.city}, {location.country_code}")
+        return entry
+
+    def cache_control(self, entry):
+        """Cache-Control header letting clients and proxies reuse an entry for as long as this process does"""
+        max_age = max(0, int(entry.expires_at - self.clock()))
+        return f"public, max-age={max_age}, stale-while-revalidate={self.stale_seconds}"
+
+    def _refresh(self, location, wait):
+        """Start a refresh unless one is already running for the location; optionally wait for it"""
+        with self._lock:
+            # Refreshed by someone else since the caller looked
+            entry = self._entries.get(location.id)
+            if entry is not None and self.clock() < entry.expires_at:
+                return
+            done = self._in_flight.get(location.id)
+            leader = done is None
+            if leader:
+                done = self._in_flight[location.id] = threading.Event()
+
+        if leader:
+            if wait:
+                self._run_refresh(location, done)
+            else:
+                threading.Thread(target=self._run_refresh, args=(location, done),
+                                 name=f'forecast-{location.id}', daemon=True).start()
+        elif wait:
+            done.wait()
+
+    def _run_refresh(self, location, done):
+        entry = None
+        try:
+            payload = self._fetch(location)
+            if payload is not None:
+                entry = ForecastEntry(payload, self.clock() + self.ttl)
+        except Exception as e:
+            logger.warning("⚠️ Forecast refresh failed", extra={'location': location.city, 'error': str(e)})
+        finally:
+            with self._lock:
+                if entry is not None:
+                    self._entries[location.id] = entry
+                del self._in_flight[location.id]
+            done.set()
+
+    def _fetch(self, location):
+        with self._lock:
+            self.fetches += 1
+        weather_checker = self.weather_checker_factory()
+        weather_data = weather_checker.get_weather_data_for_location(location.city, location.country_code)
+        if not weather_data:
+            return None
+        forecast = weather_checker.get_compact_forecast_for_location(location.city, location.country_code)
+        now_utc = self.now_utc()
+        analysis = weather_checker.analyze_weather(weather_data, forecast, now_utc=now_utc)
+        if not analysis:
+            return None
+
+        # Today onwards, in the location's local time
+        days = sorted((day for day in forecast.days.values() if day.date >= forecast.local_date(now_utc)),
+                      key=lambda day: day.date) if forecast else []
+        return {
+            'location': location.to_dict(),
+            'updated_at': now_utc.isoformat(timespec='seconds') + 'Z',
+            'current_temperature': analysis['current_temperature'],
+            'daily_high': analysis['daily_high'],
+            'condition': analysis['condition'],
+            'description': analysis['description'],
+            'notifications': analysis['notifications'],  # Under the default umbrella + sunscreen rules
+            'today': analysis.get('today'),
+            'days': [day.to_dict() for day in days]
+        }
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'stale_hits': self.stale_hits,
+                    'misses': self.misses, 'fetches': self.fetches, 'in_flight': len(self._in_flight)}
@@ -0,0 +1,139 @@
+"""
+Geo Clustering
+Groups nearby locations so one weather fetch serves all of them: coordinates
+are snapped to a grid of cell_km cells, or merged with an earlier location
+within cell_km. Only locations at the same UTC offset share a cluster, so a
+cluster is always due at the same time.
+"""
+
+import math
+import threading
+from config import GEO_CLUSTER_MODE, GEO_CLUSTER_KM
+
+KM_PER_DEGREE = 111.32
+EARTH_RADIUS_KM = 6371.0
+
+# Weather checker lookups a cluster shares; all take (location, country_code)
+SHARED_LOOKUPS = ('get_weather_data_for_location', 'get_forecast_data_for_location',
+                  'get_compact_forecast_for_location')
+
+
+def grid_cell(latitude, longitude, cell_km):
+    """(row, column) of the roughly cell_km-square grid cell containing a point"""
+    row = math.floor(latitude * KM_PER_DEGREE / cell_km)
+    # Columns get wider in degrees towards the poles, so cells stay cell_km wide on the ground
+    center = math.radians((row + 0.5) * cell_km / KM_PER_DEGREE)
+    width = cell_km / (KM_PER_DEGREE * max(math.cos(center), 0.01))
+    return row, math.floor(longitude / width)
+
+
+def distance_km(latitude1, longitude1, latitude2, longitude2):
+    """Great-circle distance between two points"""
+    phi1, phi2 = math.radians(latitude1), math.radians(latitude2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(longitude2 - longitude1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def cluster_groups(groups, mode=GEO_CLUSTER_MODE, cell_km=GEO_CLUSTER_KM):
+    """Split location groups into clusters that share one fetch: [[representative, *members]]
+
+    Locations without coordinates or a known offset yet are clusters of their own.
+    """
+    if mode not in ('grid', 'radius'):
+        return [[group] for group in groups]
+
+    clusters = []
+    by_cell = {}  # (offset, row, column) -> clusters ('grid': exactly one)
+    for group in sorted(groups, key=lambda group: group.key):
+        if group.latitude is None or group.longitude is None or group.offset is None:
+            clusters.append([group])
+            continue
+        row, column = grid_cell(group.latitude, group.longitude, cell_km)
+
+        cluster = None
+        if mode == 'grid':
+            cell = by_cell.get((group.offset, row, column))
+            cluster = cell[0] if cell else None
+        else:
+            # Join the first cluster whose representative is within the radius; with
+            # radius-sized cells it can only be in this cell or a neighbouring one
+            for cell in [(group.offset, row + dr, column + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)]:
+                for candidate in by_cell.get(cell, ()):
+                    leader = candidate[0]
+                    if distance_km(leader.latitude, leader.longitude, group.latitude, group.longitude) <= cell_km:
+                        cluster = candidate
+                        break
+                if cluster is not None:
+                    break
+
+        if cluster is None:
+            cluster = []
+            clusters.append(cluster)
+            by_cell.setdefault((group.offset, row, column), []).append(cluster)
+        cluster.append(group)
+    return clusters
+
+
+class ClusterFetcher:
+    """Weather checker stand-in for one cycle: every member of a cluster is served its representative's
+    responses and analysis, fetched once even when members are looked up concurrently"""
+
+    def __init__(self, weather_checker, clusters):
+        self.weather_checker = weather_checker
+        self.clusters = len(clusters)
+        self.locations = sum(len(cluster) for cluster in clusters)
+        self.requests = 0  # Lookups asked for
+        self.fetches = 0  # Lookups actually made
+        self._representatives = {}  # (location, country_code) -> representative group
+        for cluster in clusters:
+            for group in cluster[1:]:
+                self._representatives[(group.location, group.country_code)] = cluster[0]
+        self._results = {}  # lookup key -> [lock, done, result]
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name in SHARED_LOOKUPS:
+            return lambda location, country_code: self._shared(name, location, country_code)
+        return getattr(self.weather_checker, name)
+
+    def _shared(self, lookup, location, country_code):
+        representative = self._representatives.get((location, country_code))
+        if representative is not None:
+            location, country_code = representative.location, representative.country_code
+        return self._once((lookup, location, country_code),
+                          lambda: getattr(self.weather_checker, lookup)(location, country_code))
+
+    def analyze_weather(self, weather_data, forecast_data=None, rules=None, now_utc=None):
+        if rules is not None or not weather_data:
+            return self.weather_checker.analyze_weather(weather_data, forecast_data, rules, now_utc)
+        # Members of a cluster hold the same response objects, so they share one analysis
+        return self._once(('analyze', id(weather_data), id(forecast_data), now_utc),
+                          lambda: self.weather_checker.analyze_weather(weather_data, forecast_data, now_utc=now_utc),
+                          count=False)
+
+    def _once(self, key, compute, count=True):
+        with self._lock:
+            self.requests += count
+            entry = self._results.get(key)
+            if entry is None:
+                entry = self._results[key] = [threading.Lock(), False, None]
+        with entry[0]:
+            if not entry[1]:
+                try:
+                    entry[2] = compute()
+                finally:
+                    if count:
+                        with self._lock:
+                            self.fetches += 1
+                # A failed lookup (None or an exception) isn't remembered; the next member retries it
+                entry[1] = entry[2] is not None
+        return entry[2]
+
+    def stats(self):
+        """Clusters formed and API lookups saved by sharing them"""
+        with self._lock:
+            saved = self.requests - self.fetches
+            return {'locations': self.locations, 'clusters': self.clusters, 'lookups': self.requests,
+                    'fetches': self.fetches, 'fetches_saved': saved,
+                    'saved_percent': round(saved * 100 / self.requests, 1) if self.requests else 0.0}
@@ -0,0 +1,68 @@
+"""
+Gunicorn configuration
+The app is preloaded once in the master (schema setup runs once), workers are
+forked from it, and exactly one dedicated process runs the alert scheduler,
+restarted by the master whenever it exits.
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from config import WEB_CONCURRENCY, SCHEDULER_MODE
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+workers = WEB_CONCURRENCY
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = True
+timeout = 60
+
+_scheduler_process = None
+_stopping = threading.Event()
+
+SCHEDULER_RESTART_MAX_DELAY = 60  # Seconds between restarts of a scheduler that keeps crashing
+SCHEDULER_HEALTHY_SECONDS = 600  # A scheduler that ran this long restarts without delay
+
+def _start_scheduler(server):
+    global _scheduler_process
+    # A fresh interpreter, so forked web workers share no process state with it
+    _scheduler_process = subprocess.Popen([sys.executable, '-m', 'alert_engine'])
+    server.log.info("Scheduler process started (pid %s)", _scheduler_process.pid)
+
+def _supervise_scheduler(server):
+    """Restart the scheduler whenever it exits (crash, OOM kill), backing off if it keeps failing"""
+    failures = 0
+    while True:
+        started = time.monotonic()
+        code = _scheduler_process.wait()
+        if _stopping.is_set():
+            return
+        failures = 0 if time.monotonic() - started >= SCHEDULER_HEALTHY_SECONDS else failures + 1
+        delay = min(2 ** failures - 1, SCHEDULER_RESTART_MAX_DELAY)
+        server.log.error("Scheduler process %s exited with code %s; restarting in %ss",
+                         _scheduler_process.pid, code, delay)
+        if _stopping.wait(delay):
+            return
+        _start_scheduler(server)
+
+def when_ready(server):
+    """Start the single scheduler process once the master is up, and keep it running"""
+    if SCHEDULER_MODE != 'embedded':
+        server.log.info("Scheduler disabled in web service (SCHEDULER_MODE=%s)", SCHEDULER_MODE)
+        return
+    _start_scheduler(server)
+    threading.Thread(target=_supervise_scheduler, args=(server,), name='scheduler-supervisor',
+                     daemon=True).start()
+
+def on_exit(server):
+    """Stop the scheduler process with the master"""
+    _stopping.set()
+    if _scheduler_process is not None and _scheduler_process.poll() is None:
+        _scheduler_process.terminate()
+        try:
+            _scheduler_process.wait(10)
+        except subprocess.TimeoutExpired:
+            server.log.warning("Scheduler process %s ignored SIGTERM; killing it", _scheduler_process.pid)
+            _scheduler_process.kill()
+            _scheduler_process.wait()
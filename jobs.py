@@ -0,0 +1,257 @@
+"""
+Jobs
+Admin bulk actions run as tracked background jobs on a small worker pool.
+Status, progress counters and cancel requests live in the jobs table, so any
+web worker can report on or cancel a job another worker is running, and only
+one job of each kind can be queued or running at a time.
+"""
+
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from database import connect
+from subscriber_index import utc_now
+from app_logging import get_logger
+from config import DATABASE_PATH, JOB_WORKERS, JOB_STALE_SECONDS, JOB_HISTORY
+
+logger = get_logger('jobs')
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+_COLUMNS = 'id, kind, status, created_at, started_at, finished_at, total, progress, cancel_requested, result, error'
+
+
+def _timestamp():
+    return utc_now().isoformat(timespec='seconds')
+
+
+def _job_dict(row):
+    job_id, kind, status, created_at, started_at, finished_at, total, progress, cancel_requested, result, error = row
+    return {
+        'id': job_id,
+        'kind': kind,
+        'status': status,  # queued, running, succeeded, failed or cancelled
+        'active': status in ACTIVE_STATUSES,
+        'created_at': created_at,
+        'started_at': started_at,
+        'finished_at': finished_at,
+        'total': total,
+        'progress': json.loads(progress),
+        'cancel_requested': bool(cancel_requested),
+        'result': json.loads(result) if result else None,
+        'error': error
+    }
+
+
+class Job:
+    """Handle a running job uses to report progress and notice it has been cancelled"""
+
+    def __init__(self, runner, job_id, flush_interval):
+        self.runner = runner
+        self.id = job_id
+        self.total = None
+        self.progress = {}
+        self.flush_interval = flush_interval  # Min seconds between progress writes
+        self._cancelled = False
+        self._flushed_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def set_total(self, total):
+        with self._lock:
+            self.total = total
+        self.flush(force=True)
+
+    def advance(self, **counters):
+        """Add to the job's progress counters, e.g. advance(locations=1)"""
+        with self._lock:
+            for name, amount in counters.items():
+                self.progress[name] = self.progress.get(name, 0) + amount
+        self.flush()
+
+    def flush(self, force=False):
+        """Write progress and a heartbeat, and pick up a cancel request made from any worker"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._flushed_at < self.flush_interval:
+                return
+            self._flushed_at = now
+            total, progress = self.total, dict(self.progress)
+        if self.runner._save_progress(self.id, total, progress):
+            self._cancelled = True
+
+
+class JobRunner:
+    def __init__(self, db_path=DATABASE_PATH, workers=JOB_WORKERS, stale_seconds=JOB_STALE_SECONDS,
+                 history=JOB_HISTORY, flush_interval=1.0):
+        self.db_path = db_path
+        self.workers = workers
+        self.stale_seconds = stale_seconds
+        self.history = history
+        self.flush_interval = flush_interval
+        self._executor = None  # Started on first submit: threads don't survive gunicorn's fork
+        self._running = {}  # job id -> Job, for jobs queued or running in this process
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, func, *args, **kwargs):
+        """Queue func(job, *args, **kwargs) in the background; returns (job dict, created).
+
+        While a job of the same kind is queued or running in any worker, that job
+        is returned with created=False instead of starting a second one.
+        """
+        job_id = secrets.token_hex(8)
+        conn = connect(self.db_path)
+        try:
+            while True:
+                with conn:
+                    self._expire_abandoned(conn)
+                    try:
+                        conn.execute("INSERT INTO jobs (id, kind, status, created_at, heartbeat) "
+                                     "VALUES (?, ?, 'queued', ?, ?)", (job_id, kind, _timestamp(), time.time()))
+                    except sqlite3.IntegrityError:
+                        row = conn.execute(f'SELECT {_COLUMNS} FROM jobs WHERE kind = ? AND status IN (?, ?)',
+                                           (kind,) + ACTIVE_STATUSES).fetchone()
+                        if row is not None:
+                            return _job_dict(row), False
+                        continue  # It finished in between; try again
+                    self._prune(conn)
+                break
+        finally:
+            conn.close()
+
+        job = Job(self, job_id, self.flush_interval)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            self._running[job_id] = job
+            self._futures[job_id] = self._executor.submit(self._run, job, kind, func, args, kwargs)
+        logger.info("🧵 Job queued", extra={'job': job_id, 'kind': kind})
+        return self.get(job_id), True
+
+    def get(self, job_id):
+        """Job dict, or None if there's no such job"""
+        conn = connect(self.db_path)
+        try:
+            row = conn.execute(f'SELECT {_COLUMNS} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return _job_dict(row) if row else None
+
+    def recent(self, limit=10):
+        """Newest jobs first"""
+        conn = connect(self.db_path)
+        try:
+            rows = conn.execute(f'SELECT {_COLUMNS} FROM jobs ORDER BY created_at DESC, rowid DESC LIMIT ?',
+                                (limit,)).fetchall()
+        finally:
+            conn.close()
+        return [_job_dict(row) for row in rows]
+
+    def cancel(self, job_id):
+        """Ask a job to stop; returns False if it had already finished.
+
+        A queued job never starts. A running job stops at its next progress
+        update, and whatever it has already started is allowed to finish.
+        """
+        conn = connect(self.db_path)
+        try:
+            with conn:
+                cursor = conn.execute("UPDATE jobs SET status = 'cancelled', cancel_requested = 1, finished_at = ? "
+                                      "WHERE id = ? AND status = 'queued'", (_timestamp(), job_id))
+                if cursor.rowcount == 0:
+                    cursor = conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'",
+                                          (job_id,))
+                requested = cursor.rowcount > 0
+        finally:
+            conn.close()
+        with self._lock:
+            job = self._running.get(job_id)
+        if requested and job is not None:
+            job._cancelled = True
+        if requested:
+            logger.info("🛑 Job cancel requested", extra={'job': job_id})
+        return requested
+
+    def wait(self, job_id, timeout=None):
+        """Wait for a job started by this runner to finish; returns its job dict"""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            wait_futures([future], timeout)
+        return self.get(job_id)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _run(self, job, kind, func, args, kwargs):
+        started = time.perf_counter()
+        status, result, error = 'succeeded', None, None
+        try:
+            # Cancelled while still queued
+            if not self._update(job.id, "status = 'running', started_at = ?, heartbeat = ?",
+                                (_timestamp(), time.time()), "status = 'queued'"):
+                return
+            logger.info("🧵 Job started", extra={'job': job.id, 'kind': kind})
+            try:
+                result = func(job, *args, **kwargs)
+            except Exception as e:
+                status, error = 'failed', str(e)
+                logger.error("❌ Job failed", extra={'job': job.id, 'kind': kind, 'error': str(e)})
+            job.flush(force=True)
+            if status == 'succeeded' and job.cancelled:
+                status = 'cancelled'
+            self._update(job.id, 'status = ?, finished_at = ?, result = ?, error = ?',
+                         (status, _timestamp(), json.dumps(result) if result is not None else None, error))
+            logger.info("🏁 Job finished", extra={'job': job.id, 'kind': kind, 'status': status,
+                                                  'seconds': round(time.perf_counter() - started, 3)})
+        finally:
+            with self._lock:
+                self._running.pop(job.id, None)
+                self._futures.pop(job.id, None)
+
+    def _update(self, job_id, assignments, values, condition=None):
+        """Update one job row; returns whether it matched"""
+        where = 'id = ?' + (f' AND {condition}' if condition else '')
+        conn = connect(self.db_path)
+        try:
+            with conn:
+                return conn.execute(f'UPDATE jobs SET {assignments} WHERE {where}', values + (job_id,)).rowcount > 0
+        finally:
+            conn.close()
+
+    def _save_progress(self, job_id, total, progress):
+        """Store progress and a heartbeat; returns whether a cancel has been requested"""
+        conn = connect(self.db_path)
+        try:
+            with conn:
+                conn.execute('UPDATE jobs SET total = ?, progress = ?, heartbeat = ? WHERE id = ?',
+                             (total, json.dumps(progress, sort_keys=True), time.time(), job_id))
+                row = conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return bool(row and row[0])
+
+    def _expire_abandoned(self, conn):
+        """Fail active jobs whose worker stopped reporting (e.g. it was restarted), so they don't block new ones"""
+        expired = conn.execute("UPDATE jobs SET status = 'failed', finished_at = ?, error = ? "
+                               "WHERE status IN (?, ?) AND heartbeat < ?",
+                               (_timestamp(), f'Abandoned: no progress for {self.stale_seconds}s')
+                               + ACTIVE_STATUSES + (time.time() - self.stale_seconds,)).rowcount
+        if expired:
+            logger.warning("⚠️ Expired abandoned jobs", extra={'jobs': expired})
+
+    def _prune(self, conn):
+        """Keep the newest finished jobs, up to the history limit"""
+        conn.execute('DELETE FROM jobs WHERE status NOT IN (?, ?) AND id NOT IN '
+                     '(SELECT id FROM jobs ORDER BY created_at DESC, rowid DESC LIMIT ?)',
+                     ACTIVE_STATUSES + (self.history,))
@@ -0,0 +1,144 @@
+"""
+Location Index
+Offline city and postal code lookup for autocomplete and subscription
+validation, backed by the bundled data/locations.csv
+"""
+
+import csv
+import threading
+import unicodedata
+from bisect import bisect_left
+from config import LOCATIONS_DATA_PATH
+
+# Matches gathered before ranking; keeps one-letter prefixes cheap on large datasets
+MAX_CANDIDATES = 200
+
+
+class LocationEntry:
+    """One city from the dataset; rank is its position in the file (lower = more prominent)"""
+    __slots__ = ('id', 'city', 'country_code', 'zipcodes', 'rank')
+
+    def __init__(self, location_id, city, country_code, zipcodes, rank):
+        self.id = location_id
+        self.city = city
+        self.country_code = country_code
+        self.zipcodes = zipcodes
+        self.rank = rank
+
+    def to_dict(self, zipcode=None):
+        result = {'id': self.id, 'city': self.city, 'country_code': self.country_code,
+                  'label': f"{self.city}, {self.country_code}"}
+        if zipcode:
+            result['zipcode'] = zipcode
+            result['label'] = f"{self.city}, {zipcode}, {self.country_code}"
+        return result
+
+
+def normalize(text):
+    """Case- and accent-insensitive search key: 'São Paulo ' -> 'sao paulo'"""
+    decomposed = unicodedata.normalize('NFKD', text.strip().lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class LocationIndex:
+    """Sorted name and postal code arrays searched with bisect; loaded on first use"""
+
+    def __init__(self, path=LOCATIONS_DATA_PATH):
+        self.path = path
+        self._entries = None  # id -> LocationEntry
+        self._names = []  # Sorted (normalized city, rank, id)
+        self._zipcodes = []  # Sorted (zipcode, id)
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        with self._lock:
+            if self._entries is not None:
+                return
+            entries = {}
+            names = []
+            zipcodes = []
+            with open(self.path, newline='', encoding='utf-8') as f:
+                for rank, row in enumerate(csv.DictReader(f)):
+                    entry = LocationEntry(int(row['id']), row['city'], row['country_code'].upper(),
+                                          tuple(row['zipcodes'].split()), rank)
+                    entries[entry.id] = entry
+                    names.append((normalize(entry.city), rank, entry.id))
+                    zipcodes.extend((zipcode, entry.id) for zipcode in entry.zipcodes)
+            names.sort()
+            zipcodes.sort()
+            self._names = names
+            self._zipcodes = zipcodes
+            self._entries = entries
+
+    def __len__(self):
+        self._load()
+        return len(self._entries)
+
+    def get(self, location_id):
+        self._load()
+        return self._entries.get(location_id)
+
+    def search(self, prefix, country_code=None, limit=10):
+        """Cities (or postal codes, for a numeric prefix) starting with prefix, most prominent first"""
+        self._load()
+        key = normalize(prefix)
+        if not key:
+            return []
+        country_code = country_code.upper() if country_code else None
+
+        if key[0].isdigit():
+            results = []
+            for zipcode, location_id in self._prefix_matches(self._zipcodes, key):
+                entry = self._entries[location_id]
+                if country_code is None or entry.country_code == country_code:
+                    results.append(entry.to_dict(zipcode))
+                    if len(results) == limit:
+                        break
+            return results
+
+        matches = []
+        for _, rank, location_id in self._prefix_matches(self._names, key):
+            entry = self._entries[location_id]
+            if country_code is None or entry.country_code == country_code:
+                matches.append(entry)
+                if len(matches) == MAX_CANDIDATES:
+                    break
+        matches.sort(key=lambda entry: entry.rank)
+        return [entry.to_dict() for entry in matches[:limit]]
+
+    def _prefix_matches(self, items, key):
+        index = bisect_left(items, (key,))
+        while index < len(items) and items[index][0].startswith(key):
+            yield items[index]
+            index += 1
+
+    def resolve(self, city, zipcode, country_code):
+        """The dataset entry for a submitted location, or None if it can't be confirmed offline"""
+        self._load()
+        country_code = (country_code or '').strip().upper()
+        zipcode = (zipcode or '').strip()
+        key = normalize(city or '')
+
+        if zipcode:
+            # A postal code only confirms the location if it belongs to the city entered
+            for _, location_id in self._prefix_matches(self._zipcodes, zipcode):
+                entry = self._entries[location_id]
+                if zipcode in entry.zipcodes and entry.country_code == country_code and normalize(entry.city) == key:
+                    return entry
+            return None
+
+        for name, _, location_id in self._prefix_matches(self._names, key):
+            entry = self._entries[location_id]
+            if name == key and entry.country_code == country_code:
+                return entry
+        return None
+
+
+_default_index = LocationIndex()
+
+
+def get_location_index():
+    """Process-wide index over the bundled dataset"""
+    return _default_index
@@ -2,14 +2,38 @@
 """
 Weather Notification System
 Checks weather conditions and sends notifications for umbrella and sunscreen reminders
+
+Run without arguments for the interactive single-city menu, or with a
+subcommand to run the subscriber alert engine in batch (e.g. from cron):
+
+    python main.py run-cycle --workers 8
+    python main.py prefetch --workers 8
+    python main.py send-due --at 2024-06-01T15:00
+    python main.py bench --subscribers 10000 --locations 500 --workers 8
+    python main.py simulate --subscribers 5000 --workers 4
+    python main.py stats
+    python main.py history --city Seattle --days 30
 """
 
+import argparse
+import os
+import tempfile
 import time
 import schedule
-from datetime import datetime
+from datetime import datetime, timedelta
 from weather_checker import WeatherChecker
 from notification_sender import NotificationSender
-from config import CHECK_INTERVAL_MINUTES
+from transports import MemoryTransport
+from alert_engine import AlertEngine
+from app_logging import configure_logging
+from geo_cluster import cluster_groups
+from weather_archive import WeatherArchive, archive_path_for
+from database import connect, init_db, bucket_counts, schema_version
+from subscriber_index import utc_now
+from simulator import (DaySimulator, ReplayWeatherChecker, SIMULATED_OFFSETS, copy_database, format_offset,
+                       load_recording, memory_sender_factory, print_report, record_responses, seed_subscribers,
+                       synthetic_city, synthetic_responses)
+from config import CHECK_INTERVAL_MINUTES, CITY, COUNTRY_CODE, DATABASE_PATH, NOTIFICATION_HOUR
 
 class WeatherNotificationSystem:
     def __init__(self):
@@ -69,7 +93,8 @@ class WeatherNotificationSystem:
         """Run the weather check on a schedule"""
         print(f"🚀 Starting Weather Notification System")
         print(f"⏰ Checking weather every {CHECK_INTERVAL_MINUTES} minutes")
-        print(f"📍 Location: {self.weather_checker.get_weather_data()['name'] if self.weather_checker.get_weather_data() else 'Unknown'}")
+        weather_data = self.weather_checker.get_weather_data()
+        print(f"📍 Location: {weather_data['name'] if weather_data else 'Unknown'}")
         print("Press Ctrl+C to stop the application\n")
         
         # Schedule the job
@@ -86,8 +111,232 @@ class WeatherNotificationSystem:
         except KeyboardInterrupt:
             print("\n👋 Weather Notification System stopped by user")
 
+def print_summary(stats):
+    """Print a run's throughput and latency summary"""
+    summary = stats.summary()
+    print(f"\n📊 {summary['name']}: {summary['locations']} locations in {summary['duration_seconds']:.3f}s "
+          f"({summary['locations_per_second']} locations/s, {summary['alerts_per_second']} alerts/s)")
+    print(f"   ✉️ {summary['alerts_sent']} alerts sent, {summary['alerts_failed']} failed, {summary['errors']} errors")
+    print(f"   ⏱️ fetch to delivered: p50 {summary['p50_ms']}ms, p95 {summary['p95_ms']}ms, max {summary['max_ms']}ms")
+    for stage in summary['stages']:
+        print(f"   ⚙️ {stage['name']:<8} x{stage['workers']}: {stage['items']} items, {stage['errors']} errors, "
+              f"busy {stage['busy_ms']}ms, max queue {stage['max_queue']}")
+    clustering = summary['clustering']
+    if clustering:
+        print(f"   🗺️ {clustering['locations']} locations in {clustering['clusters']} clusters: "
+              f"{clustering['fetches']} of {clustering['lookups']} API lookups made "
+              f"({clustering['saved_percent']}% saved)")
+    change_detection = summary['change_detection']
+    if change_detection['analyses']:
+        print(f"   ♻️ unchanged forecasts: {change_detection['analyses_skipped']} of {change_detection['analyses']} "
+              f"analyses and {change_detection['renders_skipped']} of {change_detection['renders']} renders reused "
+              f"(skip ratio {change_detection['skip_ratio']})")
+    return summary
+
+
+def _parse_time(value):
+    """--at value: an ISO-8601 UTC timestamp"""
+    return datetime.fromisoformat(value)
+
+
+def run_command(args):
+    """Run one batch subcommand against the subscriber database"""
+    if args.command == 'bench':
+        return run_bench(args)
+    if args.command == 'simulate':
+        return run_simulation(args)
+    if args.command == 'record':
+        init_db(args.db)
+        return record_responses(args.db, args.out)
+    if args.command == 'history':
+        init_db(args.db)
+        return show_history(args)
+
+    init_db(args.db)
+    engine = AlertEngine(args.db)
+
+    if args.command == 'stats':
+        return show_stats(engine)
+    if args.command == 'run-cycle':
+        stats = engine.run_cycle(args.at, workers=args.workers, delivery_workers=args.delivery_workers)
+    elif args.command == 'send-due':
+        engine.subscriber_index.refresh()
+        engine.learn_offsets(args.at, workers=args.workers, recheck=False)
+        stats = engine.send_due(args.at, workers=args.workers, delivery_workers=args.delivery_workers)
+    elif args.command == 'send-all':
+        stats = engine.send_notifications_to_all(workers=args.workers,
+                                                  delivery_workers=args.delivery_workers)
+    else:
+        stats = engine.prefetch(workers=args.workers)
+    return print_summary(stats)
+
+
+def run_bench(args):
+    """Time a full 8:00 AM send over synthetic subscribers with a stub provider and in-memory transport"""
+    transport = MemoryTransport()
+    now_utc = utc_now().replace(hour=NOTIFICATION_HOUR, minute=0, second=0, microsecond=0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        # Every bench location is at UTC+0, so 08:00 UTC is 8:00 AM everywhere
+        seed_subscribers(db_path, [synthetic_city(0, i) for i in range(args.locations)], args.subscribers)
+        weather_checker = ReplayWeatherChecker(synthetic_responses(now_utc.date(), [0], args.locations),
+                                               latency_seconds=args.latency_ms / 1000)
+        engine = AlertEngine(db_path, weather_checker_factory=lambda: weather_checker,
+                             sender_factory=memory_sender_factory(transport))
+
+        print(f"🏁 Benchmark: {args.subscribers} subscribers in {args.locations} locations, "
+              f"{args.workers} workers, {args.latency_ms}ms simulated API latency")
+        started = time.perf_counter()
+        engine.subscriber_index.refresh()
+        print(f"   🗂️ Index loaded in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+        engine.learn_offsets(now_utc, workers=args.workers)
+        summary = print_summary(engine.send_due(now_utc, workers=args.workers,
+                                                delivery_workers=args.delivery_workers))
+
+    delivered = transport.stats()
+    print(f"   📦 {delivered['messages']} messages to {delivered['recipients']} recipients, {delivered['bytes']} bytes")
+    summary['transport'] = delivered
+    return summary
+
+
+def run_simulation(args):
+    """Replay a full day of scheduler cycles in simulated time and print the per-bucket report"""
+    with tempfile.TemporaryDirectory() as tmp:
+        shift_seconds = 0
+        if args.responses:
+            recorded_at, responses = load_recording(args.responses)
+            # Real subscribers, but simulated sends, offsets and run dates stay out of the real database
+            db_path = copy_database(args.db, os.path.join(tmp, 'simulation.db'))
+            # Forecasts start when they were recorded; the next day is the first one they fully cover
+            day = args.day or (recorded_at + timedelta(days=1)).date()
+            shift_seconds = (day - (recorded_at + timedelta(days=1)).date()).days * 86400
+        else:
+            day = args.day or utc_now().date()
+            db_path = os.path.join(tmp, 'simulation.db')
+            cities = [synthetic_city(offset, index) for offset in SIMULATED_OFFSETS
+                      for index in range(args.cities_per_offset)]
+            seed_subscribers(db_path, cities, args.subscribers)
+            responses = synthetic_responses(day, SIMULATED_OFFSETS, args.cities_per_offset)
+
+        simulator = DaySimulator(db_path, responses, day, shift_seconds=shift_seconds, step_seconds=args.step,
+                                 workers=args.workers, latency_seconds=args.latency_ms / 1000)
+        report = simulator.run()
+    print_report(report)
+    return report
+
+
+def show_stats(engine):
+    """Print subscriber, location and provider statistics"""
+    subscriber_index = engine.subscriber_index
+    subscriber_index.refresh()
+    groups = subscriber_index.all_groups()
+    unknown = len(subscriber_index.unknown_offset_groups())
+    print(f"👥 Active subscribers: {len(subscriber_index)}")
+    print(f"📍 Locations: {len(groups)} ({len(groups) - unknown} with a known UTC offset)")
+    for offset, locations, subscribers in bucket_counts(engine.db_path):
+        label = format_offset(offset) if offset is not None else 'unknown'
+        print(f"   🕗 {label:<10} {locations:>5} locations {subscribers:>7} subscribers")
+    print(f"🗄️ Schema version: {schema_version(engine.db_path)}")
+    if engine.cluster_mode != 'off':
+        clusters = cluster_groups(groups, engine.cluster_mode, engine.cluster_km)
+        print(f"🗺️ Geo clustering ({engine.cluster_mode}, {engine.cluster_km:g} km): {len(groups)} locations "
+              f"fetched as {len(clusters)} clusters")
+
+    weather_checker = WeatherChecker()
+    if weather_checker.cache is not None:
+        print(f"🗄️ Response cache: {weather_checker.cache.stats()}")
+    print(f"🔌 Circuit breaker: {weather_checker.breaker.stats()}")
+    return {'subscribers': len(subscriber_index), 'locations': len(groups)}
+
+
+def show_history(args):
+    """Print archived observations and alerts per location over the last --days days"""
+    conn = connect(args.db)
+    query = 'SELECT id, city, zipcode, country_code FROM locations'
+    params = ()
+    if args.city:
+        query += ' WHERE lower(city) = lower(?)'
+        params = (args.city.strip(),)
+    names = {location_id: ', '.join(part for part in (city, zipcode, country_code) if part)
+             for location_id, city, zipcode, country_code in conn.execute(query, params)}
+    conn.close()
+
+    end = utc_now()
+    start = end - timedelta(days=args.days)
+    archive = WeatherArchive(args.archive or archive_path_for(args.db))
+    summaries = [summary for location_id, summary in archive.aggregate(start, end).items() if location_id in names]
+    print(f"🗃️ {len(summaries)} locations with archived checks in the last {args.days} days")
+    for summary in sorted(summaries, key=lambda summary: names[summary['location_id']]):
+        alerts = ', '.join(f"{kind} {count}" for kind, count in summary['alerts'].items() if count) or 'none'
+        print(f"   📍 {names[summary['location_id']]}: {summary['observations']} checks, "
+              f"{summary['alert_runs']} with alerts ({alerts}), {summary['recipients']} emails; "
+              f"temperature {summary['min_temperature']:.0f}-{summary['max_temperature']:.0f}°F "
+              f"(avg {summary['avg_temperature']}), highest daily high {summary['max_daily_high']:.0f}°F")
+    return summaries
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="UmbrellaAlert batch commands")
+    subparsers = parser.add_subparsers(dest='command')
+
+    commands = {
+        'run-cycle': "One scheduler cycle: learn offsets, then send alerts where it's 8:00 AM",
+        'send-due': "Send alerts for locations where it's 8:00 AM",
+        'send-all': "Check every location now and send any alerts",
+        'prefetch': "Warm the response cache for every subscribed location",
+        'stats': "Show subscriber, location and cache statistics",
+    }
+    for name, help_text in commands.items():
+        command = subparsers.add_parser(name, help=help_text)
+        command.add_argument('--db', default=DATABASE_PATH, help="Subscriber database (default: %(default)s)")
+        command.add_argument('--workers', type=int, default=1, help="Locations fetched concurrently")
+        if name in ('run-cycle', 'send-due', 'send-all'):
+            command.add_argument('--delivery-workers', type=int, default=None,
+                                 help="Concurrent senders (default: DELIVERY_WORKERS or --workers)")
+        if name in ('run-cycle', 'send-due'):
+            command.add_argument('--at', type=_parse_time, default=None,
+                                 help="Pretend it is this UTC time, e.g. 2024-06-01T15:00")
+
+    bench = subparsers.add_parser('bench', help="Benchmark an 8:00 AM send with synthetic subscribers")
+    bench.add_argument('--subscribers', type=int, default=10000)
+    bench.add_argument('--locations', type=int, default=500)
+    bench.add_argument('--workers', type=int, default=1, help="Locations fetched concurrently")
+    bench.add_argument('--delivery-workers', type=int, default=None, help="Concurrent senders")
+    bench.add_argument('--latency-ms', type=float, default=0.0, help="Simulated weather API latency")
+
+    history = subparsers.add_parser('history', help="Show archived checks and alerts per location")
+    history.add_argument('--db', default=DATABASE_PATH, help="Subscriber database (default: %(default)s)")
+    history.add_argument('--archive', default=None, help="Archive directory (default: next to the database)")
+    history.add_argument('--city', default=None, help="Only locations in this city")
+    history.add_argument('--days', type=int, default=30, help="How far back to look (default: %(default)s)")
+
+    record = subparsers.add_parser('record', help="Record weather responses for every subscribed location")
+    record.add_argument('--db', default=DATABASE_PATH, help="Subscriber database (default: %(default)s)")
+    record.add_argument('--out', default='responses.json', help="Recording file (default: %(default)s)")
+
+    simulate = subparsers.add_parser('simulate', help="Replay a full day of scheduler cycles in simulated time")
+    simulate.add_argument('--responses', help="Recording from 'record' (default: synthetic cities at every offset)")
+    simulate.add_argument('--db', default=DATABASE_PATH, help="Subscriber database used with --responses")
+    simulate.add_argument('--day', type=lambda value: datetime.fromisoformat(value).date(), default=None,
+                          help="UTC day to simulate, e.g. 2024-06-01")
+    simulate.add_argument('--subscribers', type=int, default=5000, help="Synthetic subscribers")
+    simulate.add_argument('--cities-per-offset', type=int, default=2, help="Synthetic cities per UTC offset")
+    simulate.add_argument('--step', type=int, default=60, help="Simulated seconds between scheduler cycles")
+    simulate.add_argument('--workers', type=int, default=1, help="Locations fetched concurrently")
+    simulate.add_argument('--latency-ms', type=float, default=0.0, help="Simulated weather API latency")
+    return parser
+
+
 def main():
     """Main entry point"""
+    args = build_parser().parse_args()
+    configure_logging()
+    if args.command:
+        run_command(args)
+        return
+
     print("🌤️ Weather Notification System")
     print("=" * 40)
     
@@ -105,7 +354,7 @@ def main():
         print("✅ Weather API connection successful!")
         
         # Test email configuration
-        if weather_system.notification_sender.email_address:
+        if weather_system.notification_sender.is_configured():
             print("📧 Email configuration found")
         else:
             print("⚠️ Email configuration not found. Notifications will be disabled.")
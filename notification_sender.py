@@ -1,51 +1,114 @@
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
-from config import EMAIL_ADDRESS, EMAIL_PASSWORD, RECIPIENT_EMAIL
+from config import EMAIL_ADDRESS, RECIPIENT_EMAIL
+from transports import create_transport
+from app_logging import get_logger
+
+logger = get_logger('notification_sender')
+
+# Recipients of a batch are only listed in the envelope, never in the headers
+UNDISCLOSED_RECIPIENTS = 'undisclosed-recipients:;'
+
+# Stand-ins for the parts of a rendered alert that change from one send to the next
+TIME_FIELD = '%%time%%'
+TEMPERATURE_FIELD = '%%current_temperature%%'
 
 class NotificationSender:
-    def __init__(self):
+    def __init__(self, transport=None):
         self.email_address = EMAIL_ADDRESS
-        self.email_password = EMAIL_PASSWORD
         self.recipient_email = RECIPIENT_EMAIL
+        self.transport = transport or create_transport()
+        self.clock = datetime.now  # Local time stamped on each rendered message
+    
+    def is_configured(self):
+        """Whether alerts can be sent with the selected transport"""
+        return bool(self.email_address) and self.transport.is_configured()
         
     def send_email_notification(self, weather_analysis):
         """Send email notification with weather alerts"""
-        if not all([self.email_address, self.email_password, self.recipient_email]):
-            print("Email configuration incomplete. Please check your .env file.")
+        if not self.is_configured() or not self.recipient_email:
+            logger.warning("Email configuration incomplete. Please check your .env file.")
             return False
         
         try:
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = self.email_address
-            msg['To'] = self.recipient_email
-            msg['Subject'] = f"☔ UmbrellaAlert - Weather Update for {weather_analysis['location']}"
-            
-            # Create email body
-            body = self._create_email_body(weather_analysis)
-            msg.attach(MIMEText(body, 'html'))
+            msg = self._create_message(weather_analysis, self.recipient_email)
+            failed = self.transport.deliver(self.email_address, [self.recipient_email], msg)
+            if failed:
+                logger.error("❌ Error sending email notification",
+                             extra={'email': self.recipient_email, 'error': str(failed[self.recipient_email])})
+                return False
             
-            # Send email
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.starttls()
-            server.login(self.email_address, self.email_password)
-            
-            text = msg.as_string()
-            server.sendmail(self.email_address, self.recipient_email, text)
-            server.quit()
-            
-            print(f"✅ Weather notification sent successfully to {self.recipient_email}")
+            logger.info("✅ Weather notification sent", extra={'email': self.recipient_email})
             return True
             
         except Exception as e:
-            print(f"❌ Error sending email notification: {e}")
+            logger.error("❌ Error sending email notification", extra={'email': self.recipient_email, 'error': str(e)})
             return False
     
-    def _create_email_body(self, weather_analysis):
+    def send_batch_notification(self, weather_analysis, recipients):
+        """Send one rendered alert to many recipients in transport-sized batches.
+        
+        Returns a dict of failed recipient -> error; recipients not in it were accepted.
+        """
+        recipients = list(recipients)
+        if not recipients:
+            return {}
+        if not self.is_configured():
+            logger.warning("Email configuration incomplete. Please check your .env file.")
+            return {recipient: 'Email configuration incomplete' for recipient in recipients}
+        
+        # Render once; the same message goes to every batch
+        return self.deliver_rendered(self.render_batch(weather_analysis), recipients)
+    
+    def render_batch(self, weather_analysis):
+        """Render the message shared by every recipient of a batch send"""
+        return self.fill_template(self.render_template(weather_analysis), weather_analysis)
+    
+    def render_template(self, weather_analysis):
+        """Render a batch body with the time and current temperature left for fill_template"""
+        return self._create_email_body(weather_analysis, TIME_FIELD, TEMPERATURE_FIELD)
+    
+    def fill_template(self, template, weather_analysis):
+        """A batch message from a rendered template, stamped with the current time and temperature"""
+        body = template.replace(TIME_FIELD, self.clock().strftime("%Y-%m-%d %H:%M:%S"))
+        if TEMPERATURE_FIELD in body:
+            body = body.replace(TEMPERATURE_FIELD, f"{weather_analysis['current_temperature']:.1f}")
+        return self._create_message(weather_analysis, UNDISCLOSED_RECIPIENTS, body)
+    
+    def deliver_rendered(self, msg, recipients):
+        """Deliver an already rendered message; returns a dict of failed recipient -> error"""
+        try:
+            failed = self.transport.deliver(self.email_address, recipients, msg)
+        except Exception as e:
+            # Returned to the caller, which records (and samples the logging of) each failure
+            logger.debug("❌ Error sending batch notification", extra={'recipients': len(recipients), 'error': str(e)})
+            return {recipient: str(e) for recipient in recipients}
+        
+        logger.debug("✅ Weather notification batch sent",
+                     extra={'recipients': len(recipients), 'failed': len(failed)})
+        return failed
+    
+    def close(self):
+        """Close any connection the transport keeps open between sends"""
+        self.transport.close()
+    
+    def _create_message(self, weather_analysis, to_header, body=None):
+        """Create the MIME message for a weather analysis"""
+        msg = MIMEMultipart()
+        msg['From'] = self.email_address
+        msg['To'] = to_header
+        msg['Subject'] = f"☔ UmbrellaAlert - Weather Update for {weather_analysis['location']}"
+        
+        # Create email body
+        if body is None:
+            body = self._create_email_body(weather_analysis)
+        msg.attach(MIMEText(body, 'html'))
+        return msg
+    
+    def _create_email_body(self, weather_analysis, current_time=None, current_temperature=None):
         """Create HTML email body with weather information"""
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        current_time = current_time or self.clock().strftime("%Y-%m-%d %H:%M:%S")
         
         # Check if this is a welcome email (has 'welcome' in description)
         is_welcome = weather_analysis.get('description') == 'welcome'
@@ -110,7 +173,7 @@ class NotificationSender:
                 
                 <div class="weather-info">
                     <h3>Weather Conditions:</h3>
-                    <p><strong>Current Temperature:</strong> {weather_analysis['current_temperature']:.1f}°F</p>
+                    <p><strong>Current Temperature:</strong> {current_temperature or f"{weather_analysis['current_temperature']:.1f}"}°F</p>
                     <p><strong>Daily High:</strong> {weather_analysis['daily_high']:.1f}°F</p>
                     <p><strong>Condition:</strong> {weather_analysis['description'].title()}</p>
                 </div>
@@ -0,0 +1,106 @@
+"""
+Pipeline
+Bounded, multi-stage worker pipeline: each stage has its own threads and a
+fixed-size input queue, so a slow stage blocks the ones before it instead of
+letting work pile up in memory
+"""
+
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+class Stage:
+    """One pipeline step: func(item) returns an iterable of items for the next stage (or None)"""
+
+    def __init__(self, name, func, workers=1, on_error=None):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.on_error = on_error  # Called with (item, exception); the item is dropped
+        self.items = 0
+        self.emitted = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_queue = 0
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """Counters for this stage; busy time includes time blocked on a full downstream queue"""
+        with self._lock:
+            return {'name': self.name, 'workers': self.workers, 'items': self.items, 'emitted': self.emitted,
+                    'errors': self.errors, 'busy_ms': round(self.busy_seconds * 1000, 1),
+                    'max_queue': self.max_queue}
+
+
+class Pipeline:
+    def __init__(self, stages, buffer_size=16):
+        self.stages = stages
+        self.buffer_size = buffer_size  # Max items waiting in front of each stage
+
+    def run(self, source):
+        """Feed every item from source through all stages; returns when the last stage drains"""
+        queues = [queue.Queue(maxsize=self.buffer_size) for _ in self.stages]
+        threads = []
+        for index, stage in enumerate(self.stages):
+            next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            out_queue = queues[index + 1] if next_stage else None
+            remaining = [stage.workers]
+            for number in range(stage.workers):
+                thread = threading.Thread(target=self._work, name=f'{stage.name}-{number}',
+                                          args=(stage, queues[index], next_stage, out_queue, remaining),
+                                          daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        # The source is consumed lazily; put() blocks while the first stage is saturated
+        first = queues[0]
+        try:
+            for item in source:
+                self._put(first, item, self.stages[0])
+        finally:
+            for _ in range(self.stages[0].workers):
+                first.put(_DONE)
+            for thread in threads:
+                thread.join()
+        return [stage.stats() for stage in self.stages]
+
+    def _put(self, out_queue, item, stage):
+        out_queue.put(item)
+        depth = out_queue.qsize()
+        with stage._lock:
+            if depth > stage.max_queue:
+                stage.max_queue = depth
+
+    def _work(self, stage, in_queue, next_stage, out_queue, remaining):
+        while True:
+            item = in_queue.get()
+            if item is _DONE:
+                break
+            started = time.perf_counter()
+            emitted = 0
+            try:
+                for result in stage.func(item) or ():
+                    if out_queue is not None:
+                        self._put(out_queue, result, next_stage)
+                    emitted += 1
+                failed = False
+            except Exception as e:
+                failed = True
+                if stage.on_error:
+                    stage.on_error(item, e)
+            with stage._lock:
+                stage.items += 1
+                stage.emitted += emitted
+                stage.errors += failed
+                stage.busy_seconds += time.perf_counter() - started
+
+        # The last worker of a stage to finish tells the next stage there's nothing more coming
+        with stage._lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last and next_stage is not None:
+            for _ in range(next_stage.workers):
+                out_queue.put(_DONE)
@@ -0,0 +1,293 @@
+"""
+Progress
+Live alert cycle progress for the admin dashboard. Cycles publish snapshots to
+an in-process broker that fans them out to Server-Sent Events streams; while
+nobody is listening, publishing is a single check. A scheduler running in its
+own process copies its snapshots into the cycle_progress table, which web
+workers poll only while a dashboard is connected; they record a heartbeat in
+progress_listeners meanwhile, and the scheduler only copies while one is fresh.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from database import connect
+from subscriber_index import utc_now
+from app_logging import get_logger
+from config import DATABASE_PATH, PROGRESS_INTERVAL
+
+logger = get_logger('progress')
+
+LISTENER_TTL_SECONDS = 10  # A web worker's listener heartbeat counts for this long
+LISTENER_CHECK_SECONDS = 2  # How often the scheduler looks for listeners
+
+
+class ProgressBroker:
+    """In-process pub/sub: every subscriber gets its own bounded queue of snapshots"""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self.latest = {}  # cycle name -> last snapshot published while anyone listened
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return bool(self._subscribers)
+
+    def subscribe(self):
+        """A queue receiving every snapshot published from now on"""
+        subscription = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, snapshot):
+        if not self._subscribers:
+            return
+        with self._lock:
+            self.latest[snapshot['cycle']] = snapshot
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            # A slow reader loses its oldest snapshots, never holds up the cycle
+            while True:
+                try:
+                    subscription.put_nowait(snapshot)
+                    break
+                except queue.Full:
+                    try:
+                        subscription.get_nowait()
+                    except queue.Empty:
+                        pass
+
+
+_default_broker = ProgressBroker()
+
+
+def get_broker():
+    """The process-wide broker cycles publish to"""
+    return _default_broker
+
+
+class CycleProgress:
+    """Publishes a cycle's per-bucket counters (kept by its BucketLog) at most every interval seconds"""
+
+    def __init__(self, stats, bucket_log, total, broker=None, interval=PROGRESS_INTERVAL, clock=time.monotonic):
+        self.stats = stats
+        self.bucket_log = bucket_log
+        self.total = total  # Locations in the cycle
+        self.broker = broker or get_broker()
+        self.interval = interval
+        self.clock = clock
+        self.started_at = utc_now().isoformat(timespec='seconds') + 'Z'
+        self._published_at = None
+        self._previous = None  # (time, locations, alerts_sent) at the last snapshot, for current rates
+        self._lock = threading.Lock()
+
+    def update(self):
+        """Called whenever the cycle's counters change"""
+        if not self.broker.active:
+            return
+        now = self.clock()
+        if self._published_at is not None and now - self._published_at < self.interval:
+            return
+        with self._lock:
+            if self._published_at is not None and now - self._published_at < self.interval:
+                return
+            self._published_at = now
+            snapshot = self.snapshot('running', now)
+        self.broker.publish(snapshot)
+
+    def finish(self):
+        if self.broker.active:
+            with self._lock:
+                snapshot = self.snapshot('finished', self.clock())
+            self.broker.publish(snapshot)
+
+    def snapshot(self, status, now):
+        buckets = self.bucket_log.snapshot()
+        offsets = sorted(buckets, key=lambda offset: (offset is None, offset or 0))
+        totals = {}
+        for counters in buckets.values():
+            for key, value in counters.items():
+                totals[key] = totals.get(key, 0) + value
+        locations = totals.get('locations', 0)
+        alerts_sent = totals.get('alerts_sent', 0)
+        elapsed = time.perf_counter() - self.stats.started
+
+        # Current rates, since the previous snapshot: a stall shows up as zero here first
+        previous = self._previous or (now - elapsed, 0, 0)
+        window = now - previous[0]
+        self._previous = (now, locations, alerts_sent)
+        return {
+            'cycle': self.stats.name,
+            'status': status,
+            'pid': os.getpid(),
+            'started_at': self.started_at,
+            'elapsed_seconds': round(elapsed, 1),
+            'locations_total': self.total,
+            'totals': totals,
+            'buckets': [dict(buckets[offset], utc_offset=offset) for offset in offsets],
+            'locations_per_second': round((locations - previous[1]) / window, 1) if window > 0 else 0.0,
+            'alerts_per_second': round((alerts_sent - previous[2]) / window, 1) if window > 0 else 0.0
+        }
+
+
+class DatabaseMirror:
+    """Copies this process's snapshots into cycle_progress, but only while a web worker reports a listener"""
+
+    def __init__(self, db_path=DATABASE_PATH, broker=None, check_seconds=LISTENER_CHECK_SECONDS):
+        self.db_path = db_path
+        self.broker = broker or get_broker()
+        self.check_seconds = check_seconds  # How often the listeners table is read
+        self.subscription = None  # Subscribed only while someone listens, so cycles skip snapshots otherwise
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='progress-mirror', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._listen(False)
+
+    def check(self):
+        """Subscribe or unsubscribe to match whether any dashboard is connected; returns whether listening"""
+        self._listen(listeners_present(self.db_path))
+        return self.subscription is not None
+
+    def _listen(self, listening):
+        if listening and self.subscription is None:
+            self.subscription = self.broker.subscribe()
+        elif not listening and self.subscription is not None:
+            self.broker.unsubscribe(self.subscription)
+            self.subscription = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                logger.warning("⚠️ Couldn't read progress listeners", extra={'error': str(e)})
+            deadline = time.monotonic() + self.check_seconds
+            while self.subscription is not None and not self._stopped.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    self._save(self.subscription.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            else:
+                self._stopped.wait(max(deadline - time.monotonic(), 0))
+
+    def _save(self, snapshot):
+        try:
+            conn = connect(self.db_path)
+            try:
+                with conn:
+                    conn.execute('INSERT OR REPLACE INTO cycle_progress (cycle, updated, snapshot) VALUES (?, ?, ?)',
+                                 (snapshot['cycle'], time.time(), json.dumps(snapshot)))
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning("⚠️ Couldn't save cycle progress", extra={'error': str(e)})
+
+
+def mirror_to_database(db_path=DATABASE_PATH, broker=None):
+    """Start mirroring this process's cycle progress for web workers (for the scheduler process)"""
+    return DatabaseMirror(db_path, broker).start()
+
+
+def listeners_present(db_path=DATABASE_PATH, ttl=LISTENER_TTL_SECONDS):
+    """Whether any web worker has had a dashboard connected within the last ttl seconds"""
+    conn = connect(db_path)
+    try:
+        return conn.execute('SELECT 1 FROM progress_listeners WHERE seen > ? LIMIT 1',
+                            (time.time() - ttl,)).fetchone() is not None
+    finally:
+        conn.close()
+
+
+class DatabaseFeed:
+    """Publishes snapshots other processes saved to cycle_progress, polling only while anyone listens"""
+
+    def __init__(self, db_path=DATABASE_PATH, broker=None, interval=PROGRESS_INTERVAL):
+        self.db_path = db_path
+        self.broker = broker or get_broker()
+        self.interval = interval
+        self.since = 0.0  # updated time of the newest row published
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Make sure the poller is running; it stops by itself once the last listener leaves"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='progress-feed', daemon=True)
+            self._thread.start()
+
+    def poll(self):
+        """Publish rows saved since the last poll; returns how many"""
+        conn = connect(self.db_path)
+        try:
+            rows = conn.execute('SELECT updated, snapshot FROM cycle_progress WHERE updated > ? ORDER BY updated',
+                                (self.since,)).fetchall()
+        finally:
+            conn.close()
+        pid = os.getpid()
+        for updated, snapshot in rows:
+            self.since = max(self.since, updated)
+            snapshot = json.loads(snapshot)
+            if snapshot['pid'] != pid:  # This process's own cycles are already published directly
+                self.broker.publish(snapshot)
+        return len(rows)
+
+    def heartbeat(self, present=True):
+        """Tell the scheduler process a dashboard is (or is no longer) connected to this worker"""
+        conn = connect(self.db_path)
+        try:
+            with conn:
+                if present:
+                    conn.execute('INSERT OR REPLACE INTO progress_listeners (pid, seen) VALUES (?, ?)',
+                                 (os.getpid(), time.time()))
+                else:
+                    conn.execute('DELETE FROM progress_listeners WHERE pid = ?', (os.getpid(),))
+        finally:
+            conn.close()
+
+    def _run(self):
+        beat_at = None
+        while True:
+            while self.broker.active:
+                try:
+                    if beat_at is None or time.monotonic() - beat_at >= LISTENER_TTL_SECONDS / 3:
+                        self.heartbeat()
+                        beat_at = time.monotonic()
+                    self.poll()
+                except Exception as e:
+                    logger.warning("⚠️ Couldn't read cycle progress", extra={'error': str(e)})
+                time.sleep(self.interval)
+            try:
+                self.heartbeat(False)
+                beat_at = None
+            except Exception as e:
+                logger.warning("⚠️ Couldn't clear progress listener", extra={'error': str(e)})
+            with self._lock:
+                # A dashboard that connected while this was stopping keeps it running
+                if not self.broker.active:
+                    self._running = False
+                    return
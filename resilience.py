@@ -0,0 +1,193 @@
+"""
+Resilience
+Circuit breaker and hedged requests for calls to the weather provider
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from config import (BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS, HEDGE_AFTER_SECONDS, HEDGE_PERCENTILE,
+                    HEDGE_MIN_SECONDS, HEDGE_MAX_WORKERS)
+from app_logging import get_logger
+
+logger = get_logger('resilience')
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling the provider while the circuit is open"""
+
+
+class CircuitBreaker:
+    """Fails fast after consecutive errors, then lets a single probe through after reset_seconds"""
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go to the provider right now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("✅ Weather API recovered - circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("⚠️ Weather API failing - circuit open",
+                                   extra={'failures': self.failures, 'reset_seconds': self.reset_seconds})
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+    def release(self):
+        """End a probe whose outcome says nothing about provider health (e.g. a 404)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def call(self, func, *args, **kwargs):
+        """Run func through the breaker; provider errors count as failures"""
+        if not self.allow():
+            raise CircuitOpenError("Weather API circuit is open - skipping call")
+        try:
+            result = func(*args, **kwargs)
+        except requests.exceptions.RequestException as e:
+            if is_provider_failure(e):
+                self.record_failure()
+            else:
+                self.release()
+            raise
+        except Exception:
+            # Not the provider's fault (e.g. a bad payload), but a probe must never stay in flight
+            self.release()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {'state': self.state, 'consecutive_failures': self.failures, 'rejected': self.rejected}
+
+
+def is_provider_failure(error):
+    """Timeouts, connection errors, 429s and 5xx count against the provider; other 4xx don't"""
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return True
+
+
+class HedgedCaller:
+    """Sends a second copy of a call that is slower than the recent latency percentile"""
+
+    def __init__(self, hedge_after=HEDGE_AFTER_SECONDS, percentile=HEDGE_PERCENTILE,
+                 min_seconds=HEDGE_MIN_SECONDS, max_workers=HEDGE_MAX_WORKERS):
+        self.hedge_after = hedge_after  # Seconds, 'auto' for the observed percentile, or 0 to disable
+        self.percentile = percentile
+        self.min_seconds = min_seconds
+        self.max_workers = max_workers
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=256)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def threshold(self):
+        """Latency after which a call is hedged, or None if hedging is off"""
+        if self.hedge_after == 'auto':
+            with self._lock:
+                if len(self._latencies) < 20:
+                    return None  # Not enough samples to know what slow means yet
+                ordered = sorted(self._latencies)
+            index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+            return max(self.min_seconds, ordered[index])
+        return float(self.hedge_after) or None
+
+    def _timed(self, func, args):
+        started = time.perf_counter()
+        result = func(*args)
+        with self._lock:
+            self._latencies.append(time.perf_counter() - started)
+        return result
+
+    def call(self, func, *args):
+        with self._lock:
+            self.calls += 1
+        threshold = self.threshold()
+        if threshold is None:
+            return self._timed(func, args)
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='hedge')
+        first = self._executor.submit(self._timed, func, args)
+        done, _ = wait([first], timeout=threshold)
+        if done:
+            return first.result()
+
+        # Slow tail: race a second request against the first and take whichever succeeds first
+        with self._lock:
+            self.hedges += 1
+        second = self._executor.submit(self._timed, func, args)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def stats(self):
+        threshold = self.threshold()
+        with self._lock:
+            return {'calls': self.calls, 'hedges': self.hedges, 'hedge_wins': self.hedge_wins,
+                    'threshold_seconds': round(threshold, 3) if threshold else None}
+
+
+_default_breaker = CircuitBreaker()
+_default_hedger = HedgedCaller()
+
+
+def get_default_breaker():
+    """Process-wide breaker for the weather provider"""
+    return _default_breaker
+
+
+def get_default_hedger():
+    """Process-wide hedged caller for the weather provider"""
+    return _default_hedger
@@ -0,0 +1,159 @@
+"""
+Response Cache
+SQLite-backed cache of compressed weather API payloads, shared by every process
+on the host and kept across restarts
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from config import (RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_BYTES,
+                    RESPONSE_CACHE_STALE_SECONDS)
+from app_logging import get_logger
+
+logger = get_logger('response_cache')
+
+# A hit only rewrites last_access once it is this old, so most reads stay reads; eviction only needs coarse recency
+ACCESS_TOUCH_SECONDS = 60
+
+
+class ResponseCache:
+    def __init__(self, path=RESPONSE_CACHE_PATH, max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                 stale_seconds=RESPONSE_CACHE_STALE_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stale_seconds = stale_seconds  # How long past its TTL an entry may still be served
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._revalidating = set()
+        self._init_schema()
+
+    def _connection(self):
+        """One connection per thread; WAL lets readers in other processes proceed during writes"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        self._connection().execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._connection().execute('CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)')
+
+    def get(self, key):
+        """Return (payload, is_fresh); payload is None on a miss or when too stale to serve"""
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute('SELECT payload, expires_at, last_access FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is None or now > row[1] + self.stale_seconds:
+            with self._lock:
+                self.misses += 1
+            return None, False
+
+        if now - row[2] >= ACCESS_TOUCH_SECONDS:
+            conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+        fresh = now <= row[1]
+        with self._lock:
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+        return json.loads(zlib.decompress(row[0])), fresh
+
+    def get_last(self, key):
+        """Last stored payload regardless of age - the fallback while the provider is down"""
+        row = self._connection().execute('SELECT payload FROM responses WHERE key = ?', (key,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def put(self, key, payload, ttl):
+        """Store a payload for ttl seconds, evicting least recently used entries over max_bytes"""
+        now = time.time()
+        blob = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        conn = self._connection()
+        conn.execute('''
+            INSERT OR REPLACE INTO responses (key, payload, size, fetched_at, expires_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (key, blob, len(blob), now, now + ttl, now))
+        self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        while total > self.max_bytes:
+            rows = conn.execute('SELECT key, size FROM responses ORDER BY last_access LIMIT 32').fetchall()
+            if not rows:
+                break
+            conn.executemany('DELETE FROM responses WHERE key = ?', [(key,) for key, _ in rows])
+            total -= sum(size for _, size in rows)
+
+    def revalidate(self, key, fetch, ttl):
+        """Refresh a stale entry in the background; concurrent requests for one key share one fetch"""
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def run():
+            try:
+                payload = fetch()
+                if payload is not None:
+                    self.put(key, payload, ttl)
+                    with self._lock:
+                        self.revalidations += 1
+            except Exception as e:
+                logger.warning("⚠️ Background refresh failed", extra={'key': key, 'error': str(e)})
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+
+        threading.Thread(target=run, name=f'revalidate-{key}', daemon=True).start()
+
+    def clear(self):
+        self._connection().execute('DELETE FROM responses')
+
+    def stats(self):
+        """Hit/miss counters for this process plus the shared cache's size"""
+        entries, size = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+                'revalidations': self.revalidations,
+                'entries': entries,
+                'bytes': size
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Process-wide cache at RESPONSE_CACHE_PATH, or None when disabled"""
+    global _default_cache
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
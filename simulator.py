@@ -0,0 +1,289 @@
+"""
+Day Simulator
+Replays recorded weather API responses against a simulated clock, so a full
+day of 8:00 AM windows across every UTC offset runs in seconds
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from alert_engine import AlertEngine
+from notification_sender import NotificationSender
+from transports import MemoryTransport
+from subscriber_index import SubscriberIndex, utc_now
+from weather_checker import WeatherChecker, FORECAST_API_URL, response_key
+from database import connect, init_db, location_id
+from config import NOTIFICATION_HOUR
+
+# Every UTC offset in use, including the half- and quarter-hour ones (seconds)
+SIMULATED_OFFSETS = [hours * 3600 for hours in range(-12, 15)] + [-12600, -9000, 12600, 16200, 19800,
+                                                                   20700, 23400, 34200, 37800, 45900]
+
+
+class SimulatedClock:
+    """Naive UTC clock that only moves when advanced"""
+
+    def __init__(self, start):
+        self.current = start
+
+    def __call__(self):
+        return self.current
+
+    def advance(self, seconds):
+        self.current += timedelta(seconds=seconds)
+        return self.current
+
+
+class ReplayWeatherChecker(WeatherChecker):
+    """Serves recorded provider responses instead of calling the API, counting calls and concurrency"""
+
+    def __init__(self, responses, shift_seconds=0, latency_seconds=0.0):
+        super().__init__(cache=False)
+        self.api_key = self.api_key or 'replay'
+        self.responses = responses  # response_key -> recorded payload
+        self.shift_seconds = shift_seconds  # Moves recorded forecasts onto the simulated day
+        self.latency_seconds = latency_seconds
+        self.calls = {}
+        self.in_flight = 0
+        self.peak_concurrency = 0
+        self._lock = threading.Lock()
+
+    def _fetch_json(self, url, params):
+        key = response_key('forecast' if url == FORECAST_API_URL else 'weather', params['q'])
+        with self._lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+            self.in_flight += 1
+            self.peak_concurrency = max(self.peak_concurrency, self.in_flight)
+        try:
+            if self.latency_seconds:
+                time.sleep(self.latency_seconds)
+            payload = self.responses.get(key)
+            if payload is None:
+                raise ValueError(f"No recorded response for {key}")
+            if self.shift_seconds and 'list' in payload:
+                payload = dict(payload, list=[dict(item, dt=item['dt'] + self.shift_seconds)
+                                              for item in payload['list']])
+            return payload
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class SimulatedEngine(AlertEngine):
+    """AlertEngine that records when each location was dispatched and what it sent"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dispatches = []  # (group, subscribers, simulated lag seconds)
+        self.deliveries = {}  # group key -> [sent, failed]
+        self._dispatch_lock = threading.Lock()
+
+    def _analyze_location(self, weather_checker, group, weather_data, forecast_data, now_utc=None, *args):
+        # Simulated time since 8:00 AM local; the real time cycles take is reported separately
+        local_now = group.local_time(self.clock())
+        due = local_now.replace(hour=NOTIFICATION_HOUR, minute=0, second=0, microsecond=0)
+        lag = (local_now - due).total_seconds()
+        with self._dispatch_lock:
+            self.dispatches.append((group, len(group.subscribers), lag))
+        return super()._analyze_location(weather_checker, group, weather_data, forecast_data, now_utc, *args)
+
+    def _record_delivery(self, group, notifications, emails, failed):
+        sent, failed = super()._record_delivery(group, notifications, emails, failed)
+        with self._dispatch_lock:
+            totals = self.deliveries.setdefault(group.key, [0, 0])
+            totals[0] += sent
+            totals[1] += failed
+        return sent, failed
+
+
+def format_offset(offset):
+    sign = '+' if offset >= 0 else '-'
+    hours, minutes = divmod(abs(offset) // 60, 60)
+    return f"UTC{sign}{hours:02d}:{minutes:02d}"
+
+
+def memory_sender_factory(transport):
+    """Sender factory delivering to an in-memory transport, for simulations and benchmarks"""
+    def create():
+        sender = NotificationSender(transport)
+        sender.email_address = sender.email_address or 'alerts@example.com'
+        return sender
+    return create
+
+
+def seed_subscribers(db_path, cities, subscribers, country_code='US'):
+    """Fill a fresh database with synthetic subscribers spread evenly over cities"""
+    init_db(db_path)
+    conn = connect(db_path)
+    cursor = conn.cursor()
+    location_ids = [location_id(cursor, city, '', country_code) for city in cities]
+    cursor.executemany(
+        'INSERT INTO subscribers (email, location_id, subscribed_date, is_active, version) VALUES (?, ?, ?, 1, ?)',
+        [(f'user{i}@example.com', location_ids[i % len(cities)], datetime.now(), i + 1) for i in range(subscribers)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def synthetic_city(offset, index=0):
+    return f"Sim {format_offset(offset)} #{index}"
+
+
+def synthetic_responses(day, offsets=SIMULATED_OFFSETS, cities_per_offset=1, country_code='US'):
+    """Rainy weather and 3-day forecasts for synthetic cities at each offset, starting the day before day"""
+    start = int((datetime.combine(day, datetime.min.time()) - datetime(1970, 1, 1)).total_seconds()) - 86400
+    responses = {}
+    for offset in offsets:
+        for index in range(cities_per_offset):
+            city = synthetic_city(offset, index)
+            query = f"{city},{country_code}"
+            responses[response_key('weather', query)] = {
+                'name': city,
+                'timezone': offset,
+                # Near the offset's meridian, cities of one offset about 2 km apart
+                'coord': {'lat': 40.0 + index * 0.02, 'lon': (offset / 240 + 180) % 360 - 180},
+                'main': {'temp': 72.0},
+                'wind': {'speed': 5.0},
+                'weather': [{'main': 'Rain', 'description': 'light rain'}]
+            }
+            responses[response_key('forecast', query)] = {
+                'city': {'name': city, 'timezone': offset},
+                'list': [{'dt': start + step * 10800, 'main': {'temp': 64.0 + step % 8 * 3}, 'pop': 0.7,
+                          'weather': [{'id': 500, 'main': 'Rain'}]} for step in range(24)]
+            }
+    return responses
+
+
+def record_responses(db_path, path, weather_checker=None):
+    """Fetch current weather and forecasts for every subscribed location and save them for replay"""
+    weather_checker = weather_checker or WeatherChecker()
+    subscriber_index = SubscriberIndex(db_path)
+    subscriber_index.refresh()
+
+    responses = {}
+    for group in subscriber_index.all_groups():
+        query = f"{group.location},{group.country_code}"
+        weather_data = weather_checker.get_weather_data_for_location(group.location, group.country_code)
+        forecast_data = weather_checker.get_forecast_data_for_location(group.location, group.country_code)
+        if weather_data:
+            responses[response_key('weather', query)] = weather_data
+        if forecast_data:
+            responses[response_key('forecast', query)] = forecast_data
+
+    with open(path, 'w') as f:
+        json.dump({'recorded_at': utc_now().isoformat(), 'responses': responses}, f)
+    print(f"💾 Recorded {len(responses)} responses for {len(subscriber_index.all_groups())} locations to {path}")
+    return len(responses)
+
+
+def copy_database(db_path, path):
+    """Copy a subscriber database to path for a simulation to write to, with no day marked as already run"""
+    source = connect(db_path)
+    target = connect(path)
+    try:
+        source.backup(target)
+        init_db(path)
+        target.execute('UPDATE locations SET last_run_date = NULL')
+        target.commit()
+    finally:
+        target.close()
+        source.close()
+    return path
+
+
+def load_recording(path):
+    """Return (recorded_at, responses) from a file written by record_responses"""
+    with open(path) as f:
+        recording = json.load(f)
+    return datetime.fromisoformat(recording['recorded_at']), recording['responses']
+
+
+class DaySimulator:
+    """Runs the scheduler every step_seconds of simulated time across one UTC day"""
+
+    def __init__(self, db_path, responses, day, shift_seconds=0, step_seconds=60, workers=1,
+                 latency_seconds=0.0):
+        self.day = day
+        self.step_seconds = step_seconds
+        self.workers = workers
+        self.clock = SimulatedClock(datetime.combine(day, datetime.min.time()))
+        self.transport = MemoryTransport()
+        self.weather_checker = ReplayWeatherChecker(responses, shift_seconds, latency_seconds)
+        self.engine = SimulatedEngine(db_path, weather_checker_factory=lambda: self.weather_checker,
+                                      sender_factory=memory_sender_factory(self.transport), clock=self.clock,
+                                      archive=False)  # Simulated weather stays out of the real history
+
+    def run(self):
+        """Simulate the day; returns the report"""
+        started = time.perf_counter()
+        cycle_seconds = []  # Real time per cycle
+        end = self.clock() + timedelta(days=1)
+        while self.clock() < end:
+            cycle_started = time.perf_counter()
+            self.engine.run_cycle(workers=self.workers)
+            cycle_seconds.append(time.perf_counter() - cycle_started)
+            self.clock.advance(self.step_seconds)
+        return self.report(cycle_seconds, time.perf_counter() - started)
+
+    def report(self, cycle_seconds, wall_seconds):
+        buckets = {}
+        for group in self.engine.subscriber_index.all_groups():
+            bucket = buckets.setdefault(group.offset, {
+                'offset': group.offset, 'locations': 0, 'subscribers_due': 0, 'subscribers_checked': 0,
+                'dispatches': 0, 'alerts_sent': 0, 'alerts_failed': 0, 'api_calls': 0, 'lags': []
+            })
+            bucket['locations'] += 1
+            bucket['subscribers_due'] += len(group.subscribers)
+            query = f"{group.location},{group.country_code}"
+            bucket['api_calls'] += sum(self.weather_checker.calls.get(response_key(kind, query), 0)
+                                       for kind in ('weather', 'forecast'))
+
+        dispatched = {}
+        for group, subscribers, lag in self.engine.dispatches:
+            bucket = buckets[group.offset]
+            bucket['dispatches'] += 1
+            bucket['subscribers_checked'] += subscribers
+            bucket['lags'].append(lag)
+            dispatched[group.key] = group
+        # Deliveries are totalled per location, so count each location once however often it ran
+        for key, group in dispatched.items():
+            sent, failed = self.engine.deliveries.get(key, (0, 0))
+            buckets[group.offset]['alerts_sent'] += sent
+            buckets[group.offset]['alerts_failed'] += failed
+
+        for bucket in buckets.values():
+            lags = sorted(bucket.pop('lags'))
+            bucket['lag_p50_seconds'] = round(lags[len(lags) // 2], 3) if lags else None
+            bucket['lag_max_seconds'] = round(lags[-1], 3) if lags else None
+
+        return {
+            'day': self.day.isoformat(),
+            'cycles': len(cycle_seconds),
+            'wall_seconds': round(wall_seconds, 3),
+            'cycle_p50_seconds': round(sorted(cycle_seconds)[len(cycle_seconds) // 2], 4) if cycle_seconds else None,
+            'cycle_max_seconds': round(max(cycle_seconds, default=0), 4),
+            'api_calls': sum(self.weather_checker.calls.values()),
+            'peak_concurrency': self.weather_checker.peak_concurrency,
+            'transport': self.transport.stats(),
+            'buckets': [buckets[offset] for offset in sorted(buckets, key=lambda o: (o is None, o or 0))]
+        }
+
+
+def print_report(report):
+    """Print the per-bucket simulation report"""
+    print(f"\n🗓️ Simulated {report['day']}: {report['cycles']} cycles in {report['wall_seconds']:.2f}s, "
+          f"{report['api_calls']} API calls, peak concurrency {report['peak_concurrency']}")
+    print(f"   ⏱️ real time per cycle: p50 {report['cycle_p50_seconds'] * 1000:.1f}ms, "
+          f"max {report['cycle_max_seconds'] * 1000:.1f}ms; lag below is simulated time after 8:00 AM")
+    print(f"{'bucket':<11} {'locs':>5} {'due':>7} {'checked':>8} {'sent':>7} {'runs':>5} "
+          f"{'lag p50':>8} {'lag max':>8} {'api':>5}")
+    for bucket in report['buckets']:
+        label = format_offset(bucket['offset']) if bucket['offset'] is not None else 'unknown'
+        p50 = f"{bucket['lag_p50_seconds']:.1f}s" if bucket['lag_p50_seconds'] is not None else '-'
+        lag_max = f"{bucket['lag_max_seconds']:.1f}s" if bucket['lag_max_seconds'] is not None else '-'
+        flag = '' if bucket['subscribers_checked'] == bucket['subscribers_due'] \
+            and bucket['dispatches'] == bucket['locations'] else '  ⚠️'
+        print(f"{label:<11} {bucket['locations']:>5} {bucket['subscribers_due']:>7} "
+              f"{bucket['subscribers_checked']:>8} {bucket['alerts_sent']:>7} {bucket['dispatches']:>5} "
+              f"{p50:>8} {lag_max:>8} {bucket['api_calls']:>5}{flag}")
@@ -0,0 +1,225 @@
+"""
+Subscriber Index
+Resident, incrementally refreshed view of active subscribers grouped by
+location and UTC offset bucket
+"""
+
+import threading
+from datetime import date, datetime, timedelta, timezone
+from alert_rules import compile_rules
+from database import connect
+from config import DATABASE_PATH
+
+
+class SubscriberRecord:
+    """A single active subscriber, pointing at its shared location group and compiled rules"""
+    __slots__ = ('id', 'email', 'group', 'rules')
+
+    def __init__(self, subscriber_id, email, group, rules):
+        self.id = subscriber_id
+        self.email = email
+        self.group = group
+        self.rules = rules  # Interned CompiledRuleSet, shared by subscribers with the same rules
+
+
+class LocationGroup:
+    """All subscribers that share one location and therefore one forecast"""
+    __slots__ = ('key', 'city', 'zipcode', 'country_code', 'offset', 'latitude', 'longitude',
+                 'offset_checked_date', 'last_run_date', 'last_analysis', 'subscribers')
+
+    def __init__(self, key, city, zipcode, country_code, offset=None, latitude=None, longitude=None,
+                 last_run_date=None):
+        self.key = key  # locations.id
+        self.city = city
+        self.zipcode = zipcode
+        self.country_code = country_code
+        self.offset = offset  # UTC offset in seconds, learned from the weather API
+        self.latitude = latitude  # Also learned from the weather API; used for geo clustering
+        self.longitude = longitude
+        self.offset_checked_date = None  # Local date the offset was last re-validated
+        # Local date of the last 8:00 AM run, stored with the location (see SubscriberIndex.claim_run)
+        self.last_run_date = date.fromisoformat(last_run_date) if last_run_date else None
+        # (fingerprint, weather analysis, {notifications: rendered body template}) from the last check
+        self.last_analysis = None
+        self.subscribers = set()
+
+    @property
+    def location(self):
+        """Location string as passed to the weather API (city + zipcode if provided)"""
+        if self.zipcode:
+            return f"{self.city}, {self.zipcode}"
+        return self.city
+
+    def local_time(self, now_utc):
+        """Current time in this location, or None if the offset is not known yet"""
+        if self.offset is None:
+            return None
+        return now_utc + timedelta(seconds=self.offset)
+
+
+def utc_now():
+    """Naive UTC now, matching the naive local times computed from offsets"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class SubscriberIndex:
+    def __init__(self, db_path=DATABASE_PATH):
+        self.db_path = db_path
+        self.version = -1  # Highest subscribers.version applied so far
+        self.groups = {}  # locations.id -> LocationGroup
+        self.buckets = {}  # UTC offset (seconds, or None if unknown) -> set of location keys
+        self._by_email = {}  # email -> SubscriberRecord
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._by_email)
+
+    def refresh(self):
+        """Apply subscriber rows changed since the last refresh; returns the number of rows applied"""
+        conn = connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT s.id, s.email, s.is_active, s.version, a.alert_rules,
+                       l.id, l.city, l.zipcode, l.country_code, l.utc_offset, l.latitude, l.longitude,
+                       l.last_run_date
+                FROM subscribers s
+                JOIN locations l ON l.id = s.location_id
+                LEFT JOIN alert_settings a ON a.id = s.settings_id
+                WHERE s.version > ? ORDER BY s.version
+            ''', (self.version,))
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        with self._lock:
+            for subscriber_id, email, is_active, version, alert_rules, *location in rows:
+                record = self._by_email.get(email)
+                if is_active and record is not None and record.group.key == location[0]:
+                    # Same location (re-subscribed or new rules): keep the group and its per-day state
+                    self._by_email[email] = SubscriberRecord(subscriber_id, email, record.group,
+                                                             compile_rules(alert_rules))
+                else:
+                    self._remove(email)
+                    if is_active:
+                        self._add(subscriber_id, email, location, compile_rules(alert_rules))
+                if version > self.version:
+                    self.version = version
+        return len(rows)
+
+    def _add(self, subscriber_id, email, location, rules):
+        key = location[0]
+        group = self.groups.get(key)
+        if group is None:
+            # Offsets and coordinates learned by earlier runs are stored with the location
+            group = LocationGroup(*location)
+            self.groups[key] = group
+            self.buckets.setdefault(group.offset, set()).add(key)
+        group.subscribers.add(email)
+        self._by_email[email] = SubscriberRecord(subscriber_id, email, group, rules)
+
+    def _remove(self, email):
+        record = self._by_email.pop(email, None)
+        if record is None:
+            return
+        group = record.group
+        group.subscribers.discard(email)
+        if not group.subscribers:
+            del self.groups[group.key]
+            bucket = self.buckets.get(group.offset)
+            if bucket is not None:
+                bucket.discard(group.key)
+                if not bucket:
+                    del self.buckets[group.offset]
+
+    def set_offset(self, group, offset):
+        """Record a location's UTC offset, moving it to the matching bucket and saving it"""
+        with self._lock:
+            if group.offset == offset:
+                return
+            if group.key in self.groups:
+                bucket = self.buckets.get(group.offset)
+                if bucket is not None:
+                    bucket.discard(group.key)
+                    if not bucket:
+                        del self.buckets[group.offset]
+                self.buckets.setdefault(offset, set()).add(group.key)
+            group.offset = offset
+
+        conn = connect(self.db_path)
+        try:
+            conn.execute('UPDATE locations SET utc_offset = ? WHERE id = ?', (offset, group.key))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def set_coordinates(self, group, latitude, longitude):
+        """Record a location's coordinates and save them"""
+        with self._lock:
+            if (group.latitude, group.longitude) == (latitude, longitude):
+                return
+            group.latitude = latitude
+            group.longitude = longitude
+
+        conn = connect(self.db_path)
+        try:
+            conn.execute('UPDATE locations SET latitude = ?, longitude = ? WHERE id = ?',
+                         (latitude, longitude, group.key))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def claim_run(self, group, local_date):
+        """Claim a location's 8:00 AM run for local_date; False if any process already ran it that day"""
+        conn = connect(self.db_path)
+        try:
+            # A single conditional UPDATE, so concurrent schedulers and batch commands can't both win
+            cursor = conn.execute('UPDATE locations SET last_run_date = ? WHERE id = ? '
+                                  'AND (last_run_date IS NULL OR last_run_date < ?)',
+                                  (local_date.isoformat(), group.key, local_date.isoformat()))
+            conn.commit()
+            claimed = cursor.rowcount == 1
+        finally:
+            conn.close()
+        if claimed or group.last_run_date is None or group.last_run_date < local_date:
+            group.last_run_date = local_date  # Either way, this process needn't ask again today
+        return claimed
+
+    def get(self, email):
+        """Return the SubscriberRecord for an active email, or None"""
+        return self._by_email.get(email)
+
+    def members(self, group):
+        """Snapshot of the emails subscribed to a location group"""
+        with self._lock:
+            return sorted(group.subscribers)
+
+    def members_by_rules(self, group):
+        """A location's subscribers split by compiled rule set: {CompiledRuleSet: [emails]}"""
+        with self._lock:
+            by_rules = {}
+            for email in sorted(group.subscribers):
+                by_rules.setdefault(self._by_email[email].rules, []).append(email)
+            return by_rules
+
+    def all_groups(self):
+        """Snapshot of every location group that has at least one active subscriber"""
+        with self._lock:
+            return list(self.groups.values())
+
+    def unknown_offset_groups(self):
+        """Location groups whose UTC offset has not been learned yet"""
+        with self._lock:
+            return [self.groups[key] for key in self.buckets.get(None, ())]
+
+    def groups_at_local_time(self, now_utc, hour, window_minutes=1):
+        """Location groups whose local time is within [hour:00, hour:window_minutes)"""
+        with self._lock:
+            groups = []
+            for offset, keys in self.buckets.items():
+                if offset is None:
+                    continue
+                local_time = now_utc + timedelta(seconds=offset)
+                if local_time.hour == hour and local_time.minute < window_minutes:
+                    groups.extend(self.groups[key] for key in keys)
+            return groups
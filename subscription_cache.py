@@ -0,0 +1,160 @@
+"""
+Subscription Cache
+In-process read-through cache of email -> subscription status for the
+subscription form. A Bloom filter of every known email answers "not found"
+without touching the database, a bounded LRU holds recent lookups, and
+writes invalidate exactly the emails they change.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from database import connect
+from config import DATABASE_PATH, SUBSCRIPTION_CACHE_SIZE, SUBSCRIPTION_CACHE_SYNC_SECONDS
+
+BLOOM_ERROR_RATE = 0.01  # False positives at capacity; they only cost one database lookup
+
+
+class BloomFilter:
+    """Set membership with no false negatives, in about 10 bits per key"""
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # Two 64-bit hashes combined (Kirsch-Mitzenmacher) instead of k separate hash functions
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class SubscriptionCache:
+    def __init__(self, db_path=DATABASE_PATH, max_entries=SUBSCRIPTION_CACHE_SIZE,
+                 sync_seconds=SUBSCRIPTION_CACHE_SYNC_SECONDS, clock=time.monotonic):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.sync_seconds = sync_seconds  # How often writes made by other processes are picked up
+        self.clock = clock
+        self.version = None  # Highest subscribers.version seen; None until the first sync
+        self.hits = 0
+        self.misses = 0
+        self.filtered = 0  # Unknown emails answered by the Bloom filter alone
+        self.db_lookups = 0
+        self._entries = OrderedDict()  # email -> (email, city, zipcode, is_active) or None, oldest first
+        self._bloom = None
+        self._synced_at = None
+        self._generation = 0  # Bumped by every invalidation, so a lookup racing a write isn't cached
+        self._written = []  # Emails invalidated while a sync is reading, re-added to a rebuilt filter
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    def lookup(self, email):
+        """(email, city, zipcode, is_active) for a subscribed or unsubscribed email, or None if unknown"""
+        now = self.clock()
+        if self._synced_at is None or now - self._synced_at >= self.sync_seconds:
+            self._sync(now)
+
+        with self._lock:
+            if email in self._entries:
+                self._entries.move_to_end(email)
+                self.hits += 1
+                return self._entries[email]
+            if email not in self._bloom:
+                self.filtered += 1
+                return None
+            self.misses += 1
+            self.db_lookups += 1
+            generation = self._generation
+
+        conn = connect(self.db_path)
+        try:
+            row = conn.execute('''
+                SELECT s.email, l.city, l.zipcode, s.is_active
+                FROM subscribers s JOIN locations l ON l.id = s.location_id
+                WHERE s.email = ?
+            ''', (email,)).fetchone()
+        finally:
+            conn.close()
+
+        with self._lock:
+            if generation == self._generation:
+                self._store(email, row)
+        return row
+
+    def invalidate(self, email):
+        """Forget a cached status after a write to it; call once the write is committed"""
+        with self._lock:
+            self._entries.pop(email, None)
+            self._generation += 1
+            self._written.append(email)
+            if self._bloom is not None:
+                self._bloom.add(email)
+
+    def _store(self, email, row):
+        self._entries[email] = row
+        self._entries.move_to_end(email)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _sync(self, now):
+        """Apply writes made since the last sync, here or in another process, via subscribers.version"""
+        # Callers wait for a sync in progress rather than read a filter that isn't built yet
+        with self._sync_lock:
+            with self._lock:
+                if self._synced_at is not None and now - self._synced_at < self.sync_seconds:
+                    return  # Another thread just synced
+                version = self.version
+                # First sync, or the filter is past capacity and its false positive rate climbing
+                rebuild = self._bloom is None or self._bloom.count > self._bloom.capacity
+                self._written = []
+
+            conn = connect(self.db_path)
+            try:
+                if rebuild:
+                    rows = conn.execute('SELECT email, version FROM subscribers').fetchall()
+                else:
+                    rows = conn.execute('SELECT email, version FROM subscribers WHERE version > ?',
+                                        (version,)).fetchall()
+            finally:
+                conn.close()
+            self._apply(rows, version, rebuild)
+            self._synced_at = now
+
+    def _apply(self, rows, version, rebuild):
+        with self._lock:
+            if rebuild:
+                self._bloom = BloomFilter(max(len(rows) * 2, self.max_entries))
+                for email in self._written:
+                    self._bloom.add(email)
+            changed = 0
+            for email, row_version in rows:
+                self._bloom.add(email)
+                if version is None or row_version > version:
+                    self._entries.pop(email, None)
+                    changed += 1
+            if changed:
+                self._generation += 1
+            self.version = max([version or 0] + [row_version for _, row_version in rows])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.filtered
+            return {'entries': len(self._entries), 'max_entries': self.max_entries, 'hits': self.hits,
+                    'misses': self.misses, 'filtered': self.filtered, 'db_lookups': self.db_lookups,
+                    'hit_rate': round((self.hits + self.filtered) / lookups, 3) if lookups else 0.0,
+                    'bloom_keys': self._bloom.count if self._bloom else 0, 'version': self.version}
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Test script to verify per-subscriber alert rules
+"""
+
+from alert_rules import compile_rules, rules_to_json, rules_from_form, evaluate_for_members, default_rules
+from weather_checker import WeatherChecker
+
+def test_alert_rules():
+    """Test rule compilation, interning and batched evaluation"""
+    print("📏 Testing Alert Rules")
+    print("=" * 40)
+    
+    # Defaults are stored as NULL and reproduce the original fixed rules
+    assert rules_to_json([{'kind': 'sunscreen'}, {'kind': 'umbrella'}]) is None
+    weather = {'main': {'temp': 85.0}, 'weather': [{'main': 'Rain', 'description': 'light rain'}], 'wind': {'speed': 30}}
+    analysis = WeatherChecker().analyze_weather(weather)
+    assert analysis['notifications'] == [
+        "🌧️ Bring an umbrella! Rain is expected.",
+        "☀️🌧️ High temperature and rain expected. Bring umbrella AND sunscreen!"
+    ]
+    
+    # Form input with custom thresholds
+    form = {'alert_settings': '1', 'sunscreen_above': '90', 'wind_above': '25'}
+    custom_json = rules_to_json(rules_from_form(form))
+    custom = compile_rules(custom_json)
+    assert compile_rules(custom_json) is custom  # interned
+    print(f"Custom rules: {custom.describe()}")
+    
+    members = {default_rules(): ['a@example.com', 'b@example.com'], custom: ['c@example.com']}
+    results = evaluate_for_members(analysis['metrics'], members)
+    assert len(results) == 2
+    assert results[1] == (["💨 Strong wind expected. Hold on to your hat!"], ['c@example.com'])
+    print("✅ Each distinct rule set evaluated once per location")
+    
+    frost = compile_rules(rules_to_json([{'kind': 'frost', 'threshold': 32}]))
+    assert frost.evaluate((40.0, 45.0, 28.0, 0, 0)) == ["🥶 Frost expected. Bundle up and watch for ice!"]
+    assert frost.evaluate((40.0, 45.0, 35.0, 0, 0)) == []
+
+if __name__ == "__main__":
+    test_alert_rules()
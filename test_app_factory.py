@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the Flask app factory
+"""
+
+import os
+import tempfile
+from app import create_app
+
+def test_create_app():
+    """Test that create_app sets up the schema and serves requests without side effects at import"""
+    print("🏭 Testing App Factory")
+    print("=" * 40)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'subscribers.db')
+        app = create_app(db_path)
+        client = app.test_client()
+        
+        assert os.path.exists(db_path)
+        assert client.get('/').status_code == 200
+        assert client.get('/admin').status_code == 200
+        
+        response = client.post('/check_subscription', data={'email': 'nobody@example.com'})
+        assert response.get_json()['subscribed'] is False
+        
+        print(f"Cold start: {app.config['STARTUP_SECONDS'] * 1000:.1f} ms")
+        print("✅ App created with its own database and routes registered")
+
+if __name__ == "__main__":
+    test_create_app()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script to verify multi-recipient batch sending
+"""
+
+import mailbox
+import os
+import smtplib
+import tempfile
+import threading
+from email.mime.text import MIMEText
+from notification_sender import NotificationSender, UNDISCLOSED_RECIPIENTS
+from transports import SMTPTransport, MemoryTransport, MboxTransport, create_transport
+
+class FakeSMTP:
+    """Records sendmail calls and refuses recipients on a blocklist"""
+    def __init__(self, refused=()):
+        self.refused = set(refused)
+        self.transactions = []
+    
+    def sendmail(self, from_addr, to_addrs, msg):
+        self.transactions.append((list(to_addrs), msg))
+        refused = {r: (550, b'No such user') for r in to_addrs if r in self.refused}
+        if len(refused) == len(to_addrs):
+            raise smtplib.SMTPRecipientsRefused(refused)
+        return refused
+    
+    def rset(self):
+        pass
+    
+    def quit(self):
+        pass
+
+def test_batch_send():
+    """Test batching, privacy headers and per-recipient failure reporting"""
+    print("📨 Testing Batch Sending")
+    print("=" * 40)
+    
+    server = FakeSMTP(refused=['bad@example.com', 'x3@example.com', 'x4@example.com'])
+    transport = SMTPTransport(username='alerts@example.com', password='secret', batch_size=3)
+    transport._connect = lambda: server
+    sender = NotificationSender(transport)
+    sender.email_address = 'alerts@example.com'
+    
+    recipients = ['ok1@example.com', 'bad@example.com', 'ok2@example.com', 'x3@example.com', 'x4@example.com']
+    analysis = {
+        'location': 'Seattle, US',
+        'current_temperature': 60.0,
+        'daily_high': 85.0,
+        'description': 'light rain',
+        'notifications': ['🌧️ Bring an umbrella! Rain is expected.']
+    }
+    
+    failed = sender.send_batch_notification(analysis, recipients)
+    print(f"Transactions: {len(server.transactions)}, failed: {sorted(failed)}")
+    
+    assert [batch for batch, _ in server.transactions] == [recipients[:3], recipients[3:]]
+    assert sorted(failed) == ['bad@example.com', 'x3@example.com', 'x4@example.com']
+    assert failed['bad@example.com'].startswith('550')
+    for _, msg in server.transactions:
+        assert f"To: {UNDISCLOSED_RECIPIENTS}" in msg
+        assert 'ok1@example.com' not in msg
+    print("✅ Recipients stay in the envelope and failures are reported per recipient")
+    
+    # The counting sink measures the same send path without a network
+    sink = MemoryTransport()
+    sender = NotificationSender(sink)
+    sender.email_address = 'alerts@example.com'
+    assert sender.send_batch_notification(analysis, recipients) == {}
+    assert sink.stats()['messages'] == 1 and sink.stats()['recipients'] == 5
+    print(f"✅ Memory transport: {sink.stats()}")
+    
+    # MAIL_TRANSPORT=memory: every sender (one per pipeline thread) counts into the same sink
+    shared = create_transport('memory')
+    assert create_transport('memory') is shared
+    shared.reset()
+    for _ in range(3):
+        sender = NotificationSender(create_transport('memory'))
+        sender.email_address = 'alerts@example.com'
+        sender.send_batch_notification(analysis, recipients)
+    assert shared.stats()['messages'] == 3 and shared.stats()['recipients'] == 15
+
+def test_mbox_from_many_threads():
+    """Test that pipeline threads, each with its own transport, can share one mbox file"""
+    print("\n📬 Testing Mbox Transport Across Threads")
+    print("=" * 40)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'alerts.mbox')
+        failures = []
+        
+        def deliver():
+            transport = MboxTransport(path)
+            for i in range(25):
+                failures.append(transport.deliver('alerts@example.com', [f'user{i}@example.com'], MIMEText('hi')))
+        
+        threads = [threading.Thread(target=deliver) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert all(failed == {} for failed in failures)
+        assert len(mailbox.mbox(path)) == 50
+    print("✅ 50 of 50 messages delivered from 2 threads")
+
+if __name__ == "__main__":
+    test_batch_send()
+    test_mbox_from_many_threads()
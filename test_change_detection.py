@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Test script to verify that unchanged forecasts skip re-analysis and re-rendering
+"""
+
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from alert_engine import AlertEngine
+from simulator import (ReplayWeatherChecker, SimulatedClock, memory_sender_factory, response_key, seed_subscribers,
+                       synthetic_city, synthetic_responses)
+from transports import MemoryTransport
+from weather_checker import WeatherChecker
+
+class RecordingTransport(MemoryTransport):
+    """Memory transport that also keeps the decoded body of every message"""
+
+    def __init__(self):
+        super().__init__()
+        self.bodies = []
+
+    def deliver(self, from_addr, recipients, msg):
+        self.bodies.append(msg.get_payload(0).get_payload(decode=True).decode())
+        return super().deliver(from_addr, recipients, msg)
+
+def _engine(db_path, checker, clock, transport):
+    memory_sender = memory_sender_factory(transport)
+
+    def sender_factory():
+        sender = memory_sender()
+        sender.clock = clock
+        return sender
+
+    return AlertEngine(db_path, weather_checker_factory=lambda: checker, sender_factory=sender_factory, archive=False)
+
+def test_fingerprint():
+    """Test that the fingerprint follows the forecast-derived fields analysis reads, not the current conditions"""
+    print("🔎 Testing Analysis Fingerprints")
+    print("=" * 40)
+
+    checker = WeatherChecker()
+    responses = synthetic_responses(date(2024, 6, 1), [3600])
+    query = f"{synthetic_city(3600)},US"
+    weather, forecast = responses[response_key('weather', query)], responses[response_key('forecast', query)]
+    morning = datetime(2024, 6, 1, 7, 0)
+
+    fingerprint = checker.analysis_fingerprint(weather, forecast, morning)
+    assert fingerprint == checker.analysis_fingerprint(dict(weather, name='Renamed'), forecast, morning)
+    # Current temperature and wind only change the header, not the outlook
+    warmer = dict(weather, main={'temp': 90.0}, wind={'speed': 20.0})
+    assert fingerprint == checker.analysis_fingerprint(warmer, forecast, morning)
+    assert fingerprint != checker.analysis_fingerprint(
+        dict(weather, weather=[{'main': 'Rain', 'description': 'heavy rain'}]), forecast, morning)
+    # The synthetic forecast repeats daily, so the next day has the same outlook; a different one doesn't
+    tomorrow = morning + timedelta(days=1)
+    assert fingerprint == checker.analysis_fingerprint(weather, forecast, tomorrow)
+    hotter = dict(forecast, list=[dict(item, main={'temp': 99.0}) for item in forecast['list']])
+    assert fingerprint != checker.analysis_fingerprint(weather, hotter, tomorrow)
+    # Without a forecast the daily high is the current temperature
+    assert checker.analysis_fingerprint(weather, None, morning) != checker.analysis_fingerprint(warmer, None, morning)
+    assert checker.analysis_fingerprint({'main': {}}, forecast, morning) is None
+
+    # Reusing an analysis with fresh current conditions matches analyzing from scratch
+    analysis = checker.analyze_weather(weather, forecast, now_utc=morning)
+    assert checker.with_current_conditions(analysis, warmer, forecast, tomorrow) == \
+        checker.analyze_weather(warmer, forecast, now_utc=tomorrow)
+    print(f"Fingerprint: {fingerprint}")
+    print("✅ Fingerprints change only when the outlook does")
+
+def test_unchanged_locations_are_reused():
+    """Test that a second check reuses every analysis and message body, and a changed location is redone"""
+    print("\n♻️ Testing Change Detection Across Checks")
+    print("=" * 40)
+
+    offsets = [-18000, 3600]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'subscribers.db')
+        seed_subscribers(db_path, [synthetic_city(offset, index) for offset in offsets for index in range(5)], 40)
+        responses = synthetic_responses(date(2024, 6, 1), offsets, 5)
+        checker = ReplayWeatherChecker(responses)
+        clock = SimulatedClock(datetime(2024, 6, 1, 8, 0, 5))
+        transport = RecordingTransport()
+        engine = _engine(db_path, checker, clock, transport)
+
+        first = engine.send_notifications_to_all().summary()['change_detection']
+        assert first['analyses'] == 10 and first['analyses_skipped'] == 0 and first['renders_skipped'] == 0
+
+        second = engine.send_notifications_to_all()
+        change_detection = second.summary()['change_detection']
+        assert change_detection['analyses_skipped'] == 10
+        assert change_detection['renders_skipped'] == change_detection['renders'] == 10
+        assert change_detection['skip_ratio'] == 1.0
+        assert second.alerts_sent == 40
+        print(f"Unchanged: {change_detection}")
+
+        # One location's rain gets heavier and another warms up: only they are analyzed and rendered again.
+        # send-all fetches no forecast, so the current temperature stands in for the daily high
+        heavier = f"{synthetic_city(3600, 2)},US"
+        responses[response_key('weather', heavier)]['weather'] = [{'main': 'Rain', 'description': 'heavy rain'}]
+        warmer = f"{synthetic_city(3600, 3)},US"
+        responses[response_key('weather', warmer)]['main']['temp'] = 95.0
+        transport.bodies.clear()
+        third = engine.send_notifications_to_all()
+        change_detection = third.summary()['change_detection']
+        assert change_detection['analyses_skipped'] == 8 and change_detection['renders_skipped'] == 8
+        assert third.alerts_sent == 40
+        group = next(group for group in engine.subscriber_index.all_groups()
+                     if group.location == synthetic_city(3600, 2))
+        assert group.last_analysis[1]['description'] == 'heavy rain'
+        assert sum('95.0°F' in body for body in transport.bodies) == 1
+        print(f"One changed: {change_detection}")
+
+        # A minute later the bodies still hold; each send is stamped with the current time
+        clock.advance(60)
+        transport.bodies.clear()
+        fourth = engine.send_notifications_to_all().summary()['change_detection']
+        assert fourth['analyses_skipped'] == 10 and fourth['renders_skipped'] == 10
+        assert all('2024-06-01 08:01:05' in body for body in transport.bodies)
+    print("✅ Only changed locations are analyzed and rendered again")
+
+def test_scheduler_cycles_reuse_analyses():
+    """Test that an unchanged outlook is reused by the next day's 8:00 AM scheduler cycle"""
+    print("\n⏰ Testing Change Detection Across Scheduler Cycles")
+    print("=" * 40)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'subscribers.db')
+        seed_subscribers(db_path, [synthetic_city(-18000, index) for index in range(5)], 20)
+        responses = synthetic_responses(date(2024, 6, 1), [-18000], 5)
+        checker = ReplayWeatherChecker(responses)
+        clock = SimulatedClock(datetime(2024, 6, 1, 13, 0))  # 8:00 AM at UTC-5
+        transport = RecordingTransport()
+        engine = _engine(db_path, checker, clock, transport)
+
+        first = engine.run_cycle(now_utc=clock())
+        assert first.alerts_sent == 20
+        assert first.summary()['change_detection']['analyses_skipped'] == 0
+        # Each location runs once a day, so the next minute's cycle has nothing to do
+        assert engine.run_cycle(now_utc=clock.advance(60)).alerts_sent == 0
+
+        # Next morning: a new forecast with the same outlook, and a warmer start for one city
+        clock.advance(86400 - 60)
+        responses.update(synthetic_responses(date(2024, 6, 2), [-18000], 5))
+        responses[response_key('weather', f"{synthetic_city(-18000, 1)},US")]['main']['temp'] = 77.0
+        transport.bodies.clear()
+        second = engine.run_cycle(now_utc=clock())
+        change_detection = second.summary()['change_detection']
+        assert second.alerts_sent == 20
+        assert change_detection['analyses_skipped'] == 5 and change_detection['renders_skipped'] == 5
+        assert all('2024-06-02 13:00:00' in body for body in transport.bodies)
+        assert sum('77.0°F' in body for body in transport.bodies) == 1
+        print(f"Next day: {change_detection}")
+    print("✅ The next day's cycle reuses unchanged analyses and bodies")
+
+if __name__ == "__main__":
+    test_fingerprint()
+    test_unchanged_locations_are_reused()
+    test_scheduler_cycles_reuse_analyses()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the batch CLI and concurrent alert engine runs
+"""
+
+import os
+import tempfile
+from datetime import datetime
+from alert_engine import AlertEngine
+from main import build_parser, run_command
+from simulator import ReplayWeatherChecker, memory_sender_factory, seed_subscribers, synthetic_city, synthetic_responses
+from transports import MemoryTransport
+
+def test_bench_command():
+    """Test that bench sends every alert once and reports throughput, sequentially and with workers"""
+    print("🏁 Testing Batch CLI")
+    print("=" * 40)
+    
+    for workers in (1, 4):
+        args = build_parser().parse_args(['bench', '--subscribers', '300', '--locations', '20',
+                                          '--workers', str(workers)])
+        summary = run_command(args)
+        
+        # Every bench location is rainy at 8:00 AM, so everyone gets exactly one alert
+        assert summary['locations'] == 20
+        assert summary['alerts_sent'] == 300
+        assert summary['alerts_failed'] == 0 and summary['errors'] == 0
+        assert summary['transport'] == {'messages': 20, 'recipients': 300, 'bytes': summary['transport']['bytes']}
+        assert summary['locations_per_second'] > 0
+        assert summary['p50_ms'] <= summary['p95_ms'] <= summary['max_ms']
+        print(f"{workers} workers: {summary['alerts_per_second']} alerts/s")
+    
+    print("✅ Batch CLI test completed!")
+
+def test_parser():
+    """Test subcommand flags"""
+    args = build_parser().parse_args(['send-due', '--workers', '8', '--at', '2024-06-01T15:00', '--db', 'x.db'])
+    assert args.workers == 8 and args.db == 'x.db'
+    assert (args.at.hour, args.at.minute) == (15, 0)
+    assert build_parser().parse_args([]).command is None
+
+def test_send_due_from_fresh_processes():
+    """Test that repeated send-due runs (e.g. from cron) send each location's 8:00 AM alert once"""
+    print("\n⏰ Testing send-due From Fresh Processes")
+    print("=" * 40)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'subscribers.db')
+        seed_subscribers(db_path, [synthetic_city(0)], 3)
+        checker = ReplayWeatherChecker(synthetic_responses(datetime(2024, 6, 1).date(), [0]))
+        transport = MemoryTransport()
+        sent = []
+        for minute in range(5):
+            # What `main.py send-due` does, with nothing carried over from the previous run
+            engine = AlertEngine(db_path, weather_checker_factory=lambda: checker,
+                                 sender_factory=memory_sender_factory(transport), archive=False)
+            now_utc = datetime(2024, 6, 1, 8, minute)
+            engine.subscriber_index.refresh()
+            engine.learn_offsets(now_utc, recheck=False)
+            sent.append(engine.send_due(now_utc).alerts_sent)
+        assert sent == [3, 0, 0, 0, 0]
+        assert transport.stats()['recipients'] == 3
+        
+        # The next day is due again
+        engine.subscriber_index.refresh()
+        assert engine.send_due(datetime(2024, 6, 2, 8, 0)).alerts_sent == 3
+        print(f"Alerts sent per run: {sent}")
+    print("✅ Each location is sent once per local day")
+
+if __name__ == "__main__":
+    test_parser()
+    test_bench_command()
+    test_send_due_from_fresh_processes()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test script to verify compact forecasts and local-day rollups
+"""
+
+import sys
+from datetime import datetime, date, timezone
+from forecast import CompactForecast
+from weather_checker import WeatherChecker
+
+def _forecast_payload(offset):
+    """A synthetic /forecast response: 3-hourly steps from 2024-07-01 00:00 UTC"""
+    start = int(datetime(2024, 7, 1, tzinfo=timezone.utc).timestamp())
+    items = []
+    for step in range(16):
+        items.append({
+            'dt': start + step * 3 * 3600,
+            'main': {'temp': 60.0 + step},
+            'weather': [{'id': 500 if step in (9, 10) else 800, 'main': 'Rain', 'description': 'light rain'}],
+            'pop': step / 20
+        })
+    return {'list': items, 'city': {'name': 'Seattle', 'timezone': offset}}
+
+def test_compact_forecast():
+    """Test that rollups follow the location's local day rather than the server's"""
+    print("📦 Testing Compact Forecast")
+    print("=" * 40)
+    
+    payload = _forecast_payload(-7 * 3600)
+    forecast = CompactForecast.from_owm(payload)
+    assert len(forecast) == 16
+    
+    # 00:00 UTC on July 1st is still June 30th in Seattle
+    assert sorted(forecast.days) == [date(2024, 6, 30), date(2024, 7, 1), date(2024, 7, 2)]
+    july_1 = forecast.days[date(2024, 7, 1)]
+    assert (july_1.low, july_1.high) == (63.0, 70.0)
+    assert july_1.rain_hours == 6
+    assert abs(july_1.max_pop - 0.5) < 1e-6
+    print(f"July 1st in Seattle: {july_1.to_dict()}")
+    
+    today = forecast.today(datetime(2024, 7, 1, 20, 0))
+    assert today is july_1
+    
+    raw_size = sys.getsizeof(str(payload))
+    compact_size = sum(sys.getsizeof(a) for a in (forecast.timestamps, forecast.temps, forecast.pops, forecast.condition_ids))
+    print(f"Raw payload text: {raw_size} bytes, compact arrays: {compact_size} bytes")
+    
+    # The checker accepts both the raw payload and the compact form
+    checker = WeatherChecker()
+    assert checker._get_daily_high_temperature(payload) == checker._get_daily_high_temperature(forecast)
+    print("✅ Local-day rollups computed at ingest")
+
+if __name__ == "__main__":
+    test_compact_forecast()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test script to verify schema migrations and the normalized subscriber tables
+"""
+
+import os
+import sqlite3
+import tempfile
+from database import (init_db, connect, schema_version, SCHEMA_VERSION, upsert_subscriber, bucket_counts,
+                      prune_deliveries, BUCKET_COUNTS_SQL)
+from alert_engine import AlertEngine
+
+def _create_legacy_db(path):
+    """A database from before version and alert_rules columns existed"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE subscribers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            city TEXT NOT NULL,
+            zipcode TEXT,
+            country_code TEXT NOT NULL,
+            subscribed_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_notification TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1
+        )
+    ''')
+    conn.executemany('INSERT INTO subscribers (email, city, zipcode, country_code, is_active) VALUES (?, ?, ?, ?, ?)', [
+        ('a@example.com', 'Seattle', '', 'US', 1),
+        ('b@example.com', 'seattle ', None, 'us', 1),
+        ('c@example.com', 'Tokyo', '', 'JP', 0),
+    ])
+    conn.commit()
+    conn.close()
+
+def test_legacy_database_migrates():
+    """Test that an old single-table database is normalized without losing subscribers"""
+    print("🗄️ Testing Database Migrations")
+    print("=" * 40)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'legacy.db')
+        _create_legacy_db(db_path)
+        
+        assert init_db(db_path) == [1, 2, 3, 4, 5, 6, 7, 8]
+        assert schema_version(db_path) == SCHEMA_VERSION
+        assert init_db(db_path) == []  # Already current
+        
+        conn = connect(db_path)
+        rows = conn.execute('''
+            SELECT s.id, s.email, l.city, s.is_active FROM subscribers s JOIN locations l ON l.id = s.location_id
+            ORDER BY s.id
+        ''').fetchall()
+        print(f"Migrated rows: {rows}")
+        assert [row[:2] for row in rows] == [(1, 'a@example.com'), (2, 'b@example.com'), (3, 'c@example.com')]
+        # Both Seattle spellings share one location row
+        assert conn.execute('SELECT COUNT(*) FROM locations').fetchone()[0] == 2
+        assert rows[0][2] == rows[1][2] == 'Seattle'
+        
+        # Equal custom rules share one settings row
+        rules = '[{"kind":"frost","threshold":30.0}]'
+        upsert_subscriber(conn.cursor(), 'd@example.com', 'Oslo', '', 'NO', rules)
+        upsert_subscriber(conn.cursor(), 'e@example.com', 'Oslo', '', 'NO', rules)
+        conn.commit()
+        assert conn.execute('SELECT COUNT(*) FROM alert_settings').fetchone()[0] == 1
+        conn.close()
+    
+    print("✅ Migration test completed!")
+
+def test_bucket_queries_and_deliveries():
+    """Test the per-bucket counts use the offset index and deliveries are recorded"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'subscribers.db')
+        init_db(db_path)
+        conn = connect(db_path)
+        upsert_subscriber(conn.cursor(), 'a@example.com', 'Seattle', '', 'US')
+        upsert_subscriber(conn.cursor(), 'b@example.com', 'Seattle', '', 'US')
+        upsert_subscriber(conn.cursor(), 'c@example.com', 'Tokyo', '', 'JP')
+        conn.commit()
+        
+        plan = ' '.join(str(row) for row in conn.execute('EXPLAIN QUERY PLAN ' + BUCKET_COUNTS_SQL))
+        print(f"Bucket counts plan: {plan}")
+        assert 'COVERING INDEX idx_locations_offset' in plan and 'COVERING INDEX idx_subscribers_location' in plan
+        
+        engine = AlertEngine(db_path)
+        engine.subscriber_index.refresh()
+        seattle = engine.subscriber_index.get('a@example.com').group
+        engine.subscriber_index.set_offset(seattle, -25200)
+        assert bucket_counts(db_path) == [(None, 1, 1), (-25200, 1, 2)]
+        
+        sent, failed = engine._record_delivery(seattle, ['🌧️'], ['a@example.com', 'b@example.com'],
+                                               {'b@example.com': 'mailbox full'})
+        assert (sent, failed) == (1, 1)
+        history = conn.execute('SELECT subscriber_id, status, error FROM deliveries ORDER BY id').fetchall()
+        assert history == [(1, 'sent', None), (2, 'failed', 'mailbox full')]
+        assert conn.execute('SELECT last_notification IS NOT NULL FROM subscribers ORDER BY id').fetchall() == [
+            (1,), (0,), (0,)]
+        
+        # History past the retention window is pruned, through the sent_at index
+        conn.execute("UPDATE deliveries SET sent_at = '2020-01-01 08:00:00' WHERE status = 'failed'")
+        conn.commit()
+        plan = ' '.join(str(row) for row in conn.execute('EXPLAIN QUERY PLAN DELETE FROM deliveries WHERE sent_at < ?',
+                                                         ('2024-01-01',)))
+        assert 'idx_deliveries_sent_at' in plan
+        assert prune_deliveries(db_path, 0) == 0  # Kept forever
+        assert prune_deliveries(db_path, 90) == 1
+        assert conn.execute('SELECT status FROM deliveries').fetchall() == [('sent',)]
+        conn.close()
+
+if __name__ == "__main__":
+    test_legacy_database_migrates()
+    test_bucket_queries_and_deliveries()
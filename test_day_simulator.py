@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test script to replay a full day of the timezone scheduler in simulated time
+"""
+
+import json
+import os
+import tempfile
+from datetime import date
+from database import connect
+from main import build_parser, run_command
+from simulator import (DaySimulator, SIMULATED_OFFSETS, print_report, seed_subscribers, synthetic_city,
+                       synthetic_responses)
+
+def _simulate(tmp, step_seconds, workers=1):
+    day = date(2024, 6, 1)
+    db_path = os.path.join(tmp, f'simulation-{step_seconds}-{workers}.db')
+    cities = [synthetic_city(offset, index) for offset in SIMULATED_OFFSETS for index in range(2)]
+    seed_subscribers(db_path, cities, 500)
+    simulator = DaySimulator(db_path, synthetic_responses(day, SIMULATED_OFFSETS, 2), day,
+                             step_seconds=step_seconds, workers=workers)
+    return simulator, simulator.run()
+
+def test_full_day_every_offset():
+    """Test that every offset bucket is dispatched exactly once, on time, in one simulated day"""
+    print("🗓️ Testing Day Simulator")
+    print("=" * 40)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        simulator, report = _simulate(tmp, 60)
+        print_report(report)
+        
+        assert report['cycles'] == 1440
+        assert len(report['buckets']) == len(SIMULATED_OFFSETS)
+        for bucket in report['buckets']:
+            assert bucket['dispatches'] == bucket['locations'] == 2
+            assert bucket['subscribers_checked'] == bucket['subscribers_due']
+            # Synthetic weather is rainy everywhere, so everyone is alerted
+            assert bucket['alerts_sent'] == bucket['subscribers_due']
+            assert bucket['lag_max_seconds'] == 0  # Simulated time: every run starts at 8:00:00 exactly
+        assert report['transport']['recipients'] == 500
+        assert 0 < report['cycle_p50_seconds'] <= report['cycle_max_seconds']
+
+        # A location dispatched twice still counts its deliveries once
+        simulator.engine.dispatches.append(simulator.engine.dispatches[0])
+        report = simulator.report([0.0], 0.0)
+        assert sum(bucket['alerts_sent'] for bucket in report['buckets']) == 500
+        
+        # Cycles every 4 minutes still land inside the 5-minute window, just later
+        _, report = _simulate(tmp, 240, workers=4)
+        assert sum(bucket['alerts_sent'] for bucket in report['buckets']) == 500
+        assert max(bucket['lag_max_seconds'] for bucket in report['buckets']) >= 60
+    
+    print("✅ Day simulator test completed!")
+
+def test_recorded_simulation_leaves_database_alone():
+    """Test that simulating against real subscribers writes nothing to their database"""
+    print("\n🧪 Testing Simulation Against a Real Database")
+    print("=" * 40)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'subscribers.db')
+        offsets = [-18000, 3600]
+        seed_subscribers(db_path, [synthetic_city(offset) for offset in offsets], 20)
+        recording = os.path.join(tmp, 'responses.json')
+        with open(recording, 'w') as f:
+            json.dump({'recorded_at': '2024-05-31T00:00:00',
+                       'responses': synthetic_responses(date(2024, 6, 1), offsets)}, f)
+        
+        report = run_command(build_parser().parse_args(['simulate', '--responses', recording, '--db', db_path]))
+        assert sum(bucket['alerts_sent'] for bucket in report['buckets']) == 20
+        
+        conn = connect(db_path)
+        assert conn.execute('SELECT COUNT(*) FROM deliveries').fetchone()[0] == 0
+        assert conn.execute('SELECT COUNT(*) FROM subscribers WHERE last_notification IS NOT NULL').fetchone()[0] == 0
+        assert conn.execute('SELECT COUNT(*) FROM locations WHERE utc_offset IS NOT NULL '
+                            'OR latitude IS NOT NULL OR last_run_date IS NOT NULL').fetchone()[0] == 0
+        conn.close()
+    print("✅ Simulated sends stay in a scratch copy")
+
+if __name__ == "__main__":
+    test_full_day_every_offset()
+    test_recorded_simulation_leaves_database_alone()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the cached public forecast API
+"""
+
+import os
+import tempfile
+import threading
+from datetime import date, datetime
+from app import create_app
+from forecast_service import ForecastService
+from location_index import get_location_index
+from simulator import ReplayWeatherChecker, synthetic_city, synthetic_responses
+from weather_checker import response_key
+
+class ManualClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def _nashville_checker(latency_seconds=0.0):
+    """Replayed rainy weather for Nashville, US"""
+    synthetic = synthetic_responses(date(2024, 6, 1), [-18000])
+    query = f"{synthetic_city(-18000)},US"
+    responses = {response_key(kind, 'Nashville,US'): synthetic[response_key(kind, query)]
+                 for kind in ('weather', 'forecast')}
+    return ReplayWeatherChecker(responses, latency_seconds=latency_seconds)
+
+def _service(checker, clock=None):
+    return ForecastService(weather_checker_factory=lambda: checker, ttl=600, stale_seconds=1800,
+                           clock=clock or ManualClock(), now_utc=lambda: datetime(2024, 6, 1, 14))
+
+def test_concurrent_requests_share_one_fetch():
+    """Test that 1,000 concurrent requests for one city cause one upstream refresh"""
+    print("🌦️ Testing Forecast Service")
+    print("=" * 40)
+
+    nashville = get_location_index().resolve('Nashville', '', 'US').id
+    checker = _nashville_checker(latency_seconds=0.05)
+    clock = ManualClock()
+    service = _service(checker, clock)
+
+    start = threading.Barrier(1000)
+    results = []
+    def request():
+        start.wait()
+        results.append(service.get(nashville))
+    threads = [threading.Thread(target=request) for _ in range(1000)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 1000 and len({id(entry) for entry in results}) == 1
+    assert service.fetches == 1
+    assert sum(checker.calls.values()) == 2  # Current weather + forecast, once each
+    entry = results[0]
+    assert entry.payload['location']['city'] == 'Nashville'
+    assert entry.payload['today']['date'] == '2024-06-01'
+    assert "🌧️ Bring an umbrella! Rain is expected." in entry.payload['notifications']
+    assert [day['date'] for day in entry.payload['days']] == ['2024-06-01', '2024-06-02']
+    print(f"1000 requests, {service.fetches} upstream refresh: {service.stats()}")
+
+    # Stale: served immediately while a single background refresh runs
+    clock.now += 700
+    stale = [service.get(nashville) for _ in range(50)]
+    assert all(served is entry for served in stale)
+    for _ in range(100):
+        if service.stats()['in_flight'] == 0 and service.fetches == 2:
+            break
+        threading.Event().wait(0.02)
+    assert service.fetches == 2
+    assert service.get(nashville) is not entry
+
+    # Too old to serve stale: fetched again before answering
+    clock.now += 3000
+    service.get(nashville)
+    assert service.fetches == 3
+    print("✅ Misses coalesce, stale entries revalidate in the background")
+
+def test_forecast_endpoint():
+    """Test the /api/forecast endpoint's caching headers and conditional requests"""
+    print("\n🔁 Testing /api/forecast")
+    print("=" * 40)
+
+    nashville = get_location_index().resolve('Nashville', '', 'US').id
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(os.path.join(tmp, 'subscribers.db'))
+        checker = _nashville_checker()
+        app.extensions['forecast_service'] = _service(checker)
+        client = app.test_client()
+
+        # Keyed by the city ids /api/locations hands out, not by subscriber database rows
+        suggestion = client.get('/api/locations?prefix=nashville&country=US').get_json()['results'][0]
+        assert suggestion['id'] == nashville
+        response = client.get(f'/api/forecast/{nashville}')
+        assert response.status_code == 200
+        assert response.get_json()['location']['label'] == 'Nashville, US'
+        assert response.get_json()['location']['id'] == nashville
+        etag = response.headers['ETag']
+        assert response.headers['Cache-Control'] == 'public, max-age=600, stale-while-revalidate=1800'
+
+        # Unchanged since the client's copy: no body
+        response = client.get(f'/api/forecast/{nashville}', headers={'If-None-Match': etag})
+        assert response.status_code == 304 and response.data == b''
+        assert sum(checker.calls.values()) == 2
+
+        response = client.get('/api/forecast/999999')
+        assert response.status_code == 404 and response.get_json()['error'] == 'Unknown city'
+
+        # Provider down and nothing cached
+        app.extensions['forecast_service'] = _service(ReplayWeatherChecker({}))
+        assert client.get(f'/api/forecast/{nashville}').status_code == 503
+    print("✅ ETag, Cache-Control, 304, 404 and 503 responses")
+
+if __name__ == "__main__":
+    test_concurrent_requests_share_one_fetch()
+    test_forecast_endpoint()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script to verify geo clustering of nearby locations
+"""
+
+import os
+import tempfile
+from datetime import date
+from geo_cluster import ClusterFetcher, cluster_groups, distance_km
+from subscriber_index import LocationGroup
+from alert_engine import AlertEngine
+from simulator import ReplayWeatherChecker, memory_sender_factory, seed_subscribers, synthetic_city, synthetic_responses
+from transports import MemoryTransport
+
+def _group(key, city, latitude=None, longitude=None, offset=-18000):
+    return LocationGroup(key, city, '', 'US', offset, latitude, longitude)
+
+def test_cluster_groups():
+    """Test grid and radius clustering, and that offsets and unknown coordinates are kept apart"""
+    print("🗺️ Testing Geo Clustering")
+    print("=" * 40)
+
+    groups = [
+        _group(1, 'Nashville 37201', 36.165, -86.778),
+        _group(2, 'Nashville 37203', 36.150, -86.790),
+        _group(3, 'Nashville 37211', 36.120, -86.690),
+        _group(4, 'Franklin', 35.925, -86.869),
+        _group(5, 'Phoenix', 33.448, -112.074, offset=-25200),
+        _group(6, 'Nashville, other offset', 36.165, -86.778, offset=-21600),
+        _group(7, 'Not looked up yet'),
+    ]
+    assert round(distance_km(36.165, -86.778, 36.120, -86.690)) == 9
+
+    clusters = cluster_groups(groups, 'radius', 10)
+    assert sorted(group.key for group in clusters[0]) == [1, 2, 3]
+    assert len(clusters) == 5
+
+    # Grid cells don't care who came first, but neighbours can straddle a cell edge
+    grid = cluster_groups(groups, 'grid', 10)
+    assert 5 <= len(grid) <= 7
+    assert all(len({group.offset for group in cluster}) == 1 for cluster in grid)
+    assert len(cluster_groups(groups, 'grid', 500)) <= len(grid)
+
+    assert cluster_groups(groups, 'off', 10) == [[group] for group in groups]
+    print(f"{len(groups)} locations: {len(clusters)} radius clusters, {len(grid)} grid clusters")
+    print("✅ Nearby locations cluster, different offsets don't")
+
+def test_clustered_cycle():
+    """Test that a clustered cycle fetches once per cluster and still alerts every subscriber"""
+    print("\n🌐 Testing Clustered Alert Cycle")
+    print("=" * 40)
+
+    offsets = [-18000, 0, 32400]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'subscribers.db')
+        seed_subscribers(db_path, [synthetic_city(offset, index) for offset in offsets for index in range(5)], 60)
+        checker = ReplayWeatherChecker(synthetic_responses(date(2024, 6, 1), offsets, 5))
+        transport = MemoryTransport()
+        engine = AlertEngine(db_path, weather_checker_factory=lambda: checker,
+                             sender_factory=memory_sender_factory(transport), cluster_mode='radius', cluster_km=10)
+
+        # First run learns each location's coordinates, so nothing clusters yet
+        stats = engine.send_notifications_to_all(workers=4)
+        assert stats.alerts_sent == 60
+        assert sum(checker.calls.values()) == 15
+
+        # From then on the 15 locations are fetched as 3 clusters
+        checker.calls.clear()
+        stats = engine.send_notifications_to_all(workers=4)
+        assert stats.alerts_sent == 60
+        assert sum(checker.calls.values()) == 3
+        assert stats.clustering['clusters'] == 3 and stats.clustering['fetches_saved'] == 12
+        assert stats.clustering['saved_percent'] == 80.0
+        assert transport.stats()['recipients'] == 120
+
+        # Coordinates are stored, so a restarted engine clusters on its first run
+        checker.calls.clear()
+        engine = AlertEngine(db_path, weather_checker_factory=lambda: checker,
+                             sender_factory=memory_sender_factory(transport), cluster_mode='grid', cluster_km=50)
+        assert engine.send_notifications_to_all().alerts_sent == 60
+        assert sum(checker.calls.values()) == 3
+
+    print(f"Clustering: {stats.clustering}")
+    print("✅ One fetch per cluster, every subscriber alerted")
+
+def test_failed_lookup_is_retried():
+    """Test that a failed cluster lookup isn't shared, so the next member fetches again"""
+    print("\n🔁 Testing Failed Cluster Lookups")
+    print("=" * 40)
+
+    class FlakyChecker:
+        def __init__(self):
+            self.calls = []
+
+        def get_weather_data_for_location(self, location, country_code):
+            self.calls.append(location)
+            if len(self.calls) == 1:
+                return None
+            if len(self.calls) == 2:
+                raise ConnectionError("timed out")
+            return {'name': location}
+
+    checker = FlakyChecker()
+    cluster = [_group(1, 'Nashville 37201', 36.165, -86.778), _group(2, 'Nashville 37203', 36.150, -86.790),
+               _group(3, 'Nashville 37211', 36.120, -86.690), _group(4, 'Franklin', 35.925, -86.869)]
+    fetcher = ClusterFetcher(checker, [cluster])
+
+    assert fetcher.get_weather_data_for_location('Nashville 37203', 'US') is None
+    try:
+        fetcher.get_weather_data_for_location('Nashville 37211', 'US')
+        assert False, "the lookup error should reach the caller"
+    except ConnectionError:
+        pass
+    # The third member fetches again, and the fourth shares its result
+    assert fetcher.get_weather_data_for_location('Franklin', 'US') == {'name': 'Nashville 37201'}
+    assert fetcher.get_weather_data_for_location('Nashville 37201', 'US') == {'name': 'Nashville 37201'}
+    assert checker.calls == ['Nashville 37201'] * 3
+    assert fetcher.stats()['fetches_saved'] == 1
+    print(f"Clustering: {fetcher.stats()}")
+    print("✅ Failed lookups are retried, successful ones shared")
+
+if __name__ == "__main__":
+    test_cluster_groups()
+    test_clustered_cycle()
+    test_failed_lookup_is_retried()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script to verify background admin jobs
+"""
+
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+from app import create_app
+from alert_engine import AlertEngine
+from database import connect, init_db
+from jobs import JobRunner
+from simulator import ReplayWeatherChecker, memory_sender_factory, seed_subscribers, synthetic_city, synthetic_responses
+from transports import MemoryTransport
+
+def _blocking_job(job, started, release):
+    job.set_total(3)
+    started.set()
+    for _ in range(3):
+        release.wait(5)
+        job.advance(steps=1)
+        if job.cancelled:
+            return {'stopped': True}
+    return {'done': True}
+
+def _failing_job(job):
+    raise RuntimeError('boom')
+
+def test_job_runner():
+    """Test single-flight submission, progress, cancellation from another worker and failures"""
+    print("🧵 Testing Job Runner")
+    print("=" * 40)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'subscribers.db')
+        init_db(db_path)
+        runner = JobRunner(db_path, workers=2, flush_interval=0)
+        other_worker = JobRunner(db_path, workers=1, flush_interval=0)
+
+        started, release = threading.Event(), threading.Event()
+        job, created = runner.submit('send-all', _blocking_job, started, release)
+        assert created and job['status'] in ('queued', 'running')
+        assert started.wait(5)
+
+        # A second click, on either worker, gets the job that's already running
+        again, created = other_worker.submit('send-all', _blocking_job, started, release)
+        assert not created and again['id'] == job['id'] and again['status'] == 'running'
+        assert runner.get(job['id'])['total'] == 3
+
+        # Other kinds aren't blocked
+        failed, created = runner.submit('other', _failing_job)
+        assert created
+        failed = runner.wait(failed['id'], 5)
+        assert failed['status'] == 'failed' and failed['error'] == 'boom'
+
+        # Cancelled from the other worker: noticed at the job's next progress update
+        assert other_worker.cancel(job['id'])
+        release.set()
+        job = runner.wait(job['id'], 5)
+        assert job['status'] == 'cancelled' and job['progress'] == {'steps': 1}
+        assert job['result'] == {'stopped': True}
+        assert not runner.cancel(job['id'])  # Already finished
+
+        # Finished, so a new one can start
+        job, created = runner.submit('send-all', _blocking_job, started, release)
+        assert created
+        assert runner.wait(job['id'], 5)['result'] == {'done': True}
+
+        # A job whose worker died stops blocking new ones once its heartbeat is stale
+        conn = connect(db_path)
+        with conn:
+            conn.execute("INSERT INTO jobs (id, kind, status, created_at, heartbeat) "
+                         "VALUES ('dead', 'send-all', 'running', '2024-06-01T08:00:00', ?)", (time.time() - 600,))
+        conn.close()
+        job, created = runner.submit('send-all', _blocking_job, started, release)
+        assert created and runner.get('dead')['status'] == 'failed'
+        assert runner.wait(job['id'], 5)['status'] == 'succeeded'
+        runner.shutdown()
+    print("✅ Single-flight, progress, cancellation and failures work")
+
+def test_send_test_runs_in_background():
+    """Test that /send_test returns at once and the job's progress can be polled and cancelled"""
+    print("\n📬 Testing Background Bulk Sends")
+    print("=" * 40)
+
+    offsets = [-18000, 3600]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'subscribers.db')
+        seed_subscribers(db_path, [synthetic_city(offset, index) for offset in offsets for index in range(10)], 40)
+        app = create_app(db_path)
+        checker = ReplayWeatherChecker(synthetic_responses(date(2024, 6, 1), offsets, 10), latency_seconds=0.05)
+        transport = MemoryTransport()
+        app.extensions['alert_engine'] = AlertEngine(db_path, weather_checker_factory=lambda: checker,
+                                                     sender_factory=memory_sender_factory(transport), archive=False)
+        runner = app.extensions['job_runner'] = JobRunner(db_path, flush_interval=0)
+        client = app.test_client()
+
+        started = time.perf_counter()
+        response = client.post('/send_test')
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 302
+        assert elapsed < 0.5  # 20 locations at 50 ms each would take a second inline
+        job_id = runner.recent(1)[0]['id']
+
+        # A second click doesn't start an overlapping run
+        client.post('/send_test')
+        assert len(runner.recent(10)) == 1
+        assert job_id in client.get('/admin').get_data(as_text=True)
+
+        runner.wait(job_id, 10)
+        job = client.get(f'/admin/jobs/{job_id}').get_json()
+        assert job['status'] == 'succeeded' and job['total'] == 20
+        assert job['progress']['locations'] == 20 and job['progress']['alerts_sent'] == 40
+        assert job['result']['alerts_sent'] == 40
+        assert client.post(f'/admin/jobs/{job_id}/cancel').status_code == 409
+        assert client.get('/admin/jobs/missing').status_code == 404
+        print(f"Request returned in {elapsed * 1000:.1f} ms; job progress {job['progress']}")
+
+        # Cancelled part way: locations already fetched finish, the rest never start
+        client.post('/send_test')
+        job_id = runner.recent(1)[0]['id']
+        time.sleep(0.1)
+        assert client.post(f'/admin/jobs/{job_id}/cancel').get_json()['cancel_requested']
+        job = runner.wait(job_id, 10)
+        assert job['status'] == 'cancelled'
+        assert job['progress']['locations'] < 20
+        print(f"Cancelled after {job['progress']['locations']} of {job['total']} locations")
+        runner.shutdown()
+    print("✅ Bulk sends run as tracked, cancellable jobs")
+
+if __name__ == "__main__":
+    test_job_runner()
+    test_send_test_runs_in_background()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the offline location index and autocomplete endpoint
+"""
+
+import os
+import tempfile
+import time
+from location_index import LocationIndex
+from app import create_app
+
+def test_location_index():
+    """Test prefix search, postal code lookup and offline validation against the bundled dataset"""
+    print("📍 Testing Location Index")
+    print("=" * 40)
+
+    index = LocationIndex()
+    started = time.perf_counter()
+    assert len(index) > 100
+    print(f"Loaded {len(index)} cities in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    # Prefix search is case-insensitive and ranks the bigger city first
+    names = [result['city'] for result in index.search('nas', 'US')]
+    assert names[0] == 'Nashville'
+    assert [result['city'] for result in index.search('NEW Y')][0] == 'New York'
+    assert index.search('Toronto', 'US') == []
+    assert index.search('') == []
+
+    # Accents are folded either way
+    assert index.search('sao p')[0]['city'] == 'São Paulo'
+
+    # Numeric prefixes search postal codes
+    results = index.search('3720', 'US', limit=3)
+    assert len(results) == 3 and all(r['zipcode'].startswith('3720') and r['city'] == 'Nashville' for r in results)
+
+    # Validation: the zipcode must belong to the city entered
+    entry = index.resolve('nashville ', '37201', 'us')
+    assert entry is not None and entry.city == 'Nashville'
+    assert index.get(entry.id) is entry
+    assert index.resolve('Phoenix', '37201', 'US') is None
+    assert index.resolve('Phoenix', '', 'US').city == 'Phoenix'
+    assert index.resolve('Nowhereville', '', 'US') is None
+
+    # Lookups stay well under a millisecond
+    rounds = 2000
+    started = time.perf_counter()
+    for _ in range(rounds):
+        index.search('san', 'US')
+        index.resolve('Nashville', '37201', 'US')
+    per_lookup_ms = (time.perf_counter() - started) * 1000 / (rounds * 2)
+    assert per_lookup_ms < 1
+    print(f"Average lookup: {per_lookup_ms * 1000:.1f} µs")
+    print("✅ Prefix search, postal codes and offline validation work")
+
+def test_locations_endpoint():
+    """Test the /api/locations autocomplete endpoint"""
+    print("\n🔎 Testing /api/locations")
+    print("=" * 40)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(os.path.join(tmp, 'subscribers.db'))
+        client = app.test_client()
+
+        results = client.get('/api/locations?prefix=phoe&country=US').get_json()['results']
+        assert results[0]['city'] == 'Phoenix' and results[0]['label'] == 'Phoenix, US'
+
+        results = client.get('/api/locations?prefix=85007').get_json()['results']
+        assert results == [dict(results[0], city='Phoenix', zipcode='85007')]
+
+        assert len(client.get('/api/locations?prefix=s&limit=3').get_json()['results']) == 3
+        assert client.get('/api/locations?prefix=s&limit=abc').status_code == 200
+        print("✅ Endpoint returns ranked suggestions")
+
+if __name__ == "__main__":
+    test_location_index()
+    test_locations_endpoint()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script to verify queued structured logging and per-bucket log aggregation
+"""
+
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+from app_logging import configure_logging, dropped_records, flush_logging, get_logger
+from alert_engine import AlertEngine
+from database import connect
+from simulator import ReplayWeatherChecker, memory_sender_factory, seed_subscribers, synthetic_city, synthetic_responses
+from transports import MemoryTransport
+
+class SlowStream(io.StringIO):
+    """Console stand-in that takes 5 ms per write, or blocks entirely while paused"""
+
+    def __init__(self):
+        super().__init__()
+        self.resume = threading.Event()
+        self.resume.set()
+
+    def write(self, text):
+        self.resume.wait()
+        time.sleep(0.005)
+        return super().write(text)
+
+class RejectingTransport(MemoryTransport):
+    def deliver(self, from_addr, recipients, msg):
+        super().deliver(from_addr, recipients, msg)
+        return {recipient: 'mailbox full' for recipient in recipients}
+
+def _records(stream):
+    flush_logging()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+def test_logging_never_blocks():
+    """Test that logging only enqueues, writes structured JSON, and drops rather than waits when full"""
+    print("📝 Testing Queued Logging")
+    print("=" * 40)
+
+    logger = get_logger('test')
+    stream = SlowStream()
+    configure_logging('INFO', 'json', stream)
+
+    started = time.perf_counter()
+    for number in range(100):
+        logger.info("Checked location", extra={'location': f'City {number}', 'subscribers': number})
+    logger.debug("Not written at INFO")
+    elapsed = time.perf_counter() - started
+    # Writing them took at least 0.5 s; logging them did not
+    assert elapsed < 0.1
+    print(f"Logged 100 records in {elapsed * 1000:.1f} ms")
+
+    records = _records(stream)
+    assert len(records) == 100
+    assert records[7]['message'] == 'Checked location'
+    assert records[7]['location'] == 'City 7' and records[7]['subscribers'] == 7
+    assert records[7]['level'] == 'INFO' and records[7]['logger'] == 'umbrella.test'
+
+    # A stalled console drops records past the queue size instead of stalling the caller
+    stream = SlowStream()
+    stream.resume.clear()
+    configure_logging('INFO', 'json', stream, queue_size=10)
+    started = time.perf_counter()
+    for number in range(50):
+        logger.info("Burst", extra={'number': number})
+    assert time.perf_counter() - started < 0.1
+    stream.resume.set()
+    assert len(_records(stream)) < 50
+    assert dropped_records() > 0
+    print(f"Dropped {dropped_records()} records while the console was stalled")
+    print("✅ Logging is non-blocking and structured")
+
+def test_bucket_summaries():
+    """Test that a cycle logs one summary per offset bucket and only a sample of individual failures"""
+    print("\n📊 Testing Bucket Log Summaries")
+    print("=" * 40)
+
+    offsets = [-18000, 0, 32400]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'subscribers.db')
+        seed_subscribers(db_path, [synthetic_city(offset, index) for offset in offsets for index in range(2)], 30)
+        stream = io.StringIO()
+        configure_logging('INFO', 'json', stream)
+
+        checker = ReplayWeatherChecker(synthetic_responses(date(2024, 6, 1), offsets, 2))
+        engine = AlertEngine(db_path, weather_checker_factory=lambda: checker,
+                             sender_factory=memory_sender_factory(RejectingTransport()))
+        stats = engine.send_notifications_to_all(workers=2)
+        assert stats.alerts_failed == 30
+
+        records = _records(stream)
+        summaries = [r for r in records if r['message'] == '📊 Bucket summary']
+        assert sorted(r['utc_offset'] for r in summaries) == offsets
+        for summary in summaries:
+            assert summary['locations'] == 2 and summary['subscribers'] == 10
+            assert summary['alerts_failed'] == 10 and summary['level'] == 'WARNING'
+
+        # Five failures logged in full, the other 25 counted
+        failures = [r for r in records if r['message'] == '❌ Failed to send alert']
+        assert len(failures) == 5 and failures[0]['error'] == 'mailbox full'
+        sampled = [r for r in records if r['message'] == 'Failure logs sampled']
+        assert sampled[0]['suppressed'] == {'delivery': 25}
+        print(f"{len(records)} log records for 30 subscribers in {len(summaries)} buckets")
+
+        # Every failure is still kept with its error in the delivery history
+        conn = connect(db_path)
+        assert conn.execute("SELECT COUNT(*) FROM deliveries WHERE status = 'failed' AND error = 'mailbox full'") \
+            .fetchone()[0] == 30
+        conn.close()
+
+    configure_logging()
+    print("✅ One summary per bucket, failures sampled in logs and kept in full in the database")
+
+if __name__ == "__main__":
+    test_logging_never_blocks()
+    test_bucket_summaries()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the bounded streaming pipeline used by the alert cycle
+"""
+
+import threading
+import time
+from pipeline import Pipeline, Stage
+
+def test_backpressure():
+    """Test that a slow last stage throttles the source instead of letting items pile up"""
+    print("🚰 Testing Pipeline Backpressure")
+    print("=" * 40)
+    
+    produced = [0]
+    consumed = [0]
+    max_in_flight = [0]
+    lock = threading.Lock()
+    
+    def source():
+        for number in range(200):
+            with lock:
+                produced[0] += 1
+                max_in_flight[0] = max(max_in_flight[0], produced[0] - consumed[0])
+            yield number
+    
+    def fan_out(number):
+        yield number
+        yield -number
+    
+    def slow_sink(number):
+        time.sleep(0.001)
+        with lock:
+            consumed[0] += 1
+    
+    buffer_size = 4
+    stages = [Stage('double', lambda n: [n * 2], workers=2), Stage('fan-out', fan_out),
+              Stage('sink', slow_sink, workers=2)]
+    stats = Pipeline(stages, buffer_size).run(source())
+    print(f"Stages: {stats}")
+    print(f"Most items in flight: {max_in_flight[0]}")
+    
+    assert consumed[0] == 400
+    assert [stage['items'] for stage in stats] == [200, 200, 400]
+    assert all(stage['max_queue'] <= buffer_size for stage in stats)
+    # Queues, plus one item held by each worker and one by the feeder
+    assert max_in_flight[0] <= len(stages) * buffer_size + 5 + 1
+    
+    print("✅ Backpressure test completed!")
+
+def test_errors_drop_items():
+    """Test that a failing item is reported and dropped without stopping the pipeline"""
+    errors = []
+    
+    def fragile(number):
+        if number % 10 == 0:
+            raise ValueError(f"bad item {number}")
+        return [number]
+    
+    results = []
+    stats = Pipeline([Stage('fragile', fragile, workers=3, on_error=lambda item, e: errors.append(item)),
+                      Stage('collect', lambda n: results.append(n))], 2).run(range(50))
+    
+    assert sorted(errors) == [0, 10, 20, 30, 40]
+    assert len(results) == 45
+    assert stats[0]['errors'] == 5 and stats[1]['items'] == 45
+
+if __name__ == "__main__":
+    test_backpressure()
+    test_errors_drop_items()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test script to verify live cycle progress and its Server-Sent Events stream
+"""
+
+import json
+import os
+import queue
+import tempfile
+import time
+from datetime import date
+from alert_engine import AlertEngine
+from app import create_app
+from database import init_db
+from progress import DatabaseFeed, DatabaseMirror, ProgressBroker, get_broker, listeners_present
+from simulator import ReplayWeatherChecker, memory_sender_factory, seed_subscribers, synthetic_city, synthetic_responses
+from transports import MemoryTransport
+
+def _drain(subscription):
+    snapshots = []
+    while True:
+        try:
+            snapshots.append(subscription.get_nowait())
+        except queue.Empty:
+            return snapshots
+
+def test_cycle_publishes_progress():
+    """Test that a cycle publishes per-bucket progress only while someone is listening"""
+    print("📡 Testing Cycle Progress")
+    print("=" * 40)
+
+    offsets = [-18000, 3600]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'subscribers.db')
+        seed_subscribers(db_path, [synthetic_city(offset, index) for offset in offsets for index in range(5)], 40)
+        checker = ReplayWeatherChecker(synthetic_responses(date(2024, 6, 1), offsets, 5), latency_seconds=0.01)
+        engine = AlertEngine(db_path, weather_checker_factory=lambda: checker,
+                             sender_factory=memory_sender_factory(MemoryTransport()), archive=False)
+        broker = get_broker()
+
+        # Nobody listening: nothing is built or kept
+        engine.send_notifications_to_all()
+        assert not broker.active and 'send-all' not in broker.latest
+
+        subscription = broker.subscribe()
+        try:
+            engine.send_notifications_to_all()
+        finally:
+            broker.unsubscribe(subscription)
+        snapshots = _drain(subscription)
+        assert snapshots[0]['status'] == 'running' and snapshots[-1]['status'] == 'finished'
+        final = snapshots[-1]
+        assert final['cycle'] == 'send-all' and final['locations_total'] == 10
+        assert final['totals']['locations'] == 10
+        assert final['totals']['alerts_queued'] == final['totals']['alerts_sent'] == 40
+        assert [bucket['utc_offset'] for bucket in final['buckets']] == [-18000, 3600]
+        assert final['buckets'][0]['alerts_sent'] == 20
+        print(f"{len(snapshots)} snapshots, final: {final['totals']}")
+
+        # A reader that never catches up only keeps the newest snapshots
+        small = ProgressBroker(queue_size=2)
+        reader = small.subscribe()
+        for number in range(5):
+            small.publish({'cycle': 'send-due', 'number': number})
+        assert [snapshot['number'] for snapshot in _drain(reader)] == [3, 4]
+    print("✅ Progress is published while listened to, and free otherwise")
+
+def _wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_scheduler_progress_reaches_web_workers():
+    """Test that the scheduler saves snapshots only while a web worker has a dashboard connected"""
+    print("\n🛰️ Testing Progress Across Processes")
+    print("=" * 40)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'subscribers.db')
+        init_db(db_path)
+
+        # Scheduler side: with no dashboard anywhere, cycles have nobody to publish to
+        scheduler = ProgressBroker()
+        mirror = DatabaseMirror(db_path, scheduler, check_seconds=0.01).start()
+        time.sleep(0.05)
+        assert not scheduler.active
+
+        # Web side: polls and publishes only while anyone listens, and says so in progress_listeners
+        web = ProgressBroker()
+        feed = DatabaseFeed(db_path, web, interval=0.01)
+        feed.start()
+        feed._thread.join(2)
+        assert not listeners_present(db_path)
+
+        subscription = web.subscribe()
+        feed.start()
+        _wait_for(lambda: listeners_present(db_path))
+        _wait_for(lambda: scheduler.active)
+        scheduler.publish({'cycle': 'send-due', 'status': 'running', 'pid': -1})
+        snapshot = subscription.get(timeout=2)
+        assert snapshot['cycle'] == 'send-due' and snapshot['pid'] == -1
+
+        # Dashboard closed: the web worker stops polling and the scheduler stops saving
+        web.unsubscribe(subscription)
+        feed._thread.join(2)
+        assert not feed._thread.is_alive() and not listeners_present(db_path)
+        _wait_for(lambda: not scheduler.active)
+        mirror.stop()
+    print("✅ The scheduler's progress reaches the dashboard, and costs nothing without one")
+
+def test_progress_stream_endpoint():
+    """Test the Server-Sent Events endpoint"""
+    print("\n🌊 Testing /admin/progress")
+    print("=" * 40)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(os.path.join(tmp, 'subscribers.db'))
+        client = app.test_client()
+        replayed = len(get_broker().latest)  # Each cycle's last snapshot is sent on connect
+        response = client.get('/admin/progress', buffered=False)
+        assert response.mimetype == 'text/event-stream'
+        assert response.headers['Cache-Control'] == 'no-cache'
+        chunks = iter(response.response)
+        assert next(chunks) == b'retry: 3000\n\n'
+        for _ in range(replayed):
+            next(chunks)
+
+        get_broker().publish({'cycle': 'send-due', 'status': 'running', 'pid': os.getpid(), 'totals': {}})
+        event = next(chunks).decode()
+        assert event.startswith('event: progress\ndata: ')
+        assert json.loads(event.split('data: ', 1)[1])['cycle'] == 'send-due'
+
+        response.close()
+        assert not get_broker().active
+        app.extensions['progress_feed']._thread.join(5)  # Stops polling once nobody listens
+    print("✅ Snapshots stream as Server-Sent Events")
+
+if __name__ == "__main__":
+    test_cycle_publishes_progress()
+    test_scheduler_progress_reaches_web_workers()
+    test_progress_stream_endpoint()
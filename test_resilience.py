@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the weather API circuit breaker and hedged requests
+"""
+
+import os
+import tempfile
+import threading
+import time
+import requests
+from resilience import CircuitBreaker, CircuitOpenError, HedgedCaller
+from response_cache import ResponseCache
+from weather_checker import WeatherChecker
+
+def test_circuit_breaker():
+    """Test fail-fast, half-open probing and cached fallback"""
+    print("🔌 Testing Circuit Breaker")
+    print("=" * 40)
+    
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30, clock=lambda: now[0])
+    calls = []
+    
+    def failing():
+        calls.append(1)
+        raise requests.exceptions.ConnectionError("provider down")
+    
+    for _ in range(3):
+        try:
+            breaker.call(failing)
+        except requests.exceptions.ConnectionError:
+            pass
+    assert breaker.state == CircuitBreaker.OPEN
+    
+    # Open: fails fast without calling the provider
+    try:
+        breaker.call(failing)
+        assert False, "expected CircuitOpenError"
+    except CircuitOpenError:
+        pass
+    assert len(calls) == 3
+    
+    # A probe that fails for a reason other than the provider ends without wedging the breaker
+    now[0] = 31
+    try:
+        breaker.call(lambda: int('not json'))
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    assert breaker.state == CircuitBreaker.HALF_OPEN and breaker.allow()
+    breaker.release()
+    
+    # After the reset timeout a single probe goes through and closes the circuit
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == CircuitBreaker.CLOSED
+    print(f"Breaker stats: {breaker.stats()}")
+    
+    # With the circuit open, the checker falls back to the last cached payload
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(os.path.join(tmp, 'cache.db'), stale_seconds=0)
+        cache.put('forecast:seattle,us', {'list': [], 'cached': True}, ttl=-3600)
+        open_breaker = CircuitBreaker(failure_threshold=1, reset_seconds=3600)
+        open_breaker.record_failure()
+        checker = WeatherChecker(cache=cache, breaker=open_breaker)
+        checker.api_key = 'test'
+        assert checker.get_forecast_data_for_location('Seattle', 'US') == {'list': [], 'cached': True}
+        assert checker.get_forecast_data_for_location('Tokyo', 'JP') is None
+    print("✅ Fails fast while open and serves the last cached forecast")
+
+def test_hedged_requests():
+    """Test that a slow call is raced by a hedge and the faster answer wins"""
+    print("🏁 Testing Hedged Requests")
+    print("=" * 40)
+    
+    hedger = HedgedCaller(hedge_after=0.05)
+    attempts = []
+    lock = threading.Lock()
+    
+    def slow_then_fast():
+        with lock:
+            attempts.append(1)
+            attempt = len(attempts)
+        time.sleep(1.0 if attempt == 1 else 0.01)
+        return attempt
+    
+    started = time.perf_counter()
+    assert hedger.call(slow_then_fast) == 2
+    elapsed = time.perf_counter() - started
+    assert elapsed < 0.5
+    assert hedger.stats()['hedges'] == 1 and hedger.stats()['hedge_wins'] == 1
+    print(f"✅ Hedged call answered in {elapsed * 1000:.0f} ms instead of 1000 ms")
+
+if __name__ == "__main__":
+    test_circuit_breaker()
+    test_hedged_requests()
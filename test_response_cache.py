@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the shared on-disk response cache
+"""
+
+import os
+import tempfile
+import time
+from response_cache import ResponseCache
+from weather_checker import WeatherChecker
+
+def test_response_cache():
+    """Test read-through caching, stale-while-revalidate and LRU eviction"""
+    print("💾 Testing Response Cache")
+    print("=" * 40)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.db')
+        cache = ResponseCache(path, stale_seconds=60)
+        
+        calls = []
+        def fake_request(url, params):
+            calls.append(params['q'])
+            return {'name': params['q'], 'timezone': 0, 'n': len(calls)}
+        
+        checker = WeatherChecker(cache=cache)
+        checker.api_key = 'test'
+        checker._request_json = fake_request
+        
+        first = checker.get_weather_data_for_location('Seattle', 'US')
+        second = checker.get_weather_data_for_location('seattle ', 'US')
+        assert first == second and len(calls) == 1
+        
+        # A second process opening the same file sees the entry
+        other = ResponseCache(path)
+        assert other.get('weather:seattle,us')[0] == first
+        
+        # Expired but within the stale window: served immediately, refreshed once in the background
+        cache.put('weather:seattle,us', first, ttl=-1)
+        for _ in range(5):
+            assert checker.get_weather_data_for_location('Seattle', 'US') == first
+        deadline = time.time() + 2
+        while cache.stats()['revalidations'] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(calls) == 2
+        assert cache.get('weather:seattle,us') == ({'name': 'Seattle,US', 'timezone': 0, 'n': 2}, True)
+        
+        # Hits are reads: last_access is only rewritten once it is a minute old
+        conn = cache._connection()
+        writes = conn.total_changes
+        for _ in range(10):
+            cache.get('weather:seattle,us')
+        assert conn.total_changes == writes
+        conn.execute("UPDATE responses SET last_access = last_access - 120 WHERE key = 'weather:seattle,us'")
+        writes = conn.total_changes
+        cache.get('weather:seattle,us')
+        cache.get('weather:seattle,us')
+        assert conn.total_changes == writes + 1
+        
+        # Size bound evicts the least recently used entries
+        small = ResponseCache(os.path.join(tmp, 'small.db'), max_bytes=400)
+        for i in range(20):
+            small.put(f'weather:city{i}', {'payload': 'x' * 50, 'i': i}, ttl=60)
+        assert small.stats()['bytes'] <= 400
+        assert small.get('weather:city19')[0] is not None
+        assert small.get('weather:city0')[0] is None
+        
+        print(f"Stats: {cache.stats()}")
+        print("✅ Cache shared across instances with SWR and LRU eviction")
+
+if __name__ == "__main__":
+    test_response_cache()
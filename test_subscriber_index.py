@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test script to verify incremental refresh of the subscriber index
+"""
+
+import os
+import tempfile
+from datetime import datetime
+from subscriber_index import SubscriberIndex
+from database import connect, init_db, upsert_subscriber, deactivate_subscriber
+
+def _create_db(path):
+    init_db(path)
+    return connect(path)
+
+def _subscribe(conn, email, city, zipcode='', country_code='US'):
+    upsert_subscriber(conn.cursor(), email, city, zipcode, country_code)
+    conn.commit()
+
+def test_subscriber_index_refresh():
+    """Test that refresh only applies changed rows and keeps location groups in sync"""
+    print("🗂️ Testing Subscriber Index")
+    print("=" * 40)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'subscribers.db')
+        conn = _create_db(db_path)
+        _subscribe(conn, 'a@example.com', 'Seattle')
+        _subscribe(conn, 'b@example.com', 'seattle ')
+        _subscribe(conn, 'c@example.com', 'Tokyo', country_code='JP')
+        
+        index = SubscriberIndex(db_path)
+        assert index.refresh() == 3
+        assert len(index) == 3
+        assert len(index.all_groups()) == 2
+        print(f"Initial load: {len(index)} subscribers in {len(index.all_groups())} locations")
+        
+        # Nothing changed - nothing read
+        assert index.refresh() == 0
+        
+        # Unsubscribe bumps the version and removes only that subscriber
+        deactivate_subscriber(conn.cursor(), 'c@example.com')
+        conn.commit()
+        assert index.refresh() == 1
+        assert index.get('c@example.com') is None
+        assert len(index.all_groups()) == 1
+        print(f"After unsubscribe: {len(index)} subscribers in {len(index.all_groups())} locations")
+        
+        # Offsets place groups into buckets that can be queried by local time
+        seattle = index.get('a@example.com').group
+        assert index.unknown_offset_groups() == [seattle]
+        index.set_offset(seattle, -7 * 3600)
+        assert index.unknown_offset_groups() == []
+        assert index.groups_at_local_time(datetime(2024, 7, 1, 15, 2), 8, 5) == [seattle]
+        assert index.groups_at_local_time(datetime(2024, 7, 1, 15, 6), 8, 5) == []
+        assert index.members(seattle) == ['a@example.com', 'b@example.com']
+        print("✅ Offset buckets resolve 8:00 AM locations correctly")
+        
+        # Learned offsets are stored with the location, so a new index starts with them
+        restarted = SubscriberIndex(db_path)
+        restarted.refresh()
+        assert restarted.unknown_offset_groups() == []
+        assert restarted.get('a@example.com').group.offset == -7 * 3600
+        
+        # A location's only subscriber re-subscribing keeps the group and its per-day state
+        seattle.last_run_date = datetime(2024, 7, 1).date()
+        deactivate_subscriber(conn.cursor(), 'a@example.com')
+        _subscribe(conn, 'b@example.com', 'Seattle')
+        assert index.refresh() == 2
+        assert index.get('b@example.com').group is seattle
+        assert seattle.last_run_date == datetime(2024, 7, 1).date()
+        conn.close()
+
+if __name__ == "__main__":
+    test_subscriber_index_refresh()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the subscription lookup cache
+"""
+
+import os
+import tempfile
+import time
+from app import create_app
+from database import connect, upsert_subscriber
+from simulator import seed_subscribers
+from subscription_cache import BloomFilter, SubscriptionCache
+
+class ManualClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_bloom_filter():
+    """Test that the filter never misses a key and stays near its false positive rate"""
+    print("🌸 Testing Bloom Filter")
+    print("=" * 40)
+
+    bloom = BloomFilter(10000)
+    for i in range(10000):
+        bloom.add(f'user{i}@example.com')
+    assert all(f'user{i}@example.com' in bloom for i in range(10000))
+    false_positives = sum(f'stranger{i}@example.com' in bloom for i in range(10000))
+    print(f"{bloom.size // 8} bytes, {bloom.hashes} hashes, {false_positives / 100:.2f}% false positives")
+    assert false_positives < 200
+    print("✅ No false negatives, ~1% false positives")
+
+def test_lookups_and_invalidation():
+    """Test LRU hits, filtered unknown emails, bounded size and picking up other processes' writes"""
+    print("\n📇 Testing Subscription Cache")
+    print("=" * 40)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'subscribers.db')
+        seed_subscribers(db_path, ['Seattle', 'Tokyo'], 1000)
+        clock = ManualClock()
+        cache = SubscriptionCache(db_path, max_entries=100, sync_seconds=1, clock=clock)
+
+        assert cache.lookup('user1@example.com') == ('user1@example.com', 'Tokyo', '', 1)
+        assert cache.lookup('user1@example.com') == ('user1@example.com', 'Tokyo', '', 1)
+        assert cache.stats()['hits'] == 1 and cache.stats()['db_lookups'] == 1
+
+        # Unknown emails almost never reach the database
+        for i in range(1000):
+            assert cache.lookup(f'stranger{i}@example.com') is None
+        assert cache.stats()['db_lookups'] < 30
+
+        # Bounded: least recently used entries go first
+        for i in range(200):
+            cache.lookup(f'user{i}@example.com')
+        assert cache.stats()['entries'] == 100
+
+        started = time.perf_counter()
+        for _ in range(100000):
+            cache.lookup('user199@example.com')
+        per_lookup = (time.perf_counter() - started) / 100000
+        print(f"Cached lookup: {per_lookup * 1e6:.2f} µs")
+        assert per_lookup < 100e-6
+
+        # Written by another process: seen once the sync interval passes
+        conn = connect(db_path)
+        upsert_subscriber(conn.cursor(), 'user199@example.com', 'Lisbon', '', 'PT')
+        upsert_subscriber(conn.cursor(), 'newcomer@example.com', 'Lisbon', '', 'PT')
+        conn.commit()
+        conn.close()
+        assert cache.lookup('user199@example.com')[1] == 'Tokyo'
+        clock.now += 1
+        assert cache.lookup('user199@example.com')[1] == 'Lisbon'
+        assert cache.lookup('newcomer@example.com')[1] == 'Lisbon'
+        print(f"Stats: {cache.stats()}")
+    print("✅ Cached, filtered, bounded and kept in sync")
+
+def test_endpoints_invalidate():
+    """Test that subscribe and unsubscribe invalidate the emails they write, immediately"""
+    print("\n✉️ Testing Subscription Endpoints With the Cache")
+    print("=" * 40)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(os.path.join(tmp, 'subscribers.db'))
+        client = app.test_client()
+
+        assert client.post('/check_subscription', data={'email': 'a@example.com'}).get_json()['subscribed'] is False
+        client.post('/subscribe', data={'email': 'a@example.com', 'city': 'Nashville', 'country_code': 'US'})
+        result = client.post('/check_subscription', data={'email': 'a@example.com'}).get_json()
+        assert result['subscribed'] is True and result['location'] == 'Nashville'
+
+        client.post('/unsubscribe', data={'email': 'a@example.com'})
+        result = client.post('/check_subscription', data={'email': 'a@example.com'}).get_json()
+        assert result['subscribed'] is False and result['location'] == 'Nashville'
+
+        # Unknown email: turned away by the filter
+        response = client.post('/unsubscribe', data={'email': 'nobody@example.com'}, follow_redirects=True)
+        assert b'was not found' in response.data
+        stats = client.get('/admin/cache_stats').get_json()['subscriptions']
+        assert stats['filtered'] >= 2
+        print(f"Stats: {stats}")
+    print("✅ Writes invalidate precisely")
+
+if __name__ == "__main__":
+    test_bloom_filter()
+    test_lookups_and_invalidation()
+    test_endpoints_invalidate()
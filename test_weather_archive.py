@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the columnar weather archive
+"""
+
+import os
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from weather_archive import COLUMNS, SORTED_MARKER, WeatherArchive, archive_path_for
+from alert_engine import AlertEngine
+from simulator import ReplayWeatherChecker, memory_sender_factory, seed_subscribers, synthetic_city, synthetic_responses
+from transports import MemoryTransport
+
+def test_archive_queries():
+    """Test buffered appends, monthly partitions, range queries and aggregates"""
+    print("🗃️ Testing Weather Archive")
+    print("=" * 40)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = WeatherArchive(os.path.join(tmp, 'archive'))
+        start = datetime(2024, 1, 1, 13)
+        for day in range(366):
+            for location_id in range(1, 101):
+                rainy = (day + location_id) % 4 == 0
+                archive.append(start + timedelta(days=day), location_id, 50.0 + day % 40, 60.0 + day % 40,
+                               40.0, 5.0, 500 if rainy else 800, 1 if rainy else 0, 10 if rainy else 0)
+
+        # Nothing is written until the cycle flushes
+        assert not os.path.exists(archive.path)
+        assert archive.flush() == 36600
+        assert sorted(os.listdir(archive.path))[:2] == ['2024-01', '2024-02']
+        assert sorted(os.listdir(os.path.join(archive.path, '2024-01'))) == sorted(
+            ['.lock', SORTED_MARKER] + [f'{name}.col' for name, _ in COLUMNS])
+
+        june = archive.location_summary(7, datetime(2024, 6, 1), datetime(2024, 7, 1))
+        assert june['observations'] == 30
+        assert june['alert_runs'] == june['alerts']['umbrella'] == 8
+        assert june['recipients'] == 80
+        assert june['first'] == datetime(2024, 6, 1, 13) and june['last'] == datetime(2024, 6, 30, 13)
+        # Only June is mapped, and only location 7's rows in it are read
+        assert archive.last_query == {'partitions': 1, 'rows': 3000, 'in_range': 3000, 'matched': 30}
+        assert archive.location_summary(7, datetime(2023, 1, 1), datetime(2023, 12, 31)) is None
+        assert archive.last_query['partitions'] == 0
+
+        # A day's range is bisected out of its month without testing the other rows
+        day = list(archive.scan(datetime(2024, 3, 10), datetime(2024, 3, 11)))
+        assert len(day) == 100 and {row[0] for row in day} == {day[0][0]}
+        assert archive.last_query == {'partitions': 1, 'rows': 3100, 'in_range': 100, 'matched': 100}
+        assert archive.aggregate(datetime(2024, 3, 10, 13), datetime(2024, 3, 10, 13, 1))[5]['observations'] == 1
+
+        started = time.perf_counter()
+        year = archive.aggregate()
+        elapsed = time.perf_counter() - started
+        assert len(year) == 100 and all(summary['observations'] == 366 for summary in year.values())
+        assert year[1]['max_daily_high'] == 99.0 and year[1]['min_temperature'] == 50.0
+        print(f"Aggregated 36600 rows in {elapsed * 1000:.1f} ms")
+
+        # Appends go to the end of existing column files. Rows older than the partition's last one
+        # mean its timestamps can no longer be bisected, but queries still find everything in range
+        archive.append(datetime(2024, 6, 15, 20), 7, 90.0, 95.0, 70.0, 3.0, 800)
+        archive.flush()
+        assert not os.path.exists(os.path.join(archive.path, '2024-06', SORTED_MARKER))
+        assert archive.location_summary(7, datetime(2024, 6, 1), datetime(2024, 7, 1))['observations'] == 31
+        assert len(list(archive.scan(datetime(2024, 6, 15), datetime(2024, 6, 16)))) == 101
+        assert archive.last_query['in_range'] == 101 and archive.last_query['rows'] == 3001
+        # In-order appends keep a partition sorted
+        archive.append(datetime(2024, 12, 31, 20), 7, 40.0, 45.0, 30.0, 3.0, 800)
+        archive.flush()
+        assert os.path.exists(os.path.join(archive.path, '2024-12', SORTED_MARKER))
+
+        # A flush interrupted between column files leaves them uneven; only whole rows are read
+        with open(os.path.join(archive.path, '2024-06', 'recipients.col'), 'r+b') as f:
+            f.truncate(os.path.getsize(f.name) - 6)
+        rows = list(archive.scan(datetime(2024, 6, 1), datetime(2024, 7, 1)))
+        assert len(rows) == 3001 - 2
+
+        # The next flush drops the partial rows first, so later rows stay aligned
+        archive.append(datetime(2024, 6, 16, 20), 7, 91.0, 96.0, 71.0, 3.0, 800, 0, 7)
+        archive.flush()
+        rows = list(archive.scan(datetime(2024, 6, 1), datetime(2024, 7, 1)))
+        assert len(rows) == 3000 and rows[-1][1:3] == (7, 91.0) and rows[-1][-1] == 7
+
+        # Stopping a scan early releases its maps
+        scan = archive.scan()
+        next(scan)
+        scan.close()
+    print("✅ Range queries and aggregates work")
+
+def test_concurrent_flushes():
+    """Test that archives in several processes (or threads) flushing one partition keep rows aligned"""
+    print("\n🔒 Testing Concurrent Archive Flushes")
+    print("=" * 40)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'archive')
+
+        def writer(location_id):
+            archive = WeatherArchive(path)
+            for minute in range(50):
+                archive.append(datetime(2024, 6, 1, 8, minute), location_id, float(location_id), 0.0, 0.0, 0.0,
+                               recipients=location_id)
+                archive.flush()
+
+        threads = [threading.Thread(target=writer, args=(location_id,)) for location_id in range(1, 5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        rows = list(WeatherArchive(path).scan())
+        assert len(rows) == 200
+        assert all(row[2] == row[1] == row[-1] for row in rows)
+    print("✅ 200 rows from 4 writers, all aligned")
+
+def test_cycle_archives_observations():
+    """Test that an alert cycle archives one row per location with the alert kinds it sent"""
+    print("\n🌧️ Testing Archive Writes From the Alert Cycle")
+    print("=" * 40)
+
+    offsets = [-18000, 3600]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'subscribers.db')
+        seed_subscribers(db_path, [synthetic_city(offset) for offset in offsets], 20)
+        checker = ReplayWeatherChecker(synthetic_responses(date(2024, 6, 1), offsets))
+        engine = AlertEngine(db_path, weather_checker_factory=lambda: checker,
+                             sender_factory=memory_sender_factory(MemoryTransport()),
+                             clock=lambda: datetime(2024, 6, 1, 13))
+        assert engine.archive.path == archive_path_for(db_path) == os.path.join(tmp, 'subscribers_archive')
+
+        assert engine.send_notifications_to_all().alerts_sent == 20
+        rows = list(engine.archive.scan())
+        assert len(rows) == 2
+        timestamp, location_id, temperature, _, _, _, condition_id, flags, recipients = rows[0]
+        assert datetime(1970, 1, 1) + timedelta(seconds=timestamp) == datetime(2024, 6, 1, 13)
+        assert temperature == 72.0 and recipients == 10 and flags == 1  # Synthetic weather: rain, not hot
+
+        summaries = engine.archive.aggregate(datetime(2024, 6, 1), datetime(2024, 6, 2))
+        assert sorted(summaries) == sorted(group.key for group in engine.subscriber_index.all_groups())
+
+        # Archiving can be turned off per engine
+        engine = AlertEngine(db_path, weather_checker_factory=lambda: checker,
+                             sender_factory=memory_sender_factory(MemoryTransport()), archive=False)
+        assert engine.archive is None
+        engine.send_notifications_to_all()
+        assert len(list(WeatherArchive(archive_path_for(db_path)).scan())) == 2
+    print("✅ Every cycle archives what it observed and sent")
+
+if __name__ == "__main__":
+    test_archive_queries()
+    test_concurrent_flushes()
+    test_cycle_archives_observations()
@@ -0,0 +1,246 @@
+"""
+Delivery Transports
+Pluggable backends that deliver a rendered alert message to a list of recipients
+"""
+
+import json
+import mailbox
+import os
+import smtplib
+import threading
+import requests
+from config import (MAIL_TRANSPORT, SMTP_HOST, SMTP_PORT, SMTP_SECURITY, SMTP_AUTH, SMTP_BATCH_SIZE,
+                    EMAIL_ADDRESS, EMAIL_PASSWORD, MBOX_PATH, WEBHOOK_URL, WEBHOOK_TIMEOUT)
+
+
+class Transport:
+    """Base transport: deliver() one message to many recipients and report failures"""
+    name = 'base'
+    batch_size = SMTP_BATCH_SIZE
+
+    def is_configured(self):
+        """Whether the transport has everything it needs to deliver"""
+        return True
+
+    def deliver(self, from_addr, recipients, msg):
+        """Deliver msg to recipients; returns a dict of failed recipient -> error"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release any connection held between deliveries"""
+        pass
+
+    def _batches(self, recipients):
+        for start in range(0, len(recipients), self.batch_size):
+            yield recipients[start:start + self.batch_size]
+
+
+class SMTPTransport(Transport):
+    """SMTP relay; keeps one connection open across deliveries until close()"""
+    name = 'smtp'
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, security=SMTP_SECURITY, username=EMAIL_ADDRESS,
+                 password=EMAIL_PASSWORD, auth=SMTP_AUTH, batch_size=SMTP_BATCH_SIZE):
+        self.host = host
+        self.port = port
+        self.security = security  # 'starttls', 'ssl' or 'none'
+        self.username = username
+        self.password = password
+        self.auth = auth
+        self.batch_size = batch_size
+        self._server = None
+
+    def is_configured(self):
+        return bool(self.username and self.password) or not self.auth
+
+    def _connect(self):
+        """Open an (authenticated) SMTP connection"""
+        if self.security == 'ssl':
+            server = smtplib.SMTP_SSL(self.host, self.port)
+        else:
+            server = smtplib.SMTP(self.host, self.port)
+            if self.security == 'starttls':
+                server.starttls()
+        if self.auth:
+            server.login(self.username, self.password)
+        return server
+
+    def deliver(self, from_addr, recipients, msg):
+        failed = {}
+        text = msg.as_string()
+        for batch in self._batches(recipients):
+            try:
+                if self._server is None:
+                    self._server = self._connect()
+                try:
+                    refused = self._server.sendmail(from_addr, batch, text)
+                except smtplib.SMTPServerDisconnected:
+                    # Idle connection was dropped by the server - reconnect once
+                    self._server = self._connect()
+                    refused = self._server.sendmail(from_addr, batch, text)
+                for recipient, (code, response) in refused.items():
+                    failed[recipient] = f"{code} {response.decode(errors='replace')}"
+            except smtplib.SMTPRecipientsRefused as e:
+                for recipient, (code, response) in e.recipients.items():
+                    failed[recipient] = f"{code} {response.decode(errors='replace')}"
+            except smtplib.SMTPServerDisconnected as e:
+                failed.update({recipient: str(e) for recipient in batch})
+                self._server = None
+            except smtplib.SMTPException as e:
+                failed.update({recipient: str(e) for recipient in batch})
+                self._reset()
+            except OSError as e:
+                failed.update({recipient: str(e) for recipient in batch})
+                self._server = None
+        return failed
+
+    def _reset(self):
+        try:
+            self._server.rset()
+        except Exception:
+            self._server = None
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+
+# One lock per mbox path: mailbox's dot lock keeps other processes out, not other threads
+_mbox_locks = {}
+_mbox_locks_guard = threading.Lock()
+
+
+def _mbox_lock(path):
+    path = os.path.abspath(path)
+    with _mbox_locks_guard:
+        return _mbox_locks.setdefault(path, threading.Lock())
+
+
+class MboxTransport(Transport):
+    """Appends every delivered message to a local mbox file"""
+    name = 'mbox'
+
+    def __init__(self, path=MBOX_PATH):
+        self.path = path
+        # Shared by every transport writing this file, since each pipeline thread has its own
+        self._lock = _mbox_lock(path)
+
+    def deliver(self, from_addr, recipients, msg):
+        with self._lock:
+            box = mailbox.mbox(self.path)
+            box.lock()
+            try:
+                # One copy per message; the envelope recipients go in a trace header
+                copy = mailbox.mboxMessage(msg)
+                copy.set_from(from_addr)
+                copy['X-Envelope-To'] = ', '.join(recipients)
+                box.add(copy)
+                box.flush()
+            finally:
+                box.unlock()
+                box.close()
+        return {}
+
+
+class MemoryTransport(Transport):
+    """Counting sink: measures everything but the network and keeps nothing but totals"""
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.messages = 0
+            self.recipients = 0
+            self.bytes = 0
+
+    def deliver(self, from_addr, recipients, msg):
+        size = len(msg.as_bytes())
+        with self._lock:
+            self.messages += 1
+            self.recipients += len(recipients)
+            self.bytes += size
+        return {}
+
+    def stats(self):
+        with self._lock:
+            return {'messages': self.messages, 'recipients': self.recipients, 'bytes': self.bytes}
+
+
+_memory_transport = MemoryTransport()
+
+
+def get_memory_transport():
+    """The process-wide dry-run sink: every sender's deliveries are totalled in one place"""
+    return _memory_transport
+
+
+class WebhookTransport(Transport):
+    """POSTs each batch of recipients as JSON to an HTTP endpoint"""
+    name = 'webhook'
+
+    def __init__(self, url=WEBHOOK_URL, timeout=WEBHOOK_TIMEOUT, batch_size=SMTP_BATCH_SIZE):
+        self.url = url
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self._session = requests.Session()
+
+    def is_configured(self):
+        return bool(self.url)
+
+    def deliver(self, from_addr, recipients, msg):
+        failed = {}
+        payload = {
+            'from': from_addr,
+            'subject': str(msg['Subject']),
+            'html': _html_body(msg)
+        }
+        for batch in self._batches(recipients):
+            payload['recipients'] = batch
+            try:
+                response = self._session.post(self.url, data=json.dumps(payload), timeout=self.timeout,
+                                              headers={'Content-Type': 'application/json'})
+                response.raise_for_status()
+                # Endpoints may report individual rejections as {"failed": {recipient: error}}
+                if response.content:
+                    try:
+                        rejected = response.json().get('failed') or {}
+                    except (ValueError, AttributeError):
+                        rejected = {}
+                    failed.update({recipient: str(error) for recipient, error in rejected.items()})
+            except requests.exceptions.RequestException as e:
+                failed.update({recipient: str(e) for recipient in batch})
+        return failed
+
+    def close(self):
+        self._session.close()
+
+
+def _html_body(msg):
+    """Decoded HTML part of a message built by NotificationSender"""
+    for part in msg.walk():
+        if part.get_content_type() == 'text/html':
+            return part.get_payload(decode=True).decode(part.get_content_charset() or 'utf-8')
+    return ''
+
+
+TRANSPORTS = {
+    'smtp': SMTPTransport,
+    'mbox': MboxTransport,
+    'memory': get_memory_transport,  # Shared, so pipeline threads' senders count into one total
+    'webhook': WebhookTransport,
+}
+
+
+def create_transport(name=MAIL_TRANSPORT):
+    """Build the transport selected by MAIL_TRANSPORT"""
+    try:
+        return TRANSPORTS[name.lower()]()
+    except KeyError:
+        raise ValueError(f"Unknown MAIL_TRANSPORT '{name}'. Choose one of: {', '.join(TRANSPORTS)}")
@@ -0,0 +1,253 @@
+"""
+Weather Archive
+Append-only columnar history of what each cycle observed and alerted on.
+Rows are buffered in memory and appended once per cycle; each column is a
+flat file of fixed-width values per month, read back through mmap without
+copying or parsing. Appends to a partition are serialized across processes
+by an flock on its lock file. Queries bisect a partition's timestamps to the
+requested range and filter and aggregate one column at a time.
+"""
+
+import fcntl
+import mmap
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import compress
+from datetime import datetime, timedelta
+from alert_rules import ALERT_FLAGS
+from config import ARCHIVE_ENABLED, ARCHIVE_PATH
+
+# (name, array typecode): one file per column per month partition
+COLUMNS = (
+    ('timestamp', 'q'),  # UTC epoch seconds
+    ('location_id', 'i'),  # locations.id in the subscriber database
+    ('temperature', 'f'),  # Current temperature, °F
+    ('daily_high', 'f'),
+    ('daily_low', 'f'),
+    ('wind_speed', 'f'),
+    ('condition_id', 'H'),  # OpenWeatherMap condition code (e.g. 500 = light rain), 0 if unknown
+    ('alert_flags', 'B'),  # ALERT_FLAGS bits of the alert kinds sent to anyone at the location
+    ('recipients', 'I'),  # Subscribers alerted
+)
+
+# Present while a partition's timestamps are in order, so queries can bisect them instead of testing every row
+SORTED_MARKER = '.sorted'
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def epoch_seconds(moment):
+    """Naive UTC datetime -> integer epoch seconds"""
+    return int((moment - _EPOCH).total_seconds())
+
+
+def archive_path_for(db_path):
+    """Archive directory for a subscriber database: ARCHIVE_PATH, or alongside the database"""
+    return ARCHIVE_PATH or os.path.splitext(db_path)[0] + '_archive'
+
+
+class WeatherArchive:
+    def __init__(self, path):
+        self.path = path
+        self._pending = {}  # month partition -> {column: array}
+        self._lock = threading.Lock()
+
+    def append(self, moment, location_id, temperature, daily_high, daily_low, wind_speed, condition_id=0,
+               alert_flags=0, recipients=0):
+        """Buffer one observation; nothing touches the disk until flush()"""
+        partition = moment.strftime('%Y-%m')
+        values = (epoch_seconds(moment), location_id, temperature, daily_high, daily_low, wind_speed,
+                  condition_id, alert_flags, recipients)
+        with self._lock:
+            columns = self._pending.get(partition)
+            if columns is None:
+                columns = self._pending[partition] = {name: array(typecode) for name, typecode in COLUMNS}
+            for (name, _), value in zip(COLUMNS, values):
+                columns[name].append(value)
+
+    def flush(self):
+        """Append buffered rows to the column files; returns the number of rows written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        written = 0
+        for partition, columns in pending.items():
+            directory = os.path.join(self.path, partition)
+            os.makedirs(directory, exist_ok=True)
+            # The scheduler, a web worker's admin job and the CLI may all flush the same month
+            with open(os.path.join(directory, '.lock'), 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    self._append(directory, columns)
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+            written += len(columns['timestamp'])
+        return written
+
+    def _append(self, directory, columns):
+        """Append one partition's rows; call with the partition locked"""
+        paths = {name: os.path.join(directory, f'{name}.col') for name, _ in COLUMNS}
+        sizes = {name: os.path.getsize(path) if os.path.exists(path) else 0 for name, path in paths.items()}
+        # A flush cut short leaves some columns longer than others: drop the partial row first
+        rows = min(sizes[name] // array(typecode).itemsize for name, typecode in COLUMNS)
+
+        timestamps = columns['timestamp']
+        order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+        if order != list(range(len(timestamps))):
+            columns = {name: array(typecode, map(columns[name].__getitem__, order)) for name, typecode in COLUMNS}
+        # A cycle that finishes after a later one (or a backfill) leaves the partition unsorted for good.
+        # The marker goes before the rows, so a reader that maps them also sees it gone.
+        marker = os.path.join(directory, SORTED_MARKER)
+        if rows == 0:
+            open(marker, 'a').close()
+        elif os.path.exists(marker):
+            with open(paths['timestamp'], 'rb') as f:
+                f.seek((rows - 1) * timestamps.itemsize)
+                last = array('q', f.read(timestamps.itemsize))[0]
+            if columns['timestamp'][0] < last:
+                os.remove(marker)
+
+        for name, typecode in COLUMNS:
+            with open(paths[name], 'ab') as f:
+                whole = rows * array(typecode).itemsize
+                if sizes[name] != whole:
+                    f.truncate(whole)
+                f.write(columns[name].tobytes())
+
+    def _partitions(self, start, end):
+        if not os.path.isdir(self.path):
+            return []
+        first = start.strftime('%Y-%m') if start else ''
+        # end is exclusive, so a range ending on the 1st doesn't open that month
+        last = (end - timedelta(microseconds=1)).strftime('%Y-%m') if end else '9999-99'
+        return sorted(name for name in os.listdir(self.path) if first <= name <= last)
+
+    def _open_partition(self, partition):
+        """Map a partition's columns; returns (rows, {column: memoryview}, [mmaps], timestamps in order)"""
+        views = {}
+        maps = []
+        rows = None
+        for name, typecode in COLUMNS:
+            path = os.path.join(self.path, partition, f'{name}.col')
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                rows = 0
+                continue
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            maps.append(mapped)
+            view = memoryview(mapped)
+            # A flush cut short leaves a column short; only whole rows are read
+            whole = len(view) - len(view) % array(typecode).itemsize
+            views[name] = view[:whole].cast(typecode)
+            rows = len(views[name]) if rows is None else min(rows, len(views[name]))
+        # Checked after mapping: rows appended out of order remove the marker before they're written
+        in_order = os.path.exists(os.path.join(self.path, partition, SORTED_MARKER))
+        return rows or 0, views, maps, in_order
+
+    def _select(self, start, end, location_id):
+        """Yield ({column: memoryview}, row numbers) per partition for rows in [start, end), optionally
+        for one location; last_query counts the rows each step pruned"""
+        low = epoch_seconds(start) if start else None
+        high = epoch_seconds(end) if end else None
+        stats = self.last_query = {'partitions': 0, 'rows': 0, 'in_range': 0, 'matched': 0}
+        for partition in self._partitions(start, end):
+            rows, views, maps, in_order = self._open_partition(partition)
+            try:
+                stats['partitions'] += 1
+                stats['rows'] += rows
+                timestamps = views['timestamp'] if rows else ()
+                if in_order:
+                    first = bisect_left(timestamps, low, 0, rows) if low is not None else 0
+                    last = bisect_left(timestamps, high, first, rows) if high is not None else rows
+                    selected = range(first, last)
+                else:
+                    selected = [row for row in range(rows) if (low is None or timestamps[row] >= low)
+                                and (high is None or timestamps[row] < high)]
+                stats['in_range'] += len(selected)
+                if location_id is not None and selected:
+                    locations = views['location_id']
+                    selected = list(compress(selected, map(location_id.__eq__, map(locations.__getitem__, selected))))
+                stats['matched'] += len(selected)
+                if selected:
+                    yield views, selected
+            finally:
+                # Views must be released before their maps can close
+                for view in views.values():
+                    view.release()
+                for mapped in maps:
+                    mapped.close()
+
+    def scan(self, start=None, end=None, location_id=None):
+        """Yield (timestamp, location_id, temperature, daily_high, daily_low, wind_speed, condition_id,
+        alert_flags, recipients) rows in [start, end), optionally for one location"""
+        selections = self._select(start, end, location_id)
+        try:
+            for views, selected in selections:
+                yield from zip(*(map(views[name].__getitem__, selected) for name, _ in COLUMNS))
+        finally:
+            selections.close()
+
+    def aggregate(self, start=None, end=None, location_id=None):
+        """Per-location totals over a time range: {location_id: summary}"""
+        summaries = {}
+        for views, selected in self._select(start, end, location_id):
+            # Sort the selected rows by location, then total each location's run column by column
+            locations = views['location_id']
+            order = sorted(selected, key=locations.__getitem__)
+            keys = list(map(locations.__getitem__, order))
+            first = 0
+            while first < len(keys):
+                last = bisect_right(keys, keys[first], first)
+                _add_summary(summaries, keys[first], views, order[first:last])
+                first = last
+
+        for summary in summaries.values():
+            summary['avg_temperature'] = round(summary.pop('temperature_sum') / summary['observations'], 1)
+            summary['first'] = _EPOCH + timedelta(seconds=summary['first'])
+            summary['last'] = _EPOCH + timedelta(seconds=summary['last'])
+        return summaries
+
+    def location_summary(self, location_id, start=None, end=None):
+        """Totals for one location, or None if nothing was archived for it in the range"""
+        return self.aggregate(start, end, location_id).get(location_id)
+
+
+def _add_summary(summaries, location, views, rows):
+    """Fold one location's rows in a partition into its summary"""
+    def column(name):
+        return list(map(views[name].__getitem__, rows))
+
+    temperatures = column('temperature')
+    timestamps = column('timestamp')
+    flags = column('alert_flags')
+    runs_by_flags = Counter(flags)
+    part = {
+        'observations': len(rows), 'alert_runs': len(rows) - runs_by_flags[0],
+        'recipients': sum(compress(column('recipients'), flags)),
+        'alerts': {kind: sum(runs for value, runs in runs_by_flags.items() if value & bit)
+                   for kind, bit in ALERT_FLAGS.items()},
+        'min_temperature': min(temperatures), 'max_temperature': max(temperatures),
+        'max_daily_high': max(column('daily_high')), 'temperature_sum': sum(temperatures),
+        'first': min(timestamps), 'last': max(timestamps)
+    }
+    summary = summaries.get(location)
+    if summary is None:
+        summaries[location] = dict(location_id=location, **part)
+        return
+    for key in ('observations', 'alert_runs', 'recipients', 'temperature_sum'):
+        summary[key] += part[key]
+    for kind, runs in part['alerts'].items():
+        summary['alerts'][kind] += runs
+    for key in ('min_temperature', 'first'):
+        summary[key] = min(summary[key], part[key])
+    for key in ('max_temperature', 'max_daily_high', 'last'):
+        summary[key] = max(summary[key], part[key])
+
+
+def open_archive(db_path, archive=None):
+    """The archive an engine on db_path writes to: the one given, none (False), or the default"""
+    if archive is None:
+        return WeatherArchive(archive_path_for(db_path)) if ARCHIVE_ENABLED else None
+    return archive or None
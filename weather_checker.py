@@ -2,12 +2,64 @@ import requests
 import json
 import pytz
 from datetime import datetime
-from config import WEATHER_API_KEY, WEATHER_API_BASE_URL, CITY, COUNTRY_CODE, TEMPERATURE_THRESHOLD, RAIN_CONDITIONS
+from forecast import CompactForecast
+from alert_rules import default_rules
+from response_cache import get_default_cache
+from resilience import get_default_breaker, get_default_hedger
+from app_logging import get_logger
+from config import (WEATHER_API_KEY, WEATHER_API_BASE_URL, CITY, COUNTRY_CODE, RAIN_CONDITIONS,
+                    CACHE_WEATHER_TTL, CACHE_FORECAST_TTL, WEATHER_API_TIMEOUT)
+
+FORECAST_API_URL = "http://api.openweathermap.org/data/2.5/forecast"
+
+logger = get_logger('weather_checker')
+
+def response_key(kind, query):
+    """Cache key for a provider response: kind plus the normalized 'city,country' query"""
+    return f"{kind}:" + ','.join(part.strip() for part in query.lower().split(','))
 
 class WeatherChecker:
-    def __init__(self):
+    def __init__(self, cache=None, breaker=None, hedger=None):
         self.api_key = WEATHER_API_KEY
         self.base_url = WEATHER_API_BASE_URL
+        # Shared on-disk response cache (None when RESPONSE_CACHE_ENABLED is off, cache=False to bypass it)
+        self.cache = get_default_cache() if cache is None else (cache or None)
+        # Per-process breaker and hedging shared by every checker talking to the provider
+        self.breaker = breaker or get_default_breaker()
+        self.hedger = hedger or get_default_hedger()
+    
+    def _request_json(self, url, params):
+        response = requests.get(url, params=params, timeout=WEATHER_API_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    
+    def _fetch_json(self, url, params):
+        """Call the provider through the circuit breaker, hedging slow calls"""
+        return self.breaker.call(self.hedger.call, self._request_json, url, params)
+    
+    def _get_json(self, kind, url, params, ttl):
+        """Read through the response cache; stale entries are served while a refresh runs in the background"""
+        if self.cache is None:
+            return self._fetch_json(url, params)
+        
+        key = response_key(kind, params['q'])
+        payload, fresh = self.cache.get(key)
+        if payload is not None:
+            if not fresh:
+                self.cache.revalidate(key, lambda: self._fetch_json(url, params), ttl)
+            return payload
+        
+        try:
+            payload = self._fetch_json(url, params)
+        except requests.exceptions.RequestException as e:
+            # Provider down or circuit open: fall back to the last payload we have, however old
+            fallback = self.cache.get_last(key)
+            if fallback is None:
+                raise
+            logger.warning(f"⚠️ Using last cached {kind}", extra={'query': params['q'], 'error': str(e)})
+            return fallback
+        self.cache.put(key, payload, ttl)
+        return payload
         
     def get_weather_data(self):
         """Fetch current weather data from OpenWeatherMap API"""
@@ -21,11 +73,9 @@ class WeatherChecker:
         }
         
         try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self._get_json('weather', self.base_url, params, CACHE_WEATHER_TTL)
         except requests.exceptions.RequestException as e:
-            print(f"Error fetching weather data: {e}")
+            logger.error("Error fetching weather data", extra={'error': str(e)})
             return None
     
     def get_weather_data_for_location(self, city, country_code):
@@ -40,11 +90,9 @@ class WeatherChecker:
         }
         
         try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self._get_json('weather', self.base_url, params, CACHE_WEATHER_TTL)
         except requests.exceptions.RequestException as e:
-            print(f"Error fetching weather data for {city}: {e}")
+            logger.error("Error fetching weather data", extra={'location': city, 'error': str(e)})
             return None
     
     def get_forecast_data_for_location(self, city, country_code):
@@ -52,9 +100,6 @@ class WeatherChecker:
         if not self.api_key:
             raise ValueError("Weather API key not found. Please set WEATHER_API_KEY in your .env file")
         
-        # Use the forecast API endpoint
-        forecast_url = "http://api.openweathermap.org/data/2.5/forecast"
-        
         params = {
             'q': f"{city},{country_code}",
             'appid': self.api_key,
@@ -62,13 +107,15 @@ class WeatherChecker:
         }
         
         try:
-            response = requests.get(forecast_url, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self._get_json('forecast', FORECAST_API_URL, params, CACHE_FORECAST_TTL)
         except requests.exceptions.RequestException as e:
-            print(f"Error fetching forecast data for {city}: {e}")
+            logger.error("Error fetching forecast data", extra={'location': city, 'error': str(e)})
             return None
     
+    def get_compact_forecast_for_location(self, city, country_code):
+        """Fetch the 5-day forecast for a location, converted to a CompactForecast at ingest"""
+        return CompactForecast.from_owm(self.get_forecast_data_for_location(city, country_code))
+    
     def get_location_timezone(self, weather_data):
         """Get timezone information from weather data"""
         if not weather_data or 'timezone' not in weather_data:
@@ -127,11 +174,16 @@ class WeatherChecker:
             # Check if it's 8:00 AM
             return local_time.hour == 8 and local_time.minute == 0
         except Exception as e:
-            print(f"Error checking timezone for location: {e}")
+            logger.error("Error checking timezone for location", extra={'error': str(e)})
             return False
     
-    def analyze_weather(self, weather_data, forecast_data=None):
-        """Analyze weather data and return notification recommendations"""
+    def analyze_weather(self, weather_data, forecast_data=None, rules=None, now_utc=None):
+        """Analyze weather data and return notification recommendations.
+        
+        The metric vector in analysis['metrics'] is computed once per location;
+        notifications come from rules (a CompiledRuleSet, default: umbrella + sunscreen).
+        now_utc picks the forecast's local day (default: the real current time).
+        """
         if not weather_data:
             return None
         
@@ -139,67 +191,99 @@ class WeatherChecker:
             current_temp = weather_data['main']['temp']
             weather_condition = weather_data['weather'][0]['main'].lower()
             weather_description = weather_data['weather'][0]['description'].lower()
-            
-            notifications = []
+            wind_speed = weather_data.get('wind', {}).get('speed', 0)
             
             # Check for rain conditions (current weather)
             is_rainy = any(condition in weather_description for condition in RAIN_CONDITIONS)
-            if is_rainy:
-                notifications.append("🌧️ Bring an umbrella! Rain is expected.")
             
-            # Get daily high temperature from forecast if available
+            # Get daily high/low temperature from forecast if available
             daily_high = current_temp  # Default to current temp
-            if forecast_data and 'list' in forecast_data:
-                daily_high = self._get_daily_high_temperature(forecast_data)
+            daily_low = current_temp
+            today = None
+            forecast = self._to_compact(forecast_data, weather_data.get('timezone')) if forecast_data else None
+            if forecast:
+                # Precomputed at ingest for the location's local day
+                today = forecast.today(now_utc)
+                daily_high = today.high if today else 75  # Default temperature
+                daily_low = today.low if today else current_temp
             
-            # Check for high temperature using daily high
-            if daily_high > TEMPERATURE_THRESHOLD:
-                if is_rainy:
-                    notifications.append("☀️🌧️ High temperature and rain expected. Bring umbrella AND sunscreen!")
-                else:
-                    notifications.append("☀️ High temperature expected. Don't forget sunscreen!")
+            # Same order as alert_rules.METRICS
+            metrics = (current_temp, daily_high, daily_low, wind_speed, 1 if is_rainy else 0)
+            notifications = (rules or default_rules()).evaluate(metrics)
             
-            return {
+            analysis = {
                 'current_temperature': current_temp,
                 'daily_high': daily_high,
                 'condition': weather_condition,
                 'description': weather_description,
                 'notifications': notifications,
+                'metrics': metrics,
                 'location': f"{CITY}, {COUNTRY_CODE}"
             }
+            if today:
+                analysis['today'] = today.to_dict()
+            return analysis
             
         except KeyError as e:
-            print(f"Error parsing weather data: {e}")
+            logger.error("Error parsing weather data", extra={'error': str(e)})
+            return None
+    
+    def analysis_fingerprint(self, weather_data, forecast_data=None, now_utc=None):
+        """The forecast-derived inputs analyze_weather reads, as a comparable tuple (None if the payload is unusable).
+        
+        Equal fingerprints give analyses that differ only in the current
+        conditions, which with_current_conditions() brings up to date. The
+        current temperature, wind and date are left out, so a location whose
+        outlook hasn't changed since its last check (even the day before) can
+        reuse that check's results.
+        """
+        if not weather_data:
+            return None
+        try:
+            condition = (weather_data['weather'][0]['main'], weather_data['weather'][0]['description'])
+            current_temp = weather_data['main']['temp']
+        except (KeyError, IndexError):
             return None
+        forecast = self._to_compact(forecast_data, weather_data.get('timezone')) if forecast_data else None
+        today = forecast.today(now_utc) if forecast else None
+        if today is None:
+            # Without today's rollup the daily values fall back to the current temperature
+            return condition + (bool(forecast), current_temp)
+        return condition + (today.high, today.low, today.rain_hours, today.max_pop)
+    
+    def with_current_conditions(self, weather_analysis, weather_data, forecast_data=None, now_utc=None):
+        """A fresh fetch's analysis from an earlier one with the same fingerprint: only the current
+        temperature, wind and today's date are updated"""
+        current_temp = weather_data['main']['temp']
+        _, daily_high, daily_low, _, is_rainy = weather_analysis['metrics']
+        metrics = (current_temp, daily_high, daily_low, weather_data.get('wind', {}).get('speed', 0), is_rainy)
+        analysis = dict(weather_analysis, current_temperature=current_temp, metrics=metrics,
+                        notifications=default_rules().evaluate(metrics))
+        if 'today' in analysis:
+            forecast = self._to_compact(forecast_data, weather_data.get('timezone'))
+            analysis['today'] = dict(analysis['today'], date=forecast.local_date(now_utc).isoformat())
+        return analysis
+    
+    def _to_compact(self, forecast_data, offset=None):
+        """Accept either a CompactForecast or a raw /forecast response"""
+        if isinstance(forecast_data, CompactForecast):
+            return forecast_data
+        return CompactForecast.from_owm(forecast_data, offset)
     
     def _get_daily_high_temperature(self, forecast_data):
-        """Extract the daily high temperature from forecast data"""
+        """Extract the daily high temperature (in the location's local day) from forecast data"""
         try:
-            # Get today's date
-            today = datetime.now().date()
-            
-            # Find the highest temperature for today
-            daily_high = -999  # Start with very low temp
-            
-            for item in forecast_data['list']:
-                # Parse the forecast time
-                forecast_time = datetime.fromtimestamp(item['dt'])
-                forecast_date = forecast_time.date()
-                
-                # Only consider today's forecasts
-                if forecast_date == today:
-                    temp = item['main']['temp']
-                    if temp > daily_high:
-                        daily_high = temp
+            forecast = self._to_compact(forecast_data)
+            today = forecast.today() if forecast else None
             
             # If no forecast found for today, return a reasonable default
-            if daily_high == -999:
+            if today is None:
                 return 75  # Default temperature
             
-            return daily_high
+            return today.high
             
         except Exception as e:
-            print(f"Error getting daily high temperature: {e}")
+            logger.error("Error getting daily high temperature", extra={'error': str(e)})
             return 75  # Default temperature
     
     def should_send_notification(self, weather_analysis):